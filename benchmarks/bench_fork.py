@@ -0,0 +1,47 @@
+"""
+Benchmark: GameBoy.fork() (gb/fork.py), 64 branches from one state, compared
+with restoring a save state per branch.
+
+run from the repository root:
+    python -m benchmarks.bench_fork
+"""
+
+import time
+from gb.mbc.mbc0 import MBC0
+from gb.gameboy import GameBoy
+
+ROM = "./tests/cpu_test_roms/individual/06-ld r,r.gb"
+BRANCHES = 64
+
+
+def cycles(gameboy, arg):
+    return gameboy.cycles
+
+
+def run_frame(gameboy, arg):
+    gameboy.run_frames(1)
+    return gameboy.cycles
+
+
+def bench_fork(gameboy, branch):
+    start = time.perf_counter()
+    gameboy.fork(branch, range(BRANCHES))
+    return time.perf_counter() - start
+
+
+def bench_save_load(gameboy, branch):
+    start = time.perf_counter()
+    state = gameboy.save_state()
+    for arg in range(BRANCHES):
+        gameboy.load_state(state)
+        branch(gameboy, arg)
+    gameboy.load_state(state)
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    gameboy = GameBoy(MBC0(ROM))
+    gameboy.run_frames(10)
+    print(f"{BRANCHES} branches, nothing run:  fork {bench_fork(gameboy, cycles) * 1e3:7.1f} ms")
+    print(f"{BRANCHES} branches, 1 frame each: fork {bench_fork(gameboy, run_frame) * 1e3:7.1f} ms"
+          f"   save/load in one process {bench_save_load(gameboy, run_frame) * 1e3:7.1f} ms")
@@ -0,0 +1,58 @@
+"""
+Benchmark: MMU.read_byte / MMU.write_byte accesses per second for each
+memory region, in EXECUTION_MODES.FAST.
+
+run from the repository root:
+    python -m benchmarks.bench_mmu
+"""
+
+import time
+from gb.mbc.mbc0 import MBC0
+from gb.mmu import MMU
+from gb.util.execution_modes import EXECUTION_MODES
+
+ACCESSES = 200_000
+
+# region name -> addresses accessed, cycled through
+REGIONS = {
+    "ROM0 page 0": range(0x0000, 0x0100),
+    "ROM0": range(0x0100, 0x0200),
+    "ROMX": range(0x4000, 0x4100),
+    "VRAM": range(0x8000, 0x8100),
+    "WRAM": range(0xC000, 0xC100),
+    "OAM": range(0xFE00, 0xFEA0),
+    "IO (P1)": [0xFF00],
+    "IO (LY)": [0xFF44],
+    "HRAM": range(0xFF80, 0xFFFF),
+}
+
+
+def addresses(region):
+    addrs = list(REGIONS[region])
+    return (addrs * (ACCESSES // len(addrs) + 1))[:ACCESSES]
+
+
+def bench_reads(mmu, addrs):
+    read_byte = mmu.read_byte
+    start = time.perf_counter()
+    for address in addrs:
+        read_byte(address)
+    return len(addrs) / (time.perf_counter() - start)
+
+
+def bench_writes(mmu, addrs):
+    write_byte = mmu.write_byte
+    start = time.perf_counter()
+    for address in addrs:
+        write_byte(address, 0x12)
+    return len(addrs) / (time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    mmu = MMU(MBC0(None), mode=EXECUTION_MODES.FAST)
+    print(f"{'region':12} {'reads/sec':>12} {'writes/sec':>12}")
+    for region in REGIONS:
+        addrs = addresses(region)
+        reads = bench_reads(mmu, addrs)
+        writes = bench_writes(mmu, addrs) if not region.startswith("ROM") else 0
+        print(f"{region:12} {reads:12,.0f} {writes:12,.0f}")
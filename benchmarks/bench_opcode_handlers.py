@@ -0,0 +1,42 @@
+"""
+Benchmark: instructions/sec of the generic (lambda) opcode handlers against
+the generated handlers in gb/cpu/instructions/specialized.py.
+
+run from the repository root:
+    python -m benchmarks.bench_opcode_handlers
+"""
+
+import time
+from gb.mbc.mbc0 import MBC0
+from gb.mmu import MMU
+from gb.cpu.cpu import CPU
+
+ROM = "./tests/cpu_test_roms/cpu_instrs.gb"
+
+# the first 250k instructions of cpu_instrs.gb
+INSTRUCTIONS = 250_000
+
+
+def run(specialized):
+    mmu = MMU(mbc=MBC0(ROM))
+    cpu = CPU(mmu=mmu, specialized=specialized)
+    cpu.no_boot_rom_setup()
+    timer = mmu.timer
+
+    start = time.perf_counter()
+    for _ in range(INSTRUCTIONS):
+        cycles = cpu.step()
+        timer.step(cycles)
+    return INSTRUCTIONS / (time.perf_counter() - start)
+
+
+def main():
+    generic = run(specialized=False)
+    specialized = run(specialized=True)
+    print(f"generic handlers:     {generic:>10,.0f} instructions/sec")
+    print(f"specialized handlers: {specialized:>10,.0f} instructions/sec")
+    print(f"speedup:              {specialized / generic:>10.2f}x")
+
+
+if __name__ == "__main__":
+    main()
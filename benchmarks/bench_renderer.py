@@ -0,0 +1,58 @@
+"""
+Benchmark: frames/sec of the scanline renderer alone (gb/ppu/scanline.py),
+with random tiles, tile maps and sprites in VRAM/OAM, with and without the
+decoded tile cache (gb/ppu/tile_cache.py), and rendering whole frames at
+once with render_lines().
+
+run from the repository root:
+    python -m benchmarks.bench_renderer
+"""
+
+import random
+import time
+from gb.mbc.mbc0 import MBC0
+from gb.mmu import MMU
+from gb.ppu import PPU
+
+FRAMES = 200
+
+
+def make_ppu(seed=0, tile_cache=True):
+    rng = random.Random(seed)
+    mmu = MMU(MBC0(None))
+    ppu = PPU(mmu, tile_cache=tile_cache)
+    mmu.vram[:] = rng.randbytes(len(mmu.vram))
+    mmu.oam[:] = rng.randbytes(len(mmu.oam))
+    # LCD, BG, window and sprites on
+    mmu.io_regs[0x40] = 0xF3
+    mmu.io_regs[0x4A] = 72
+    mmu.io_regs[0x4B] = 87
+    return ppu
+
+
+def bench(ppu, frames=FRAMES):
+    render = ppu.scanline_renderer.render
+    framebuffer = ppu.framebuffer
+    start = time.perf_counter()
+    for _ in range(frames):
+        for ly in range(144):
+            render(ly, framebuffer[ly])
+    return frames / (time.perf_counter() - start)
+
+
+def bench_whole_frame(ppu, frames=FRAMES):
+    render_lines = ppu.scanline_renderer.render_lines
+    framebuffer = ppu.framebuffer
+    start = time.perf_counter()
+    for _ in range(frames):
+        render_lines(0, 144, framebuffer)
+    return frames / (time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    uncached = bench(make_ppu(tile_cache=False))
+    cached = bench(make_ppu(tile_cache=True))
+    whole = bench_whole_frame(make_ppu(tile_cache=True))
+    print(f"without tile cache: {uncached:.1f} frames/sec")
+    print(f"with tile cache:    {cached:.1f} frames/sec ({cached / uncached:.2f}x)")
+    print(f"whole frames:       {whole:.1f} frames/sec ({whole / uncached:.2f}x)")
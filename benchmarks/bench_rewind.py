@@ -0,0 +1,37 @@
+"""
+Benchmark: rewind buffer (gb/rewind.py). Records a state every frame for
+10 seconds of emulation, then goes back 10 seconds. Reports the time per
+recorded state, memory used and the time to go back.
+
+run from the repository root:
+    python -m benchmarks.bench_rewind
+"""
+
+import time
+from gb.mbc.mbc0 import MBC0
+from gb.gameboy import GameBoy
+from gb.rewind import Rewind
+
+ROM = "./tests/cpu_test_roms/individual/06-ld r,r.gb"
+FRAMES = 600  # 10 seconds
+
+
+if __name__ == "__main__":
+    gameboy = GameBoy(MBC0(ROM))
+    buffer = Rewind(gameboy)
+
+    recording = 0
+    for _ in range(FRAMES):
+        gameboy.run_frames(1)
+        start = time.perf_counter()
+        buffer.record()
+        recording += time.perf_counter() - start
+
+    state_size = len(gameboy.save_state())
+    print(f"states:        {len(buffer)} of {state_size:,} bytes")
+    print(f"memory:        {buffer.size:,} bytes ({buffer.size / len(buffer):,.0f} per state)")
+    print(f"record:        {recording / FRAMES * 1e6:8.1f} us per state")
+
+    start = time.perf_counter()
+    buffer.rewind_to(gameboy.ppu.frame_count - FRAMES + 1)
+    print(f"back 10 s:     {(time.perf_counter() - start) * 1e3:8.2f} ms")
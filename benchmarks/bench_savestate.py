@@ -0,0 +1,39 @@
+"""
+Benchmark: GameBoy.save_state() / load_state() time per call and state size
+(gb/savestate.py).
+
+run from the repository root:
+    python -m benchmarks.bench_savestate
+"""
+
+import time
+from gb.mbc.mbc0 import MBC0
+from gb.gameboy import GameBoy
+
+ROM = "./tests/cpu_test_roms/individual/06-ld r,r.gb"
+CALLS = 2000
+
+
+def bench_save(gameboy, calls=CALLS):
+    save_state = gameboy.save_state
+    start = time.perf_counter()
+    for _ in range(calls):
+        save_state()
+    return (time.perf_counter() - start) / calls
+
+
+def bench_load(gameboy, state, calls=CALLS):
+    load_state = gameboy.load_state
+    start = time.perf_counter()
+    for _ in range(calls):
+        load_state(state)
+    return (time.perf_counter() - start) / calls
+
+
+if __name__ == "__main__":
+    gameboy = GameBoy(MBC0(ROM))
+    gameboy.run_frames(10)
+    state = gameboy.save_state()
+    print(f"state size: {len(state):,} bytes")
+    print(f"save_state: {bench_save(gameboy) * 1e6:8.1f} us")
+    print(f"load_state: {bench_load(gameboy, state) * 1e6:8.1f} us")
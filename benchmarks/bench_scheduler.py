@@ -0,0 +1,56 @@
+"""
+Benchmark: frames/sec of the per-instruction main loop (cpu, timer and ppu
+stepped after every instruction) against the event scheduler in
+gb/gameboy.py.
+
+run from the repository root:
+    python -m benchmarks.bench_scheduler
+"""
+
+import time
+from gb.mbc.mbc0 import MBC0
+from gb.mmu import MMU
+from gb.cpu.cpu import CPU
+from gb.ppu import PPU
+from gb.gameboy import GameBoy
+from gb.util.execution_modes import EXECUTION_MODES
+
+ROM = "./tests/cpu_test_roms/individual/06-ld r,r.gb"
+FRAMES = 60
+
+
+def run_stepped(translate):
+    mmu = MMU(mbc=MBC0(ROM), mode=EXECUTION_MODES.FAST)
+    cpu = CPU(mmu=mmu, translate=translate)
+    cpu.no_boot_rom_setup()
+    ppu = PPU(mmu=mmu)
+    timer = mmu.timer
+
+    start = time.perf_counter()
+    while ppu.frame_count < FRAMES:
+        cycles = cpu.step()
+        timer.step(cycles)
+        ppu.step(cycles)
+    return FRAMES / (time.perf_counter() - start)
+
+
+def run_scheduled(translate):
+    gameboy = GameBoy(MBC0(ROM), mode=EXECUTION_MODES.FAST, translate=translate)
+
+    start = time.perf_counter()
+    gameboy.run_frames(FRAMES)
+    return FRAMES / (time.perf_counter() - start)
+
+
+def main():
+    for translate in (False, True):
+        stepped = run_stepped(translate)
+        scheduled = run_scheduled(translate)
+        print(f"translate={translate}")
+        print(f"  per-instruction loop: {stepped:>8.1f} frames/sec")
+        print(f"  event scheduler:      {scheduled:>8.1f} frames/sec")
+        print(f"  speedup:              {scheduled / stepped:>8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+################################################################################
+# Headless batch runner
+#
+# Runs many ROMs without a renderer, one emulator per job, spread over a
+# ProcessPoolExecutor with a worker per core. Each ROM runs for a budget of
+# frames or cycles, or until a completion condition (see CONDITIONS) says it
+# is done. Reports per ROM: wall time, emulated cycles, result and a hash of
+# the final framebuffer, for nightly regression runs. Test ROMs print their
+# result over the serial port, `--until serial` stops them as soon as it is
+# "Passed" or "Failed" (see gb/serial.py).
+#
+# run from the repository root:
+#     python -m gb.batch tests/cpu_test_roms/individual --frames 3000 --until serial
+#     python -m gb.batch a.gb b.gb --cycles 10000000 --json results.json
+################################################################################
+
+import argparse
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from gb.mbc.mbc0 import MBC0
+from gb.gameboy import GameBoy
+from gb.ppu import FRAME_CYCLES
+
+# results when no condition ended the run
+RESULT_BUDGET = "budget"
+RESULT_ERROR = "error"
+
+DEFAULT_FRAMES = 600
+
+
+###############################################################################
+# completion conditions, checked once per frame. return a result to stop
+###############################################################################
+
+def stuck_in_loop(gameboy):
+    """the program ended in `JR -2` (jump to itself), like test ROMs do"""
+    mmu, pc = gameboy.mmu, gameboy.cpu.registers.PC
+    if mmu.read_byte(pc) == 0x18 and mmu.read_byte(pc + 1) == 0xFE:
+        return "loop"
+    return None
+
+def serial_result(gameboy):
+    """a test ROM printed "Passed" or "Failed" over the serial port"""
+    return gameboy.serial.result()
+
+# name -> condition, names are what the workers get
+CONDITIONS = {
+    "loop": stuck_in_loop,
+    "serial": serial_result,
+}
+
+
+def find_roms(paths):
+    """ROM files in `paths`, directories are searched for *.gb (sorted)"""
+    roms = []
+    for path in paths:
+        if os.path.isdir(path):
+            roms.extend(sorted(os.path.join(path, name) for name in os.listdir(path)
+                               if name.endswith(".gb")))
+        else:
+            roms.append(path)
+    return roms
+
+
+def run_rom(path, frames=None, cycles=None, until=None):
+    """
+    run one ROM headless for `frames` frames or `cycles` cycles (frames by
+    default), or until the CONDITIONS[until] returns a result
+    """
+    if frames is None and cycles is None:
+        frames = DEFAULT_FRAMES
+    condition = CONDITIONS[until] if until is not None else None
+
+    start = time.perf_counter()
+    result = RESULT_BUDGET
+    error = None
+    gameboy = None
+    try:
+        gameboy = GameBoy(MBC0(path))
+        while True:
+            if frames is not None and gameboy.ppu.frame_count >= frames:
+                break
+            if cycles is not None and gameboy.cycles >= cycles:
+                break
+            if frames is not None:
+                gameboy.run_frames(1)
+            else:
+                gameboy.run_until(min(gameboy.cycles + FRAME_CYCLES, cycles))
+            if condition is not None:
+                done = condition(gameboy)
+                if done is not None:
+                    result = done
+                    break
+    except Exception as e:
+        # one broken ROM shouldn't take the batch down
+        result, error = RESULT_ERROR, repr(e)
+
+    return {
+        "rom": path,
+        "result": result,
+        "error": error,
+        "wall_time": time.perf_counter() - start,
+        "cycles": gameboy.cycles if gameboy is not None else 0,
+        "frames": gameboy.ppu.frame_count if gameboy is not None else 0,
+        "serial": gameboy.serial.text() if gameboy is not None else "",
+        "framebuffer_hash": hashlib.sha1(gameboy.ppu.framebuffer.tobytes()).hexdigest()[:16]
+                            if gameboy is not None else "",
+    }
+
+
+def run_batch(roms, frames=None, cycles=None, until=None, workers=None):
+    """run_rom() every ROM on a process pool, results in the order of `roms`"""
+    count = len(roms)
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+        return list(executor.map(run_rom, roms, [frames] * count, [cycles] * count, [until] * count))
+
+
+def print_report(results, wall_time):
+    width = max([len(os.path.basename(r["rom"])) for r in results] + [3])
+    print(f"{'rom':{width}} {'result':>10} {'time (s)':>9} {'cycles':>13} {'framebuffer':>16}")
+    for r in results:
+        print(f"{os.path.basename(r['rom']):{width}} {r['result']:>10} {r['wall_time']:9.2f} "
+              f"{r['cycles']:13,} {r['framebuffer_hash']:>16}")
+        if r["error"]:
+            print(f"    {r['error']}")
+    cpu_time = sum(r["wall_time"] for r in results)
+    print(f"{len(results)} ROMs in {wall_time:.2f} s ({cpu_time:.2f} s of emulation)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="run ROMs headless on all cores")
+    parser.add_argument("paths", nargs="+", help="ROM files or directories of .gb files")
+    budget = parser.add_mutually_exclusive_group()
+    budget.add_argument("--frames", type=int)
+    budget.add_argument("--cycles", type=int)
+    parser.add_argument("--until", choices=CONDITIONS, help="stop a ROM early when this condition is met")
+    parser.add_argument("--workers", type=int, help="processes (default: one per core)")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args(argv)
+
+    roms = find_roms(args.paths)
+    start = time.perf_counter()
+    results = run_batch(roms, args.frames, args.cycles, args.until, args.workers)
+    print_report(results, time.perf_counter() - start)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    return results
+
+
+if __name__ == "__main__":
+    main()
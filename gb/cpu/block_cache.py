@@ -0,0 +1,260 @@
+################################################################################
+# Basic-block translation cache
+#
+# Instead of fetching, decoding and dispatching one opcode at a time, a
+# straight-line run of instructions starting at PC is decoded once and turned
+# into a single python function with compile(). The opcode bodies come from
+# gb/cpu/instructions/specialized.py and immediate operands are baked in as
+# constants.
+#
+# A block ends after any instruction that changes the control flow (JR, JP,
+# CALL, RET, RST), HALT, STOP or EI, or after MAX_BLOCK_LENGTH instructions.
+#
+# Blocks keep to the timing of the interpreter:
+# - the cycle counter is set before every memory access, so IO reads (DIV,
+#   TIMA, ...) and events scheduled by writes see the right cycle
+# - before each instruction a block checks whether scheduler.stop has been
+#   reached. If so it runs the due events itself, like GameBoy.run_until()
+#   does between instructions, and carries on
+# - it returns early, before the next instruction, when an interrupt is
+#   pending or the end of GameBoy.run_until() is reached. The rest of the
+#   block becomes a block of its own
+#
+# Blocks are cached by (ROM bank, PC). Code in WRAM/HRAM can be overwritten,
+# so the MMU calls invalidate() when a byte covered by a block is written.
+# If that is the running block, it returns right after the write and the
+# interpreter carries on with the new code.
+################################################################################
+
+from gb.cpu.instructions.specialized import decode, decode_cb
+from gb.cpu.instructions.cycle_arr_1 import cycle_arr_1
+from gb.cpu.instructions.cycle_arr_2 import cycle_arr_2
+
+MAX_BLOCK_LENGTH = 64
+
+# instructions that end a block. CB prefixed instructions never do.
+BLOCK_ENDS = {
+    0x10, 0x76, 0xFB,                    # STOP, HALT, EI
+    0x18, 0x20, 0x28, 0x30, 0x38,        # JR
+    0xC2, 0xC3, 0xCA, 0xD2, 0xDA, 0xE9,  # JP
+    0xC4, 0xCC, 0xCD, 0xD4, 0xDC,        # CALL
+    0xC0, 0xC8, 0xC9, 0xD0, 0xD8, 0xD9,  # RET, RETI
+    0xC7, 0xCF, 0xD7, 0xDF, 0xE7, 0xEF, 0xF7, 0xFF,  # RST
+}
+
+OPERAND_SIZE = {None: 0, "d8": 1, "s8": 1, "d16": 2}
+
+
+class BlockExit(Exception):
+    """a block returns early, after `cycles` cycles"""
+    def __init__(self, cycles):
+        self.cycles = cycles
+
+
+def run_events(cpu, start, cycles, pc):
+    """
+    called by a block `cycles` into it, before the instruction at `pc`, once
+    scheduler.stop is reached. runs the due events and returns the new stop.
+    raises BlockExit if an interrupt is pending or run_until() is done
+    """
+    clock = cpu.mmu.scheduler
+    now = start + cycles
+    clock.cycles = now
+    if clock.next_event <= now:
+        clock.run_due()
+    if cpu.pending or clock.stop <= now:
+        cpu.registers.PC = pc
+        raise BlockExit(cycles)
+    return clock.stop
+
+
+def leave(cpu, cycles, pc):
+    """called by a block `cycles` into it that has overwritten its own code"""
+    cpu.registers.PC = pc
+    raise BlockExit(cycles)
+
+
+def region_end(pc):
+    """
+    end (exclusive) of the memory region code at `pc` can be translated in,
+    or 0 if code there is not translated (VRAM, external RAM, echo RAM, IO).
+    a block never crosses a region boundary.
+    """
+    if pc < 0x4000:
+        return 0x4000
+    if pc < 0x8000:
+        return 0x8000
+    if 0xC000 <= pc < 0xE000:
+        return 0xE000
+    if 0xFF80 <= pc < 0xFFFF:
+        return 0xFFFF
+    return 0
+
+
+class BlockCache():
+    def __init__(self, cpu):
+        self.mmu = cpu.mmu
+        self.lazy_flags = cpu.lazy_flags
+
+        # key -> (function, start, end)
+        # the key is PC for bank 0 and RAM, (bank << 16) | PC for banked ROM.
+        # this is (bank, PC) packed into one int, which hashes faster.
+        self.blocks = {}
+
+        # 256 byte page -> keys of RAM blocks overlapping it
+        self.page_blocks = {}
+
+        # the MMU marks bytes covered by RAM blocks in mmu.code_marks and
+        # calls invalidate() when one of them is written
+        self.mmu.block_cache = self
+
+        # key of the block execute() runs, set by invalidate() when it drops it
+        self.running = None
+        self.invalidated = False
+
+    def execute(self, cpu):
+        """run the block at PC. returns the cycles taken, 0 if there is no block"""
+        pc = cpu.registers.PC
+        if 0x4000 <= pc < 0x8000:
+            key = (getattr(self.mmu.mbc, "rom_bank", 1) << 16) | pc
+        else:
+            key = pc
+
+        block = self.blocks.get(key)
+        if block is None:
+            block = self.translate(key, pc)
+            if block is None:
+                return 0
+        self.running = key
+        self.invalidated = False
+        clock = self.mmu.scheduler
+        start = clock.cycles
+        try:
+            return block[0](cpu)
+        except BlockExit as e:
+            return e.cycles
+        finally:
+            # the block moves the clock for its memory accesses, advancing it
+            # by the cycles returned is up to the caller (run_until() or
+            # timer.step())
+            clock.cycles = start
+
+    def translate(self, key, pc):
+        """decode the block at pc, compile it and add it to the cache"""
+        mmu = self.mmu
+        end = region_end(pc)
+        if not end or (pc < 0x100 and mmu.boot_rom_enabled):
+            return None
+
+        lines = []
+        cycles = 0
+        ended = False
+        addr = pc
+        for _ in range(MAX_BLOCK_LENGTH):
+            opcode = mmu.read_byte(addr, ppu_read=True)
+            if opcode == 0xCB:
+                if addr + 1 >= end:
+                    break
+                cb_opcode = mmu.read_byte(addr + 1, ppu_read=True)
+                decoded = decode_cb(cb_opcode)
+                size = 2
+                op_cycles = cycle_arr_2[cb_opcode] + 4
+            else:
+                decoded = decode(opcode, self.lazy_flags)
+                size = 1
+                op_cycles = cycle_arr_1[opcode]
+            if decoded is None:
+                # unimplemented, leave it to the interpreter to raise
+                break
+
+            mnemonic, operand, body = decoded
+            size += OPERAND_SIZE[operand]
+            if addr + size > end:
+                break
+
+            lines.append(f"# {addr:04X}: {mnemonic}")
+            if cycles:
+                lines.append(f"if stop <= start + {cycles}: stop = run_events(cpu, start, {cycles}, 0x{addr:04X})")
+            code = "\n".join(body)
+            if "cpu.read_d8" in code or "cpu.write_d8" in code:
+                # IO handlers read the cycle counter
+                lines.append(f"clock.cycles = start + {cycles}")
+            if operand == "d8":
+                lines.append(f"d8 = 0x{mmu.read_byte(addr + 1, ppu_read=True):02X}")
+            elif operand == "s8":
+                value = mmu.read_byte(addr + 1, ppu_read=True)
+                lines.append(f"s8 = {(value ^ 0x80) - 0x80}")
+            elif operand == "d16":
+                lsb = mmu.read_byte(addr + 1, ppu_read=True)
+                msb = mmu.read_byte(addr + 2, ppu_read=True)
+                lines.append(f"d16 = 0x{(msb << 8) | lsb:04X}")
+
+            addr += size
+            cycles += op_cycles
+            if opcode in BLOCK_ENDS:
+                # jumps and calls read PC, which must point after the instruction
+                lines.append(f"r.PC = 0x{addr:04X}")
+                lines += body
+                ended = True
+                break
+            lines += body
+            if "cpu.write_d8" in code:
+                # the write may have scheduled an event or raised an interrupt
+                lines.append("stop = start if cpu.pending else clock.stop")
+                # or overwritten the rest of the block
+                lines.append(f"if cache.invalidated: leave(cpu, {cycles}, 0x{addr:04X})")
+
+        if not cycles:
+            return None
+        if not ended:
+            lines.append(f"r.PC = 0x{addr:04X}")
+
+        name = f"block_{key:06X}"
+        source = f"def {name}(cpu):\n    r = cpu.registers\n"
+        source += "    clock = cpu.mmu.scheduler\n    start = clock.cycles\n    stop = clock.stop\n"
+        source += "".join(f"    {line}\n" for line in lines)
+        source += f"    return {cycles}\n"
+        namespace = {"run_events": run_events, "leave": leave, "cache": self}
+        exec(compile(source, f"<block {key:06X}>", "exec"), namespace)
+
+        block = (namespace[name], pc, addr)
+        self.blocks[key] = block
+        if pc >= 0x8000:
+            self._mark(key, pc, addr)
+        return block
+
+    ############################################################################
+    # invalidation of blocks in RAM
+    ############################################################################
+
+    def _mark(self, key, start, end):
+        self.mmu.code_marks[start:end] = b"\x01" * (end - start)
+        for page in range(start >> 8, ((end - 1) >> 8) + 1):
+            self.page_blocks.setdefault(page, set()).add(key)
+
+    def invalidate(self, address):
+        """called by the MMU when a byte of a cached RAM block is written"""
+        keys = self.page_blocks.pop(address >> 8, ())
+        marks = self.mmu.code_marks
+        touched = set()
+        for key in keys:
+            if key == self.running:
+                self.invalidated = True
+            _, start, end = self.blocks.pop(key)
+            marks[start:end] = bytes(end - start)
+            for page in range(start >> 8, ((end - 1) >> 8) + 1):
+                touched.add(page)
+                if page in self.page_blocks:
+                    self.page_blocks[page].discard(key)
+
+        # blocks that are left might overlap the cleared bytes
+        for page in touched:
+            for key in self.page_blocks.get(page, ()):
+                _, start, end = self.blocks[key]
+                marks[start:end] = b"\x01" * (end - start)
+
+    def clear(self):
+        """drop every cached block"""
+        self.blocks.clear()
+        self.page_blocks.clear()
+        self.mmu.code_marks[:] = bytes(len(self.mmu.code_marks))
@@ -4,66 +4,110 @@
 ################################################################################
 
 from gb import cpu
-from .registers import Registers
+from .registers import make_registers
 from .instructions import OP_Handler
+from .block_cache import BlockCache
 from gb.util.bit_ops import d8_to_s8
 from gb.interupts import interrupt_handler
+from gb.util.execution_modes import EXECUTION_MODES
+from gb.util.trace_categories import TRACE_CATEGORIES
 
 class CPU():
-    def __init__(self, mmu):
+    def __init__(self, mmu, specialized=True, translate=False, lazy_flags=False):
+        # execution mode is chosen when constructing the MMU
+        # see gb/util/execution_modes.py
+        self.mode = mmu.mode
+        fast = self.mode == EXECUTION_MODES.FAST
+        if fast:
+            # bind check-free memory access, no `if fast` in the hot path
+            self.read_d8 = self._read_d8_fast
+            self.read_d16 = self._read_d16_fast
+            self.write_d8 = self._write_d8_fast
+
         # cpu registers
-        self.registers = Registers()
+        # lazy_flags=True only computes flags when they are read,
+        # see LazyRegisters in gb/cpu/registers.py
+        self.lazy_flags = lazy_flags
+        self.registers = make_registers(fast=fast, lazy_flags=lazy_flags)
 
         # memory management unit
         self.mmu = mmu
 
         # opcode handler
-        self.op_handler = OP_Handler()
+        # specialized=True uses the generated handlers in
+        # gb/cpu/instructions/specialized.py instead of the generic lambdas
+        self.op_handler = OP_Handler(specialized=specialized, lazy_flags=lazy_flags)
+
+        # translate=True runs straight-line blocks of code as single compiled
+        # functions, see gb/cpu/block_cache.py
+        self.block_cache = BlockCache(self) if translate else None
         
-        # Interupt Master Enable flag
-        self.ime = False
+        # Interupt Master Enable flag, see the ime property
+        self._ime = False
+
+        # IE & IF while IME is set, 0 otherwise. the only thing step() checks
+        # for interrupts, updated when IE, IF or IME change
+        self.pending = 0
+        mmu.watch_interrupts(self._update_pending)
         
         # When EI is called, the IME is enabled after the next instruction
         self.ime_requested = 0
         
         # Halted state
         self.halted = False
+
+        # replaced by traced versions while tracing, see gb/trace.py
+        self.interrupt_handler = interrupt_handler
+        mmu.tracer.add_hook(TRACE_CATEGORIES.CPU_OPCODE, self._install_opcode_trace, self._uninstall_opcode_trace)
+        mmu.tracer.add_hook(TRACE_CATEGORIES.INTERRUPT, self._install_interrupt_trace, self._uninstall_interrupt_trace)
         
         # if not self.mmu.boot_rom_enabled:
         #     # Setup CPU state as if boot rom has been run
         #     self.no_boot_rom_setup()  
 
+    @property
+    def ime(self):
+        return self._ime
+
+    @ime.setter
+    def ime(self, value):
+        self._ime = value
+        self._update_pending()
+
+    def _update_pending(self):
+        self.pending = self.mmu.interrupts if self._ime else 0
+
     def step(self):
         # Handle interrupts before executing next instruction
-        interrupt_cycles = interrupt_handler(self)
-        if interrupt_cycles > 0:
-            return interrupt_cycles
-        
-        # Halted state consumes 4 cycles
+        if self.pending:
+            return self.interrupt_handler(self)
+
         if self.halted:
-            return 4  
+            # hardware always wakes from HALT on any pending interrupt. with
+            # IME=0 it isn't serviced, execution just continues
+            if not self.mmu.interrupts:
+                # Halted state consumes 4 cycles
+                return 4
+            self.halted = False
 
         # for logging
         PC_before = self.registers.PC
 
-        # fetch
-        # PC += 1 is handled by read_d8
-        opcode = self.read_d8()
-        
-        # decode and execute
-        cycles = self.op_handler.execute_opcode(self, opcode)
+        # run a translated block when possible.
+        # not while an EI is pending (IME must be enabled after exactly one
+        # instruction) or during DMA (only HRAM can be read)
+        cycles = 0
+        if (self.block_cache is not None and not self.ime_requested
+                and not self.mmu.dma_transfer_enabled):
+            cycles = self.block_cache.execute(self)
 
-        # Handle DMA Transfer
-        for _ in range(cycles//4):  # DMA transfer happens every 4 cycles
-            if self.mmu.dma_transfer_enabled:
-                read_idx = self.mmu.dma_transfer_source + self.mmu.dma_transfer_index
-                data = self.mmu.read_byte(read_idx, ppu_read = True, transfer_read = True)
-                self.mmu.write_byte(0xFE00 + self.mmu.dma_transfer_index, data, ppu_write = True, transfer_write = True)
-                self.mmu.dma_transfer_index = self.mmu.dma_transfer_index + 1
+        if not cycles:
+            # fetch
+            # PC += 1 is handled by read_d8
+            opcode = self.read_d8()
 
-                # end dma transfer after 160 bytes
-                if self.mmu.dma_transfer_index == 160:
-                    self.mmu.dma_transfer_enabled = False
+            # decode and execute
+            cycles = self.op_handler.execute_opcode(self, opcode)
 
         # Optional debug logging; comment out for performance
         # print(f"Opcode {hex(opcode)} took {cycles:-2} cycles. PC: {hex(PC_before)}")
@@ -112,6 +156,52 @@ class CPU():
             raise ValueError(f"write_d8 value must be between 0 and 255, got {value} at address {hex(address)}")
         self.mmu.write_byte(address, value) 
 
+    # check-free versions of read_d8, read_d16 and write_d8 for EXECUTION_MODES.FAST
+
+    def _read_d8_fast(self, address=None):
+        if address is None:
+            registers = self.registers
+            address = registers.PC
+            registers.PC = address + 1
+        return self.mmu.read_byte(address)
+
+    def _read_d16_fast(self, address=None):
+        lsb = self.read_d8()
+        msb = self.read_d8()
+        return (msb << 8) | lsb
+
+    def _write_d8_fast(self, address=None, value=0):
+        if address is None:
+            address = self.registers.PC
+        self.mmu.write_byte(address, value)
+
+    ############################################################################
+    # Tracing (see gb/trace.py)
+    ############################################################################
+
+    def _install_opcode_trace(self):
+        # translated blocks run many opcodes at once, use the interpreter
+        self._untraced = (self.op_handler, self.block_cache)
+        self.op_handler = TracedOPHandler(self.op_handler, self.mmu.tracer)
+        self.block_cache = None
+
+    def _uninstall_opcode_trace(self):
+        self.op_handler, self.block_cache = self._untraced
+
+    def _install_interrupt_trace(self):
+        self.interrupt_handler = self._interrupt_handler_traced
+
+    def _uninstall_interrupt_trace(self):
+        self.interrupt_handler = interrupt_handler
+
+    def _interrupt_handler_traced(self, cpu):
+        pc = self.registers.PC
+        cycles = interrupt_handler(self)
+        vector = self.registers.PC
+        self.mmu.tracer.record(TRACE_CATEGORIES.INTERRUPT, (vector - 0x40) >> 3, vector, pc)
+        return cycles
+    ############################################################################
+
     def no_boot_rom_setup(self):
         """Setup CPU and MMU state as if boot rom has been run"""
         self.registers.AF = 0x01B0
@@ -122,7 +212,20 @@ class CPU():
         self.registers.PC = 0x0100
 
         # MMU state setup
+        # unmap the boot rom (FF50 = 1) so 0x0000-0x00FF is the cartridge
+        self.mmu.boot_rom_enabled = False
         self.mmu.io_regs[0x40] = 0x91  # LCDC
         self.mmu.io_regs[0x47] = 0xFC  # BGP
         self.mmu.io_regs[0x48] = 0xFF  # OBP0
         self.mmu.io_regs[0x49] = 0xFF  # OBP1;
+
+
+class TracedOPHandler():
+    """OP_Handler recording every opcode it executes as TRACE_CATEGORIES.CPU_OPCODE"""
+    def __init__(self, op_handler, tracer):
+        self.op_handler = op_handler
+        self.tracer = tracer
+
+    def execute_opcode(self, cpu, opcode):
+        self.tracer.record(TRACE_CATEGORIES.CPU_OPCODE, 0, cpu.registers.PC - 1, opcode)
+        return self.op_handler.execute_opcode(cpu, opcode)
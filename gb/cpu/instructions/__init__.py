@@ -27,6 +27,11 @@
 # 
 # for individual instruction implementations(with 0xCB prefixed) 
 #    - gb/cpu/instructions_funcs_2.py
+#
+# gb/cpu/instructions/specialized.py generates one flat function per opcode
+# from the same behavior with register access inlined. It is considerably
+# faster and the default, like in CPU(); OP_Handler(specialized=False) uses
+# the generic functions above.
 ################################################################################
 
 
@@ -36,6 +41,12 @@ from gb.cpu.instructions.array_1 import construct_code_array
 # opcode mapping for 0xCB prefixed opcodes
 from gb.cpu.instructions.array_2 import construct_cb_code_array
 
+# generated opcode mappings
+from gb.cpu.instructions.specialized import (
+    construct_specialized_code_array,
+    construct_specialized_cb_code_array,
+)
+
 # cycle count tables
 from gb.cpu.instructions.cycle_arr_1 import cycle_arr_1
 from gb.cpu.instructions.cycle_arr_2 import cycle_arr_2
@@ -47,9 +58,15 @@ from gb.cpu.instructions.cycle_arr_2 import cycle_arr_2
 class OP_Handler():
     __slots__ = ["code_arr", "cb_code_arr"]
     
-    def __init__(self):
-        self.code_arr = construct_code_array()
-        self.cb_code_arr = construct_cb_code_array()
+    def __init__(self, specialized=True, lazy_flags=False):
+        # lazy_flags only changes the specialized handlers, the generic ones
+        # go through the Registers.set_*_flags methods either way
+        if specialized:
+            self.code_arr = construct_specialized_code_array(lazy_flags)
+            self.cb_code_arr = construct_specialized_cb_code_array()
+        else:
+            self.code_arr = construct_code_array()
+            self.cb_code_arr = construct_cb_code_array()
 
     def run_code(self, cpu, code_num):
         fn = self.code_arr[code_num]
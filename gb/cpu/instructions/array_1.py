@@ -43,7 +43,7 @@ def construct_code_array():
     code_arr[0x0c] = lambda cpu: INC_r8(cpu, "C")
     code_arr[0x0d] = lambda cpu: DEC_r8(cpu, "C")
     code_arr[0x0e] = lambda cpu: LD_r8_d8(cpu, "C")
-    #
+    code_arr[0x0f] = lambda cpu: RRCA(cpu)
 
     # 0x10..0x1f
     code_arr[0x10] = lambda cpu: STOP(cpu)
@@ -71,7 +71,7 @@ def construct_code_array():
     code_arr[0x24] = lambda cpu: INC_r8(cpu, "H")
     code_arr[0x25] = lambda cpu: DEC_r8(cpu, "H")
     code_arr[0x26] = lambda cpu: LD_r8_d8(cpu, "H")
-    #
+    code_arr[0x27] = lambda cpu: DAA(cpu)
     code_arr[0x28] = lambda cpu: JR_cc_s8(cpu, cpu.registers.z_flag)
     code_arr[0x29] = lambda cpu: ADD_HL_r16(cpu, "HL")
     code_arr[0x2a] = lambda cpu: LD_A_HLID(cpu, increment=True)
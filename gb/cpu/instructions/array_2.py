@@ -5,6 +5,24 @@ def construct_cb_code_array():
     regs = ['B', 'C', 'D', 'E', 'H', 'L', None, 'A']
     
     # 0x00 - 0x0F
+    code_arr[0x00] = lambda cpu: RLC_r8(cpu, 'B')
+    code_arr[0x01] = lambda cpu: RLC_r8(cpu, 'C')
+    code_arr[0x02] = lambda cpu: RLC_r8(cpu, 'D')
+    code_arr[0x03] = lambda cpu: RLC_r8(cpu, 'E')
+    code_arr[0x04] = lambda cpu: RLC_r8(cpu, 'H')
+    code_arr[0x05] = lambda cpu: RLC_r8(cpu, 'L')
+    code_arr[0x06] = lambda cpu: RLC_r8(cpu, None, HL=True)
+    code_arr[0x07] = lambda cpu: RLC_r8(cpu, 'A')
+    code_arr[0x08] = lambda cpu: RRC_r8(cpu, 'B')
+    code_arr[0x09] = lambda cpu: RRC_r8(cpu, 'C')
+    code_arr[0x0a] = lambda cpu: RRC_r8(cpu, 'D')
+    code_arr[0x0b] = lambda cpu: RRC_r8(cpu, 'E')
+    code_arr[0x0c] = lambda cpu: RRC_r8(cpu, 'H')
+    code_arr[0x0d] = lambda cpu: RRC_r8(cpu, 'L')
+    code_arr[0x0e] = lambda cpu: RRC_r8(cpu, None, HL=True)
+    code_arr[0x0f] = lambda cpu: RRC_r8(cpu, 'A')
+
+    # 0x10 - 0x1F
     code_arr[0x10] = lambda cpu: RL_r8(cpu, 'B')
     code_arr[0x11] = lambda cpu: RL_r8(cpu, 'C')
     code_arr[0x12] = lambda cpu: RL_r8(cpu, 'D')
@@ -31,6 +49,14 @@ def construct_cb_code_array():
     code_arr[0x25] = lambda cpu: SLA_r8(cpu, 'L')
     code_arr[0x26] = lambda cpu: SLA_r8(cpu, None, HL=True)
     code_arr[0x27] = lambda cpu: SLA_r8(cpu, 'A')
+    code_arr[0x28] = lambda cpu: SRA_r8(cpu, 'B')
+    code_arr[0x29] = lambda cpu: SRA_r8(cpu, 'C')
+    code_arr[0x2a] = lambda cpu: SRA_r8(cpu, 'D')
+    code_arr[0x2b] = lambda cpu: SRA_r8(cpu, 'E')
+    code_arr[0x2c] = lambda cpu: SRA_r8(cpu, 'H')
+    code_arr[0x2d] = lambda cpu: SRA_r8(cpu, 'L')
+    code_arr[0x2e] = lambda cpu: SRA_r8(cpu, None, HL=True)
+    code_arr[0x2f] = lambda cpu: SRA_r8(cpu, 'A')
 
     # 0x30 - 0x3F
     code_arr[0x30] = lambda cpu: SWAP_r8(cpu, 'B')
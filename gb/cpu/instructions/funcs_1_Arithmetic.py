@@ -33,7 +33,7 @@ def ADD_HL_r16(cpu, r_name):
 
 ################################################################################
 # 8 bit arithmetic instructions
-#   - ADD, INC, DEC, ADC, SUB, SBC, CP
+#   - ADD, INC, DEC, ADC, SUB, SBC, CP, DAA
 ################################################################################
 
 def ADD_A_r8(cpu, r_name, HL=False, d8 = False):
@@ -46,12 +46,8 @@ def ADD_A_r8(cpu, r_name, HL=False, d8 = False):
     a = cpu.registers.A
     res = a + r
 
-    cpu.registers.z_flag = int((res & 0xff) == 0)
-    cpu.registers.n_flag = 0
-    # check overflow for the 3rd bit
-    cpu.registers.h_flag = int((a & 0xf) + (r & 0xf) > 0xf)
-    #  overflow for the 7th bit
-    cpu.registers.c_flag = int(res > 0xff)
+    # z: result is 0, n: 0, h: overflow for the 3rd bit, c: overflow for the 7th bit
+    cpu.registers.set_add_flags(a, r, res)
 
     cpu.registers.A = res & 0xff
 
@@ -66,10 +62,7 @@ def INC_r8(cpu, r_name, HL=False):
         val = getattr(cpu.registers, r_name)
         val = (val+1) & 0xff 
         setattr(cpu.registers, r_name, val)
-    cpu.registers.z_flag = int(val==0)
-    cpu.registers.n_flag = 0
-    # fine for inc but h_flag must be calculated differently for other ops
-    cpu.registers.h_flag = int(val&0xf == 0)
+    cpu.registers.set_inc_flags(val)
 
 def DEC_r8(cpu, r_name, HL=False):
     if HL:
@@ -82,9 +75,7 @@ def DEC_r8(cpu, r_name, HL=False):
         val = getattr(cpu.registers, r_name)
         val = (val-1) & 0xFF
         setattr(cpu.registers, r_name, val)
-    cpu.registers.z_flag = int(val==0)
-    cpu.registers.n_flag = 1
-    cpu.registers.h_flag = int(val&0xf == 0xf)
+    cpu.registers.set_dec_flags(val)
 
 def ADC_A_r8(cpu, r_name, HL=False, d8 = False):
     if HL:
@@ -97,10 +88,7 @@ def ADC_A_r8(cpu, r_name, HL=False, d8 = False):
     c = cpu.registers.c_flag
     res = a + r + c
 
-    cpu.registers.z_flag = int((res & 0xff) == 0)
-    cpu.registers.n_flag = 0
-    cpu.registers.h_flag = int((a & 0xf) + (r & 0xf) + c > 0xf)
-    cpu.registers.c_flag = int(res > 0xff)
+    cpu.registers.set_add_flags(a, r, res)
 
     cpu.registers.A = res & 0xff
 
@@ -114,11 +102,7 @@ def SUB_A_r8(cpu, r_name, HL=False, d8 = False):
     a = cpu.registers.A
     res = a - r
 
-    # %0x100 is used just in case
-    cpu.registers.z_flag = int((res & 0xff) == 0)
-    cpu.registers.n_flag = 1
-    cpu.registers.h_flag = int((a & 0xf) < (r & 0xf))
-    cpu.registers.c_flag = int(r > a)
+    cpu.registers.set_sub_flags(a, r, res)
 
     cpu.registers.A = res & 0xff
 
@@ -134,12 +118,8 @@ def SBC_A_r8(cpu, r_name, HL=False, d8 = False):
     c = cpu.registers.c_flag
     res = a - (r + c)
 
-    cpu.registers.z_flag = int((res & 0xff) == 0)
-    cpu.registers.n_flag = 1
-    # check burrowing for the 4th bit
-    cpu.registers.h_flag = int((a & 0xf) < ((r & 0xf) + c))
-    # check burrow (if negative)
-    cpu.registers.c_flag = int(r + c > a)
+    # h: burrowing for the 4th bit, c: burrow (if negative)
+    cpu.registers.set_sub_flags(a, r, res)
 
     cpu.registers.A = res & 0xFF
 
@@ -158,7 +138,30 @@ def CP_A_r8(cpu, r_name, HL=False, d8 = False):
     a = cpu.registers.A
     res = a - r
 
-    cpu.registers.z_flag = int((res & 0xff) == 0)
-    cpu.registers.n_flag = 1
-    cpu.registers.h_flag = int((a & 0xf) < (r & 0xf))
-    cpu.registers.c_flag = int(r > a)
+    cpu.registers.set_sub_flags(a, r, res)
+
+def DAA(cpu):
+    """
+    Decimal adjust A after a BCD addition or subtraction (0x27).
+    Uses the n, h and c flags of the last operation to correct each nibble.
+    https://gekkio.fi/files/gb-docs/gbctr.pdf (page 85-DAA)
+    """
+    a = cpu.registers.A
+    c = cpu.registers.c_flag
+    if cpu.registers.n_flag:
+        if c:
+            a -= 0x60
+        if cpu.registers.h_flag:
+            a -= 0x06
+    else:
+        if c or a > 0x99:
+            a += 0x60
+            c = 1
+        if cpu.registers.h_flag or (a & 0x0F) > 0x09:
+            a += 0x06
+    a &= 0xFF
+
+    cpu.registers.A = a
+    cpu.registers.z_flag = int(a == 0)
+    cpu.registers.h_flag = 0
+    cpu.registers.c_flag = c
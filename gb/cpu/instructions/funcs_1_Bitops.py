@@ -17,6 +17,23 @@ def RRA(cpu):
     cpu.registers.h_flag = 0
     cpu.registers.c_flag = bit_0
 
+def RRCA(cpu):
+    """
+    Used in 0x0f.
+    Rotate A right. Old bit 0 to carry and bit 7.
+    https://gekkio.fi/files/gb-docs/gbctr.pdf (page 84-RRCA)
+    """
+    value = cpu.registers.A
+    bit_0 = value & 0x1
+    result = ((value >> 1) | (bit_0 << 7)) & 0xFF
+    
+    cpu.registers.A = result
+    
+    cpu.registers.z_flag = 0  # Always 0 for RRCA
+    cpu.registers.n_flag = 0
+    cpu.registers.h_flag = 0
+    cpu.registers.c_flag = bit_0
+
 def RLCA(cpu):
     """
     Used in 0x07.
@@ -1,5 +1,49 @@
 """functions that are used for opcodes with 0xCB prefix"""
 
+def RLC_r8(cpu, reg, HL=False):
+    """
+    Rotate register left. Old bit 7 goes to carry and bit 0.
+    Like RLCA (0x07), but z_flag is set according to result.
+    https://gekkio.fi/files/gb-docs/gbctr.pdf (page 84-RLCA, RLC r8-90)
+    """
+    val = getattr(cpu.registers, reg) if not HL else cpu.read_d8(cpu.registers.HL)
+    bit_7 = (val >> 7) & 0x1
+    val = ((val << 1) | bit_7) & 0xFF
+
+    # Write result back
+    if HL:
+        cpu.write_d8(cpu.registers.HL, val)
+    else:
+        setattr(cpu.registers, reg, val)
+
+    # Set flags
+    cpu.registers.z_flag = int(val == 0)
+    cpu.registers.n_flag = 0
+    cpu.registers.h_flag = 0
+    cpu.registers.c_flag = bit_7
+
+def RRC_r8(cpu, reg, HL=False):
+    """
+    Rotate register right. Old bit 0 goes to carry and bit 7.
+    Like RRCA (0x0F), but z_flag is set according to result.
+    https://gekkio.fi/files/gb-docs/gbctr.pdf (page 84-RRCA, RRC r8-91)
+    """
+    val = getattr(cpu.registers, reg) if not HL else cpu.read_d8(cpu.registers.HL)
+    bit_0 = val & 0x1
+    val = (val >> 1) | (bit_0 << 7)
+
+    # Write result back
+    if HL:
+        cpu.write_d8(cpu.registers.HL, val)
+    else:
+        setattr(cpu.registers, reg, val)
+
+    # Set flags
+    cpu.registers.z_flag = int(val == 0)
+    cpu.registers.n_flag = 0
+    cpu.registers.h_flag = 0
+    cpu.registers.c_flag = bit_0
+
 def RL_r8(cpu, reg, HL=False):
     """
     Rotate register left through carry (0x17).
@@ -70,6 +114,30 @@ def SLA_r8(cpu, reg, HL=False):
     cpu.registers.h_flag = 0
     cpu.registers.c_flag = bit_7
 
+def SRA_r8(cpu, reg, HL=False):
+    """
+    Shifts the 8-bit register r value right by one bit using an arithmetic
+    shift, bit 7 keeps its value.
+    """
+    if HL:
+        val = cpu.read_d8(cpu.registers.HL)
+    else:
+        val = getattr(cpu.registers, reg)
+
+    bit_0 = val & 0x1
+    val = (val >> 1) | (val & 0x80)
+
+    # write back
+    if HL:
+        cpu.write_d8(cpu.registers.HL, val)
+    else:
+        setattr(cpu.registers, reg, val)
+
+    cpu.registers.z_flag = int(val == 0)
+    cpu.registers.n_flag = 0
+    cpu.registers.h_flag = 0
+    cpu.registers.c_flag = bit_0
+
 def SWAP_r8(cpu, reg, HL=False):
     """
     shift lower nibble to upper nibble and upper nibble to lower nibble.
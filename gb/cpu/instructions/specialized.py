@@ -0,0 +1,525 @@
+################################################################################
+# Specialized opcode handlers
+#
+# construct_code_array() and construct_cb_code_array() bind opcodes to generic
+# functions through lambdas like `lambda cpu: INC_r8(cpu, "B")`, and the
+# generic functions then use getattr/setattr and the flag properties.
+#
+# This module generates one flat function per opcode (256 + 256 CB) at import
+# time with the register names and flag math inlined, so that executing an
+# opcode costs a single python call. The generated functions behave exactly
+# like the generic ones (see tests/test_specialized_handlers.py).
+#
+# With lazy_flags=True the 8 bit ALU operations record their operands for
+# LazyRegisters (gb/cpu/registers.py) instead of computing F.
+#
+# The source of each handler can be inspected with opcode_source(), e.g.
+#     print(opcode_source(0x04))
+################################################################################
+
+from gb.cpu.registers import LAZY_ADD, LAZY_SUB, LAZY_INC, LAZY_DEC
+
+R8 = ["B", "C", "D", "E", "H", "L", None, "A"]
+R16 = ["BC", "DE", "HL", "SP"]
+R16_STACK = ["BC", "DE", "HL", "AF"]
+
+# flag bits (same as Registers.Z_FLAG, ...)
+Z, N, H, C = 0x80, 0x40, 0x20, 0x10
+
+# conditions for JR/JP/CALL/RET cc. None means always
+CONDITIONS = {
+    "NZ": "not r.F & 0x80",
+    "Z": "r.F & 0x80",
+    "NC": "not r.F & 0x10",
+    "C": "r.F & 0x10",
+    None: None,
+}
+
+# operands read from the instruction stream before the body runs
+OPERAND_READS = {
+    "d8": "d8 = cpu.read_d8()",
+    "s8": "s8 = cpu.read_s8()",
+    "d16": "d16 = cpu.read_d16()",
+}
+
+
+################################################################################
+# helpers for building source lines
+################################################################################
+
+def _get16(pair):
+    """expression reading a 16 bit register"""
+    if pair == "SP":
+        return "r.SP"
+    return f"((r.{pair[0]} << 8) | r.{pair[1]})"
+
+def _set16(pair, expr):
+    """lines writing the 16 bit value `expr` to a register pair"""
+    if pair == "SP":
+        return [f"r.SP = {expr}"]
+    if pair == "AF":
+        # only the upper nibble of F exists
+        return [f"v16 = {expr}", "r.A = v16 >> 8", "r.F = v16 & 0xF0"]
+    return [f"v16 = {expr}", f"r.{pair[0]} = v16 >> 8", f"r.{pair[1]} = v16 & 0xFF"]
+
+def _set_flags(z=None, n=None, h=None, c=None, lazy_flags=False):
+    """
+    line updating F in one assignment.
+    each argument is either None (flag untouched), 0, 1 or an expression
+    evaluating to a bool. flags that are not touched keep their value.
+    with lazy_flags the lower nibble of F is always 0, so F is not read
+    when all four flags are set.
+    """
+    keep = 0xFF
+    parts = []
+    for bit, value in ((Z, z), (N, n), (H, h), (C, c)):
+        if value is None:
+            continue
+        keep &= ~bit & 0xFF
+        if value == 1:
+            parts.append(f"0x{bit:02X}")
+        elif value == 0:
+            continue
+        else:
+            parts.append(f"(0x{bit:02X} if {value} else 0)")
+    if not (lazy_flags and keep == 0x0F):
+        parts.insert(0, f"(r.F & 0x{keep:02X})")
+    return "r.F = " + (" | ".join(parts) or "0")
+
+def _push(expr):
+    """lines pushing 16 bit `expr` onto the stack (msb first)"""
+    return [
+        f"v16 = {expr}",
+        "sp = (r.SP - 1) & 0xFFFF",
+        "cpu.write_d8(sp, (v16 >> 8) & 0xFF)",
+        "sp = (sp - 1) & 0xFFFF",
+        "r.SP = sp",
+        "cpu.write_d8(sp, v16 & 0xFF)",
+    ]
+
+def _pop():
+    """lines popping a 16 bit value from the stack into `v16`"""
+    return [
+        "sp = r.SP",
+        "lsb = cpu.read_d8(sp)",
+        "sp = (sp + 1) & 0xFFFF",
+        "msb = cpu.read_d8(sp)",
+        "r.SP = (sp + 1) & 0xFFFF",
+        "v16 = (msb << 8) | lsb",
+    ]
+
+def _read8(reg):
+    """lines loading r8 (or [HL] when reg is None) into `v`"""
+    if reg is None:
+        return [f"addr = {_get16('HL')}", "v = cpu.read_d8(addr)"]
+    return [f"v = r.{reg}"]
+
+def _write8(reg):
+    """lines storing `v` back into r8 (or [HL] when reg is None)"""
+    if reg is None:
+        return ["cpu.write_d8(addr, v)"]
+    return [f"r.{reg} = v"]
+
+def _reg_name(reg):
+    return "[HL]" if reg is None else reg
+
+def _record_flags(op, a, b, res):
+    """lines recording an ALU operation for LazyRegisters"""
+    return [f"r._flag_op = {op}", f"r._flag_a = {a}", f"r._flag_b = {b}", f"r._flag_res = {res}"]
+
+def _record_inc_dec_flags(op, res):
+    """lines recording INC/DEC for LazyRegisters, the carry flag is kept"""
+    return ["r._flag_a = r.F & 0x10", f"r._flag_op = {op}", f"r._flag_res = {res}"]
+
+
+################################################################################
+# 8 bit ALU (0x80..0xBF and the d8 variants)
+################################################################################
+
+def _alu(op, src_lines, lazy_flags=False):
+    """body for ADD/ADC/SUB/SBC/AND/XOR/OR/CP A, v"""
+    lines = list(src_lines) + ["a = r.A"]
+    if op == "ADD":
+        lines += ["res = a + v"]
+        if lazy_flags:
+            lines += _record_flags(LAZY_ADD, "a", "v", "res")
+        else:
+            lines += [_set_flags(z="not res & 0xFF", n=0, h="(a & 0xF) + (v & 0xF) > 0xF", c="res > 0xFF")]
+        lines += ["r.A = res & 0xFF"]
+    elif op == "ADC":
+        lines += ["c = (r.F >> 4) & 1", "res = a + v + c"]
+        if lazy_flags:
+            lines += _record_flags(LAZY_ADD, "a", "v", "res")
+        else:
+            lines += [_set_flags(z="not res & 0xFF", n=0, h="(a & 0xF) + (v & 0xF) + c > 0xF", c="res > 0xFF")]
+        lines += ["r.A = res & 0xFF"]
+    elif op == "SUB":
+        lines += ["res = a - v"]
+        if lazy_flags:
+            lines += _record_flags(LAZY_SUB, "a", "v", "res")
+        else:
+            lines += [_set_flags(z="not res & 0xFF", n=1, h="(a & 0xF) < (v & 0xF)", c="v > a")]
+        lines += ["r.A = res & 0xFF"]
+    elif op == "SBC":
+        lines += ["c = (r.F >> 4) & 1", "res = a - (v + c)"]
+        if lazy_flags:
+            lines += _record_flags(LAZY_SUB, "a", "v", "res")
+        else:
+            lines += [_set_flags(z="not res & 0xFF", n=1, h="(a & 0xF) < ((v & 0xF) + c)", c="v + c > a")]
+        lines += ["r.A = res & 0xFF"]
+    elif op == "AND":
+        lines += ["res = a & v", "r.A = res", _set_flags(z="not res", n=0, h=1, c=0, lazy_flags=lazy_flags)]
+    elif op == "XOR":
+        lines += ["res = a ^ v", "r.A = res", _set_flags(z="not res", n=0, h=0, c=0, lazy_flags=lazy_flags)]
+    elif op == "OR":
+        lines += ["res = a | v", "r.A = res", _set_flags(z="not res", n=0, h=0, c=0, lazy_flags=lazy_flags)]
+    elif op == "CP":
+        if lazy_flags:
+            lines += _record_flags(LAZY_SUB, "a", "v", "a - v")
+        else:
+            lines += [_set_flags(z="a == v", n=1, h="(a & 0xF) < (v & 0xF)", c="v > a")]
+    return lines
+
+ALU_OPS = ["ADD", "ADC", "SUB", "SBC", "AND", "XOR", "OR", "CP"]
+
+
+################################################################################
+# decoding: opcode -> (mnemonic, operand, body lines)
+# a body may use the names cpu, r (cpu.registers) and the operand read
+# before it (d8, s8 or d16). Returning None means there is no such
+# instruction (the illegal opcodes 0xD3, 0xDB, ...), the same opcodes that
+# are None in array_1.py / array_2.py.
+################################################################################
+
+def decode(opcode, lazy_flags=False):
+    """decode an unprefixed opcode"""
+    x, y, z = opcode >> 6, (opcode >> 3) & 7, opcode & 7
+
+    # 0x40..0x7F LD r8, r8 (and HALT)
+    if x == 1:
+        if opcode == 0x76:
+            return "HALT", None, ["cpu.halted = True"]
+        dst, src = R8[y], R8[z]
+        name = f"LD {_reg_name(dst)},{_reg_name(src)}"
+        if dst is None:
+            return name, None, [f"cpu.write_d8({_get16('HL')}, r.{src})"]
+        if src is None:
+            return name, None, [f"r.{dst} = cpu.read_d8({_get16('HL')})"]
+        if dst == src:
+            return name, None, ["pass"]
+        return name, None, [f"r.{dst} = r.{src}"]
+
+    # 0x80..0xBF ALU A, r8
+    if x == 2:
+        return f"{ALU_OPS[y]} A,{_reg_name(R8[z])}", None, _alu(ALU_OPS[y], _read8(R8[z]), lazy_flags)
+
+    # ALU A, d8
+    if x == 3 and z == 6:
+        return f"{ALU_OPS[y]} A,d8", "d8", _alu(ALU_OPS[y], ["v = d8"], lazy_flags)
+
+    # RST n
+    if x == 3 and z == 7:
+        return f"RST {y * 8:02X}h", None, _push("r.PC") + [f"r.PC = {y * 8}"]
+
+    if x == 0:
+        p, q = y >> 1, y & 1
+        reg = R8[y]
+
+        if z == 1 and q == 0:
+            return f"LD {R16[p]},d16", "d16", _set16(R16[p], "d16")
+        if z == 1 and q == 1:
+            return f"ADD HL,{R16[p]}", None, [
+                f"v = {_get16(R16[p])}",
+                f"hl = {_get16('HL')}",
+                "res = hl + v",
+                _set_flags(n=0, h="(hl & 0x0FFF) + (v & 0x0FFF) > 0x0FFF", c="res > 0xFFFF"),
+            ] + _set16("HL", "res & 0xFFFF")
+        if z == 3 and q == 0:
+            return f"INC {R16[p]}", None, _set16(R16[p], f"({_get16(R16[p])} + 1) & 0xFFFF")
+        if z == 3 and q == 1:
+            return f"DEC {R16[p]}", None, _set16(R16[p], f"({_get16(R16[p])} - 1) & 0xFFFF")
+        if z == 4:
+            if lazy_flags:
+                flags = _record_inc_dec_flags(LAZY_INC, "v")
+            else:
+                flags = [_set_flags(z="not v", n=0, h="not v & 0xF")]
+            return f"INC {_reg_name(reg)}", None, _read8(reg) + ["v = (v + 1) & 0xFF"] + _write8(reg) + flags
+        if z == 5:
+            if lazy_flags:
+                flags = _record_inc_dec_flags(LAZY_DEC, "v")
+            else:
+                flags = [_set_flags(z="not v", n=1, h="v & 0xF == 0xF")]
+            return f"DEC {_reg_name(reg)}", None, _read8(reg) + ["v = (v - 1) & 0xFF"] + _write8(reg) + flags
+        if z == 6:
+            if reg is None:
+                return "LD [HL],d8", "d8", [f"cpu.write_d8({_get16('HL')}, d8)"]
+            return f"LD {reg},d8", "d8", [f"r.{reg} = d8"]
+
+    return _IRREGULAR.get(opcode)
+
+
+def decode_cb(opcode):
+    """decode a 0xCB prefixed opcode"""
+    x, y, z = opcode >> 6, (opcode >> 3) & 7, opcode & 7
+    reg = R8[z]
+    name = _reg_name(reg)
+
+    if x == 0:
+        if y == 0:
+            return f"RLC {name}", None, _read8(reg) + [
+                "c = v >> 7",
+                "v = ((v << 1) | c) & 0xFF",
+            ] + _write8(reg) + [_set_flags(z="not v", n=0, h=0, c="c")]
+        if y == 1:
+            return f"RRC {name}", None, _read8(reg) + [
+                "c = v & 0x1",
+                "v = (v >> 1) | (c << 7)",
+            ] + _write8(reg) + [_set_flags(z="not v", n=0, h=0, c="c")]
+        if y == 2:
+            return f"RL {name}", None, _read8(reg) + [
+                "c = v >> 7",
+                "v = ((v << 1) | ((r.F >> 4) & 1)) & 0xFF",
+            ] + _write8(reg) + [_set_flags(z="not v", n=0, h=0, c="c")]
+        if y == 3:
+            return f"RR {name}", None, _read8(reg) + [
+                "c = v & 0x1",
+                "v = (v >> 1) | ((r.F << 3) & 0x80)",
+            ] + _write8(reg) + [_set_flags(z="not v", n=0, h=0, c="c")]
+        if y == 4:
+            return f"SLA {name}", None, _read8(reg) + [
+                "c = v >> 7",
+                "v = (v << 1) & 0xFF",
+            ] + _write8(reg) + [_set_flags(z="not v", n=0, h=0, c="c")]
+        if y == 5:
+            return f"SRA {name}", None, _read8(reg) + [
+                "c = v & 0x1",
+                "v = (v >> 1) | (v & 0x80)",
+            ] + _write8(reg) + [_set_flags(z="not v", n=0, h=0, c="c")]
+        if y == 6:
+            return f"SWAP {name}", None, _read8(reg) + [
+                "v = ((v & 0x0F) << 4) | ((v >> 4) & 0x0F)",
+            ] + _write8(reg) + [_set_flags(z="not v", n=0, h=0, c=0)]
+        if y == 7:
+            return f"SRL {name}", None, _read8(reg) + [
+                "c = v & 0x1",
+                "v = v >> 1",
+            ] + _write8(reg) + [_set_flags(z="not v", n=0, h=0, c="c")]
+
+    mask = 1 << y
+    if x == 1:
+        return f"BIT {y},{name}", None, _read8(reg) + [_set_flags(z=f"not v & 0x{mask:02X}", n=0, h=1)]
+    if x == 2:
+        return f"RES {y},{name}", None, _read8(reg) + [f"v = v & 0x{~mask & 0xFF:02X}"] + _write8(reg)
+    return f"SET {y},{name}", None, _read8(reg) + [f"v = v | 0x{mask:02X}"] + _write8(reg)
+
+
+def _jr(cond):
+    check = CONDITIONS[cond]
+    lines = ["r.PC = (r.PC + s8) & 0xFFFF"]
+    if check:
+        lines = [f"if {check}:"] + ["    " + l for l in lines]
+    return lines
+
+def _jp(cond):
+    check = CONDITIONS[cond]
+    if check:
+        return [f"if {check}:", "    r.PC = d16"]
+    return ["r.PC = d16"]
+
+def _call(cond):
+    check = CONDITIONS[cond]
+    lines = _push("r.PC") + ["r.PC = d16"]
+    if check:
+        lines = [f"if {check}:"] + ["    " + l for l in lines]
+    return lines
+
+def _ret(cond):
+    check = CONDITIONS[cond]
+    lines = _pop() + ["r.PC = v16"]
+    if check:
+        lines = [f"if {check}:"] + ["    " + l for l in lines]
+    return lines
+
+def _sp_plus_s8():
+    """shared by ADD SP,s8 and LD HL,SP+s8. leaves the result in `res`"""
+    return [
+        "sp = r.SP",
+        _set_flags(z=0, n=0, h="(sp & 0x0F) + (d8 & 0x0F) > 0x0F", c="(sp & 0xFF) + d8 > 0xFF"),
+        "res = (sp + ((d8 ^ 0x80) - 0x80)) & 0xFFFF",
+    ]
+
+_IRREGULAR = {
+    0x00: ("NOP", None, ["pass"]),
+    0x02: ("LD [BC],A", None, [f"cpu.write_d8({_get16('BC')}, r.A)"]),
+    0x07: ("RLCA", None, [
+        "c = r.A >> 7",
+        "r.A = ((r.A << 1) | c) & 0xFF",
+        _set_flags(z=0, n=0, h=0, c="c"),
+    ]),
+    0x08: ("LD [d16],SP", "d16", [
+        "sp = r.SP",
+        "cpu.write_d8(d16, sp & 0xFF)",
+        "cpu.write_d8(d16 + 1, (sp >> 8) & 0xFF)",
+    ]),
+    0x0A: ("LD A,[BC]", None, [f"r.A = cpu.read_d8({_get16('BC')})"]),
+    0x0F: ("RRCA", None, [
+        "c = r.A & 0x1",
+        "r.A = (r.A >> 1) | (c << 7)",
+        _set_flags(z=0, n=0, h=0, c="c"),
+    ]),
+    0x10: ("STOP", None, ["cpu.halted = True"]),
+    0x12: ("LD [DE],A", None, [f"cpu.write_d8({_get16('DE')}, r.A)"]),
+    0x17: ("RLA", None, [
+        "a = r.A",
+        "c = a >> 7",
+        "r.A = ((a << 1) | ((r.F >> 4) & 1)) & 0xFF",
+        _set_flags(z=0, n=0, h=0, c="c"),
+    ]),
+    0x18: ("JR s8", "s8", _jr(None)),
+    0x1A: ("LD A,[DE]", None, [f"r.A = cpu.read_d8({_get16('DE')})"]),
+    0x1F: ("RRA", None, [
+        "a = r.A",
+        "c = a & 0x1",
+        "r.A = ((a >> 1) | (c << 7)) & 0xFF",
+        _set_flags(z=0, n=0, h=0, c="c"),
+    ]),
+    0x20: ("JR NZ,s8", "s8", _jr("NZ")),
+    0x22: ("LD [HL+],A", None, [
+        f"hl = {_get16('HL')}",
+        "cpu.write_d8(hl, r.A)",
+    ] + _set16("HL", "(hl + 1) & 0xFFFF")),
+    0x27: ("DAA", None, [
+        "a = r.A",
+        "f = r.F",
+        "c = f & 0x10",
+        "if f & 0x40:",
+        "    if c:",
+        "        a -= 0x60",
+        "    if f & 0x20:",
+        "        a -= 0x06",
+        "else:",
+        "    if c or a > 0x99:",
+        "        a += 0x60",
+        "        c = 1",
+        "    if f & 0x20 or (a & 0x0F) > 0x09:",
+        "        a += 0x06",
+        "a &= 0xFF",
+        "r.A = a",
+        _set_flags(z="not a", h=0, c="c"),
+    ]),
+    0x28: ("JR Z,s8", "s8", _jr("Z")),
+    0x2A: ("LD A,[HL+]", None, [
+        f"hl = {_get16('HL')}",
+        "r.A = cpu.read_d8(hl)",
+    ] + _set16("HL", "(hl + 1) & 0xFFFF")),
+    0x2F: ("CPL", None, ["r.A = 0xFF - r.A", _set_flags(n=1, h=1)]),
+    0x30: ("JR NC,s8", "s8", _jr("NC")),
+    0x32: ("LD [HL-],A", None, [
+        f"hl = {_get16('HL')}",
+        "cpu.write_d8(hl, r.A)",
+    ] + _set16("HL", "(hl - 1) & 0xFFFF")),
+    0x37: ("SCF", None, [_set_flags(n=0, h=0, c=1)]),
+    0x38: ("JR C,s8", "s8", _jr("C")),
+    0x3A: ("LD A,[HL-]", None, [
+        f"hl = {_get16('HL')}",
+        "r.A = cpu.read_d8(hl)",
+    ] + _set16("HL", "(hl - 1) & 0xFFFF")),
+    0x3F: ("CCF", None, ["r.F = (r.F & 0x8F) | ((r.F & 0x10) ^ 0x10)"]),
+
+    0xC0: ("RET NZ", None, _ret("NZ")),
+    0xC2: ("JP NZ,d16", "d16", _jp("NZ")),
+    0xC3: ("JP d16", "d16", _jp(None)),
+    0xC4: ("CALL NZ,d16", "d16", _call("NZ")),
+    0xC8: ("RET Z", None, _ret("Z")),
+    0xC9: ("RET", None, _ret(None)),
+    0xCA: ("JP Z,d16", "d16", _jp("Z")),
+    0xCC: ("CALL Z,d16", "d16", _call("Z")),
+    0xCD: ("CALL d16", "d16", _call(None)),
+    0xD0: ("RET NC", None, _ret("NC")),
+    0xD2: ("JP NC,d16", "d16", _jp("NC")),
+    0xD4: ("CALL NC,d16", "d16", _call("NC")),
+    0xD8: ("RET C", None, _ret("C")),
+    0xD9: ("RETI", None, _pop() + ["r.PC = v16", "cpu.ime = True"]),
+    0xDA: ("JP C,d16", "d16", _jp("C")),
+    0xDC: ("CALL C,d16", "d16", _call("C")),
+    0xE0: ("LDH [d8],A", "d8", ["cpu.write_d8(0xFF00 + d8, r.A)"]),
+    0xE2: ("LDH [C],A", None, ["cpu.write_d8(0xFF00 + r.C, r.A)"]),
+    0xE8: ("ADD SP,s8", "d8", _sp_plus_s8() + ["r.SP = res"]),
+    0xE9: ("JP HL", None, [f"r.PC = {_get16('HL')}"]),
+    0xEA: ("LD [d16],A", "d16", ["cpu.write_d8(d16, r.A)"]),
+    0xF0: ("LDH A,[d8]", "d8", ["r.A = cpu.read_d8(0xFF00 + d8)"]),
+    0xF2: ("LDH A,[C]", None, ["r.A = cpu.read_d8(0xFF00 + r.C)"]),
+    0xF3: ("DI", None, ["cpu.ime = False"]),
+    0xF8: ("LD HL,SP+s8", "d8", _sp_plus_s8() + _set16("HL", "res")),
+    0xF9: ("LD SP,HL", None, [f"r.SP = {_get16('HL')}"]),
+    0xFA: ("LD A,[d16]", "d16", ["r.A = cpu.read_d8(d16)"]),
+    0xFB: ("EI", None, ["cpu.ime_requested = 2"]),
+}
+
+# POP/PUSH rr
+for _p, _pair in enumerate(R16_STACK):
+    _IRREGULAR[0xC1 | (_p << 4)] = (f"POP {_pair}", None, _pop() + _set16(_pair, "v16"))
+    _push_val = "((r.A << 8) | r.F)" if _pair == "AF" else _get16(_pair)
+    _IRREGULAR[0xC5 | (_p << 4)] = (f"PUSH {_pair}", None, _push(_push_val))
+
+
+################################################################################
+# code generation
+################################################################################
+
+def _function_name(opcode, mnemonic, cb):
+    prefix = "op_cb" if cb else "op"
+    clean = "".join(ch if ch.isalnum() else "_" for ch in mnemonic)
+    return f"{prefix}_{opcode:02X}_{clean}"
+
+def opcode_source(opcode, cb=False, lazy_flags=False):
+    """source code of the specialized handler for `opcode` (None if unimplemented)"""
+    decoded = decode_cb(opcode) if cb else decode(opcode, lazy_flags)
+    if decoded is None:
+        return None
+    mnemonic, operand, body = decoded
+    lines = [f"def {_function_name(opcode, mnemonic, cb)}(cpu):", f'    """{mnemonic}"""', "    r = cpu.registers"]
+    if operand:
+        lines.append("    " + OPERAND_READS[operand])
+    lines += ["    " + l for l in body]
+    return "\n".join(lines) + "\n"
+
+def _build(cb, lazy_flags=False):
+    source = []
+    names = [None] * 256
+    for opcode in range(256):
+        if not cb and opcode == 0xCB:
+            continue
+        src = opcode_source(opcode, cb, lazy_flags)
+        if src is None:
+            continue
+        source.append(src)
+        mnemonic = (decode_cb(opcode) if cb else decode(opcode))[0]
+        names[opcode] = _function_name(opcode, mnemonic, cb)
+
+    namespace = {}
+    filename = "<specialized cb opcodes>" if cb else "<specialized opcodes>"
+    exec(compile("\n".join(source), filename, "exec"), namespace)
+    return [namespace[name] if name else None for name in names]
+
+def construct_specialized_code_array(lazy_flags=False):
+    """like construct_code_array() but with generated handlers"""
+    if lazy_flags:
+        global _LAZY_CODE_ARR
+        if _LAZY_CODE_ARR is None:
+            _LAZY_CODE_ARR = _build(cb=False, lazy_flags=True)
+        return list(_LAZY_CODE_ARR)
+    return list(_CODE_ARR)
+
+def construct_specialized_cb_code_array():
+    """
+    like construct_cb_code_array() but with generated handlers.
+    CB prefixed opcodes don't use ADD/SUB/INC/DEC flags, so there is no
+    lazy_flags variant.
+    """
+    return list(_CB_CODE_ARR)
+
+# generated once at import time, the lazy flags variant on first use
+_CODE_ARR = _build(cb=False)
+_CB_CODE_ARR = _build(cb=True)
+_LAZY_CODE_ARR = None
@@ -157,6 +157,39 @@ class Registers():
     def c_flag(self, value):
         self._set_flag(self.C_FLAG, value)
 
+    # setting all flags after an 8 bit ALU operation.
+    # a and b are the operands, res is the result before masking to 8 bits
+    # (ADC/SBC include the carry in res). The half carry is bit 4 of
+    # a ^ b ^ res, which is the carry (or borrow) out of bit 3.
+    # LazyRegisters records these instead of computing them.
+    def set_add_flags(self, a, b, res):
+        """flags for ADD/ADC"""
+        self.F = ((self.F & 0x0F)
+                  | (0 if res & 0xFF else 0x80)
+                  | ((a ^ b ^ res) & 0x10) << 1
+                  | (0x10 if res > 0xFF else 0))
+
+    def set_sub_flags(self, a, b, res):
+        """flags for SUB/SBC/CP"""
+        self.F = ((self.F & 0x0F)
+                  | (0 if res & 0xFF else 0x80)
+                  | 0x40
+                  | ((a ^ b ^ res) & 0x10) << 1
+                  | (0x10 if res < 0 else 0))
+
+    def set_inc_flags(self, res):
+        """flags for 8 bit INC, the carry flag is not affected"""
+        self.F = ((self.F & 0x1F)
+                  | (0 if res else 0x80)
+                  | (0 if res & 0xF else 0x20))
+
+    def set_dec_flags(self, res):
+        """flags for 8 bit DEC, the carry flag is not affected"""
+        self.F = ((self.F & 0x1F)
+                  | (0 if res else 0x80)
+                  | 0x40
+                  | (0x20 if res & 0xF == 0xF else 0))
+
     def print_registers(self):
         """Debug function to print all register values"""
         print(f"A: {hex(self.A)} F: {hex(self.F)}", end =' ')
@@ -164,4 +197,152 @@ class Registers():
         print(f"D: {hex(self.D)} E: {hex(self.E)}", end =' ')
         print(f"H: {hex(self.H)} L: {hex(self.L)}", end =' ')
         print(f"SP: {hex(self.SP)} PC: {hex(self.PC)}", end=' ')
-        print(f"Flags - Z: {self.z_flag} N: {self.n_flag} H: {self.h_flag} C: {self.c_flag}")
\ No newline at end of file
+        print(f"Flags - Z: {self.z_flag} N: {self.n_flag} H: {self.h_flag} C: {self.c_flag}")
+
+
+class FastRegisters(Registers):
+    """
+    Registers without range checks, used in EXECUTION_MODES.FAST.
+    The pair registers skip the int() conversion and range checks and
+    flag values are not validated.
+    """
+    __slots__ = ()
+
+    @property
+    def AF(self):
+        return (self.A << 8) | self.F
+
+    @AF.setter
+    def AF(self, val):
+        self.A = val >> 8
+        self.F = val & 0xF0
+
+    @property
+    def BC(self):
+        return (self.B << 8) | self.C
+
+    @BC.setter
+    def BC(self, val):
+        self.B = val >> 8
+        self.C = val & 0xFF
+
+    @property
+    def DE(self):
+        return (self.D << 8) | self.E
+
+    @DE.setter
+    def DE(self, val):
+        self.D = val >> 8
+        self.E = val & 0xFF
+
+    @property
+    def HL(self):
+        return (self.H << 8) | self.L
+
+    @HL.setter
+    def HL(self, val):
+        self.H = val >> 8
+        self.L = val & 0xFF
+
+    def _set_flag(self, flag, value):
+        if value:
+            self.F = self.F | flag
+        else:
+            self.F = self.F & (0xFF - flag)
+
+# operations recorded by LazyRegisters
+LAZY_NONE = 0
+LAZY_ADD = 1
+LAZY_SUB = 2
+LAZY_INC = 3
+LAZY_DEC = 4
+
+class LazyRegisters(Registers):
+    """
+    Registers with lazy flag evaluation.
+
+    The 8 bit ALU operations (ADD, ADC, SUB, SBC, CP, INC, DEC) only record
+    their operands and result. Z/N/H/C are computed when something reads F,
+    one of the flags or AF (conditional jumps read F). Most flag results are
+    overwritten by the next ALU operation before anyone reads them.
+
+    The lower nibble of F is always 0, as on hardware.
+    """
+    __slots__ = ("_F", "_flag_op", "_flag_a", "_flag_b", "_flag_res")
+
+    def __init__(self):
+        self._flag_op = LAZY_NONE
+        self._flag_a = 0
+        self._flag_b = 0
+        self._flag_res = 0
+        super().__init__()
+
+    @property
+    def F(self):
+        if self._flag_op:
+            self._resolve_flags()
+        return self._F
+
+    @F.setter
+    def F(self, value):
+        self._F = value & 0xF0
+        self._flag_op = LAZY_NONE
+
+    def _resolve_flags(self):
+        """compute F from the recorded operation"""
+        op = self._flag_op
+        res = self._flag_res
+        if op == LAZY_ADD:
+            self._F = ((0 if res & 0xFF else 0x80)
+                       | ((self._flag_a ^ self._flag_b ^ res) & 0x10) << 1
+                       | (0x10 if res > 0xFF else 0))
+        elif op == LAZY_SUB:
+            self._F = ((0 if res & 0xFF else 0x80)
+                       | 0x40
+                       | ((self._flag_a ^ self._flag_b ^ res) & 0x10) << 1
+                       | (0x10 if res < 0 else 0))
+        elif op == LAZY_INC:
+            # _flag_a holds the carry flag from before the INC
+            self._F = (self._flag_a
+                       | (0 if res else 0x80)
+                       | (0 if res & 0xF else 0x20))
+        else:
+            self._F = (self._flag_a
+                       | (0 if res else 0x80)
+                       | 0x40
+                       | (0x20 if res & 0xF == 0xF else 0))
+        self._flag_op = LAZY_NONE
+
+    def set_add_flags(self, a, b, res):
+        self._flag_op = LAZY_ADD
+        self._flag_a = a
+        self._flag_b = b
+        self._flag_res = res
+
+    def set_sub_flags(self, a, b, res):
+        self._flag_op = LAZY_SUB
+        self._flag_a = a
+        self._flag_b = b
+        self._flag_res = res
+
+    def set_inc_flags(self, res):
+        self._flag_a = self.F & 0x10
+        self._flag_op = LAZY_INC
+        self._flag_res = res
+
+    def set_dec_flags(self, res):
+        self._flag_a = self.F & 0x10
+        self._flag_op = LAZY_DEC
+        self._flag_res = res
+
+
+class FastLazyRegisters(LazyRegisters, FastRegisters):
+    """LazyRegisters without range checks"""
+    __slots__ = ()
+
+
+def make_registers(fast=False, lazy_flags=False):
+    """Registers instance for the given execution mode and flag evaluation"""
+    if lazy_flags:
+        return FastLazyRegisters() if fast else LazyRegisters()
+    return FastRegisters() if fast else Registers()
@@ -0,0 +1,74 @@
+################################################################################
+# Forking
+#
+# Branches one running machine into many futures, e.g. one per input
+# sequence for a search. Each branch is a child process made with os.fork:
+# it starts as a copy-on-write copy of the parent, so nothing is saved,
+# loaded or copied up front and the OS only duplicates the pages a child
+# writes to (ROM, VRAM, translated blocks... stay shared). The child runs
+# branch(gameboy, arg) and sends the pickled result back through a pipe.
+#
+# POSIX only. Branches should not use the renderer, children share the
+# parent's window.
+#
+# see GameBoy.fork()
+################################################################################
+
+import os
+import pickle
+import sys
+
+
+def fork(gameboy, branch, args):
+    """
+    run branch(gameboy, arg) for each arg in `args`, each in a forked copy of
+    `gameboy`, and return the results in order. `gameboy` is left as it is.
+    an exception raised by a branch is raised here once all have finished
+    """
+    # or buffered output would be written by every child too
+    sys.stdout.flush()
+    sys.stderr.flush()
+
+    children = []
+    for arg in args:
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_fd)
+            _run_branch(gameboy, branch, arg, write_fd)
+        os.close(write_fd)
+        children.append((pid, read_fd))
+
+    # read every pipe before waiting, children block until read
+    results = []
+    for pid, read_fd in children:
+        with os.fdopen(read_fd, "rb") as pipe:
+            data = pipe.read()
+        os.waitpid(pid, 0)
+        if data:
+            results.append(pickle.loads(data))
+        else:
+            results.append((False, RuntimeError(f"branch {len(results)} exited without a result")))
+
+    for ok, value in results:
+        if not ok:
+            raise value
+    return [value for _, value in results]
+
+
+def _run_branch(gameboy, branch, arg, write_fd):
+    """child process: run the branch, send (ok, result) and exit"""
+    try:
+        try:
+            result = (True, branch(gameboy, arg))
+        except BaseException as e:
+            result = (False, e)
+        try:
+            data = pickle.dumps(result)
+        except Exception as e:
+            data = pickle.dumps((False, RuntimeError(f"branch result can't be pickled: {e!r}")))
+        with os.fdopen(write_fd, "wb") as pipe:
+            pipe.write(data)
+    finally:
+        # never return into the parent's code (or the test runner)
+        os._exit(0)
@@ -0,0 +1,154 @@
+################################################################################
+# GameBoy: the whole machine
+#
+# Wires the cartridge, MMU, CPU, PPU and timer together and drives them with
+# a Scheduler (gb/scheduler.py). The CPU runs instructions in a tight loop
+# until the next scheduled event (PPU mode change, timer overflow, input
+# poll) instead of stepping every component after every instruction.
+# scheduler.cycles is kept current after every instruction, so registers
+# worked out from it (DIV, TIMA, see gb/timers.py) read the right value.
+#
+# Every interrupt source is a scheduled event, so while the CPU is halted
+# nothing can wake it before the next event: the loop jumps straight there
+# instead of spinning 4 cycles at a time.
+#
+# The renderer is polled for input every input_poll_interval cycles (once
+# per frame by default), never per instruction. see gb/inputs.py
+################################################################################
+
+from gb.mmu import MMU
+from gb.cpu.cpu import CPU
+from gb.ppu import PPU, FRAME_CYCLES
+from gb.inputs import InputHandler
+from gb.util.execution_modes import EXECUTION_MODES
+from gb import savestate
+from gb.rewind import Rewind
+from gb import fork
+
+class GameBoy():
+    def __init__(self, mbc, renderer=None, input_handler=None,
+                 mode=EXECUTION_MODES.FAST, translate=True, lazy_flags=False,
+                 input_poll_interval=FRAME_CYCLES, frameskip=0):
+        self.mmu = MMU(mbc=mbc, mode=mode)
+        # created with the MMU, DMA, the timer and the serial port are on it
+        self.scheduler = self.mmu.scheduler
+        self.cpu = CPU(mmu=self.mmu, translate=translate, lazy_flags=lazy_flags)
+        # frameskip=N only draws every N + 1th frame, see PPU
+        self.ppu = PPU(mmu=self.mmu, renderer=renderer, frameskip=frameskip)
+        self.timer = self.mmu.timer
+        # bytes sent over the serial port are in serial.output, see gb/serial.py
+        self.serial = self.mmu.serial
+        self.renderer = renderer
+
+        # trace records are stamped with the cycle of the last event,
+        # enable categories with gameboy.tracer.enable(), see gb/trace.py
+        self.tracer = self.mmu.tracer
+        self.tracer.clock = lambda: self.scheduler.cycles
+
+        # joypad events queue, see gb/inputs.py
+        if input_handler is None:
+            input_handler = InputHandler(self.mmu, self.scheduler)
+        self.input_handler = input_handler
+        self.input_poll_interval = input_poll_interval
+
+        # set by enable_rewind(), see gb/rewind.py
+        self.rewind_buffer = None
+
+        if not self.mmu.boot_rom_enabled:
+            # Setup CPU state as if boot rom has been run
+            self.cpu.no_boot_rom_setup()
+
+        self.ppu.attach(self.scheduler)
+        self._schedule_host_events()
+
+    @property
+    def cycles(self):
+        """cycles emulated since power on"""
+        return self.scheduler.cycles
+
+    def _schedule_host_events(self):
+        # events that aren't part of the machine, scheduled again when the
+        # cycle counter jumps (load_state). input events queued for a cycle
+        # are lost
+        self.input_handler.queue.clear()
+        if self.renderer is not None:
+            # poll the host for input
+            self.scheduler.schedule(self.input_poll_interval, self._on_poll_input, "input poll")
+
+    def _on_poll_input(self, time):
+        self.input_handler.handle_input(self.renderer.get_input(), time)
+        self.scheduler.schedule_at(time + self.input_poll_interval, self._on_poll_input, "input poll")
+
+    def run_until(self, target):
+        """run until the cycle counter reaches `target`"""
+        scheduler = self.scheduler
+        cpu = self.cpu
+        mmu = self.mmu
+        step = cpu.step
+        cycles = scheduler.cycles
+        scheduler.target = target
+        scheduler.stop = min(scheduler.next_event, target)
+        while cycles < target:
+            # tight loop until the next event is due. scheduler.stop is read
+            # again every time, events scheduled meanwhile lower it.
+            # translated blocks run the events due inside them themselves
+            # (see gb/cpu/block_cache.py), and move it on
+            while cycles < scheduler.stop:
+                cycles += step()
+                scheduler.cycles = cycles
+                if cpu.halted and not mmu.interrupts:
+                    # HALT fast-forward: no interrupt can be raised before
+                    # the next event, including ones scheduled by the
+                    # instructions before HALT
+                    if cycles < scheduler.stop:
+                        cycles = scheduler.stop
+            scheduler.cycles = cycles
+            scheduler.run_due()
+
+    def run_frames(self, frames=1):
+        """run until `frames` more frames have been completed"""
+        target = self.ppu.frame_count + frames
+        while self.ppu.frame_count < target:
+            # stop right at V-Blank
+            self.run_until(self.ppu.next_frame_end())
+
+    def save_state(self):
+        """snapshot of the whole machine as bytes, see gb/savestate.py"""
+        return savestate.save_state(self)
+
+    def load_state(self, data):
+        """restore a snapshot returned by save_state()"""
+        savestate.load_state(self, data)
+
+    def fork(self, branch, args):
+        """
+        run branch(gameboy, arg) for every arg in a copy-on-write child
+        process branched from this machine, return the results in order.
+        see gb/fork.py
+        """
+        return fork.fork(self, branch, args)
+
+    def enable_rewind(self, interval=1, keyframe_interval=60, max_bytes=16 * 1024 * 1024):
+        """record a state every `interval` frames for rewind(), see gb/rewind.py"""
+        self.rewind_buffer = Rewind(self, interval, keyframe_interval, max_bytes)
+        # at V-Blank, when the frame is rendered and save_state() has no
+        # lines to flush
+        self.ppu.vblank_hook = self._on_rewind_record
+
+    def _on_rewind_record(self):
+        if self.ppu.frame_count % self.rewind_buffer.interval == 0:
+            self.rewind_buffer.record()
+
+    def rewind(self, frames):
+        """
+        go back about `frames` frames (60 per second), to the closest
+        recorded state. returns the frames actually gone back
+        """
+        current = self.ppu.frame_count
+        frame = self.rewind_buffer.rewind_to(current - frames)
+        return 0 if frame is None else current - frame
+
+    def run(self):
+        """run until the renderer's window is closed"""
+        while not self.input_handler.quit_requested:
+            self.run_until(self.scheduler.cycles + FRAME_CYCLES)
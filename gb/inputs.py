@@ -0,0 +1,82 @@
+################################################################################
+# Joypad input
+#
+# The host is polled once per frame (see GameBoy), not per instruction.
+# Renderers return their input as a list of events from get_input():
+#     (JOYPAD_BUTTONS.X, pressed)  a button went down (True) or up (False)
+#     QUIT                         the window was closed
+#
+# Events go into a queue stamped with the cycle they take effect at.
+# Applying an event updates MMU.button_states and requests the joypad
+# interrupt when a button is pressed. Events queued for later cycles (e.g.
+# scripted input) are applied by a scheduled event at their time.
+################################################################################
+
+from collections import deque
+
+QUIT = "quit"
+
+# bit 4 of IF
+JOYPAD_INTERRUPT = 0x10
+
+
+class InputHandler():
+    def __init__(self, mmu, scheduler=None):
+        self.mmu = mmu
+
+        # used to apply events queued for a later cycle, see queue_event()
+        self.scheduler = scheduler
+
+        # (time, button, pressed), oldest first
+        self.queue = deque()
+
+        # set when a QUIT event is received
+        self.quit_requested = False
+
+    def handle_input(self, events, time=0):
+        """queue events polled from the host at cycle `time` and apply them"""
+        for event in events:
+            if event == QUIT:
+                self.quit_requested = True
+            else:
+                button, pressed = event
+                self.queue_event(time, button, pressed)
+        self.apply_due(time)
+
+    def queue_event(self, time, button, pressed):
+        """press (pressed=True) or release `button` at cycle `time`"""
+        queue = self.queue
+        if queue and time < queue[-1][0]:
+            # keep the queue in time order
+            events = sorted([*queue, (time, button, pressed)], key=lambda event: event[0])
+            queue.clear()
+            queue.extend(events)
+        else:
+            queue.append((time, button, pressed))
+        if self.scheduler is not None and time > self.scheduler.cycles:
+            self.scheduler.schedule_at(time, self.apply_due, "input")
+
+    def apply_due(self, time):
+        """apply the queued events due at cycle `time`"""
+        queue = self.queue
+        while queue and queue[0][0] <= time:
+            _, button, pressed = queue.popleft()
+            self.set_button(button, pressed)
+
+    def set_button(self, button, pressed):
+        """update MMU.button_states, 0 = pressed"""
+        group, bit = button.value
+        states = list(self.mmu.button_states)
+        mask = 1 << bit
+        if pressed:
+            if states[group] & mask:
+                # high to low transition of a joypad line
+                self.mmu.if_reg |= JOYPAD_INTERRUPT
+            states[group] &= ~mask
+        else:
+            states[group] |= mask
+        self.mmu.button_states = tuple(states)
+
+    def is_pressed(self, button):
+        group, bit = button.value
+        return not self.mmu.button_states[group] & (1 << bit)
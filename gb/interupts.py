@@ -1,53 +1,48 @@
+################################################################################
+# Interrupts
+#
+# The CPU keeps cpu.pending = IE & IF while IME is set (0 otherwise), updated
+# only when IE, IF or IME change (see MMU.watch_interrupts and CPU.ime), so
+# CPU.step only tests that one attribute before each instruction.
+# INTERRUPT_TABLE maps a pending mask to the highest priority interrupt.
+#
+# see https://gbdev.io/pandocs/Interrupts.html
+################################################################################
+
+# V-Blank, LCD STAT, Timer, Serial, Joypad
+INTERRUPT_NAMES = ["V-Blank", "LCD STAT", "Timer", "Serial", "Joypad"]
+
+# INTERRUPT_TABLE[pending] = (vector, IF mask clearing its bit) of the
+# interrupt serviced first, the lowest bit has the highest priority
+INTERRUPT_TABLE = [None] * 32
+for _pending in range(1, 32):
+    _bit = (_pending & -_pending).bit_length() - 1
+    INTERRUPT_TABLE[_pending] = (0x40 + _bit * 8, ~(1 << _bit) & 0xFF)
+
+
 def interrupt_handler(cpu):
-    """Handles any pending interrupts."""
+    """service the pending interrupt, cpu.pending must not be 0"""
+    vector, clear_mask = INTERRUPT_TABLE[cpu.pending]
     memory = cpu.mmu
 
-    # Read the interrupt enable and flag registers
-    IE = memory.read_byte(0xFFFF)
-    IF = memory.read_byte(0xFF0F)
-
-    # Check for any pending interrupt (even if IME=0, HALT can exit)
-    has_pending_interrupt = (IE & IF) != 0
-
-    # If halted and there's a pending interrupt, exit HALT
-    # (hardware always wakes from HALT on any pending interrupt)
-    if cpu.halted and has_pending_interrupt:
-        cpu.halted = False
-        # If IME=0, we exit HALT but don't service the interrupt
-        # This is the HALT bug behavior
-        if not cpu.ime:
-            return 0
-
-    # Service interrupt only if IME is enabled
-    if not cpu.ime:
-        return 0
-
-    # Check for each interrupt in order of priority
-    for i in range(5):
-        interrupt_bit = 1 << i
-        if (IE & interrupt_bit) and (IF & interrupt_bit):
-            interrupt_names = ["V-Blank", "LCD STAT", "Timer", "Serial", "Joypad"]
-            
-            # Clear the interrupt flag
-            memory.write_byte(0xFF0F, IF & ~interrupt_bit)
-
-            # Disable IME
-            cpu.ime = False
-
-            # Disable halt
-            cpu.halted = False
-
-            # Push current PC onto stack
-            pc = cpu.registers.PC
-            cpu.registers.SP = (cpu.registers.SP - 1) & 0xFFFF
-            cpu.write_d8(cpu.registers.SP, (pc >> 8) & 0xFF)
-            cpu.registers.SP = (cpu.registers.SP - 1) & 0xFFFF
-            cpu.write_d8(cpu.registers.SP, pc & 0xFF)
-
-            # Jump to the interrupt vector
-            cpu.registers.PC = 0x40 + (i * 8)
-
-            # Interrupt takes 5 machine cycles (20 clock cycles)
-            return 20
-
-    return 0  # No interrupts serviced
\ No newline at end of file
+    # Clear the interrupt flag
+    memory.if_reg &= clear_mask
+
+    # Disable IME
+    cpu.ime = False
+
+    # Disable halt
+    cpu.halted = False
+
+    # Push current PC onto stack
+    pc = cpu.registers.PC
+    cpu.registers.SP = (cpu.registers.SP - 1) & 0xFFFF
+    cpu.write_d8(cpu.registers.SP, (pc >> 8) & 0xFF)
+    cpu.registers.SP = (cpu.registers.SP - 1) & 0xFFFF
+    cpu.write_d8(cpu.registers.SP, pc & 0xFF)
+
+    # Jump to the interrupt vector
+    cpu.registers.PC = vector
+
+    # Interrupt takes 5 machine cycles (20 clock cycles)
+    return 20
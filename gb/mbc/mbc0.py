@@ -2,6 +2,10 @@
 # for simple roms without bank switching like tetris
 
 class MBC0():
+    # no external RAM, accesses to 0xA000-0xBFFF are traced as
+    # TRACE_CATEGORIES.MMU_INVALID (see gb/trace.py)
+    has_ram = False
+
     def __init__(self, rom_path):
         self._rom_data = bytearray(0x8000)
         if not rom_path:
@@ -18,11 +22,13 @@ class MBC0():
             return self._rom_data[address]
         else:
             # raise ValueError("MBC0 ERROR: cpu tried reading from 0x{:04X}".format(address))
-            print(f"tried to read from {address}. In MBC0 this is not possible")
             return 0xFF
 
+
+    def rom_mapping(self):
+        """(buffer, base) the MMU can read ROM from directly, there is no bank switching"""
+        return self._rom_data, 0
     
     def write_byte(self, address, value):
         # MBC0 does not support writing to ROM
-        print(f"tried writing to {address}. In MBC0 this is not possible")
         pass 
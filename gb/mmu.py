@@ -16,10 +16,28 @@
 # FFFF       -> Interrupt Enable register
 
 from gb.util.ppu_modes import PPU_MODES
+from gb.util.execution_modes import EXECUTION_MODES
 from gb.timers import Timer
+from gb.serial import Serial
+from gb.scheduler import Scheduler
+from gb.trace import (
+    Tracer, IO_READ, IO_WRITE, INVALID_ECHO_WRITE, INVALID_UNUSABLE_WRITE,
+    INVALID_CART_RAM_READ, INVALID_CART_RAM_WRITE,
+)
+from gb.util.trace_categories import TRACE_CATEGORIES
+
+# cycles an OAM DMA transfer takes, 1 byte per M-cycle
+DMA_CYCLES = 160 * 4
 
 class MMU():
-    def __init__(self, mbc):
+    def __init__(self, mbc, mode=EXECUTION_MODES.STRICT):
+        # STRICT validates every address and value, FAST doesn't.
+        # The CPU uses the same mode. see gb/util/execution_modes.py
+        self.mode = mode
+        if mode == EXECUTION_MODES.STRICT:
+            self.read_byte = self._read_byte_checked
+            self.write_byte = self._write_byte_checked
+
         # Cartridge MBC (Memory Bank Controller)
         # Handles bytes from 0x0000 to 0x7FFF and 0xA000 to 0xBFFF
         # (ROM and External RAM)
@@ -49,15 +67,21 @@ class MMU():
         self.hram = bytearray(0x7F)
 
         # Interrupt Enable register (0xFFFF)
-        self.ie_reg = 0x00
+        self._ie_reg = 0x00
 
         # Interrupt Flag register (0xFF0F)
         # technically in IO registers, but easier to handle separately
-        self.if_reg = 0x00
+        self._if_reg = 0x00
+
+        # IE & IF, the requested interrupts that are enabled. kept up to date
+        # by the ie_reg/if_reg setters, which then call interrupt_watch()
+        # (see watch_interrupts())
+        self.interrupts = 0x00
+        self.interrupt_watch = None
 
         # PPU mode handled by MMU
         # see gb/ppu/__init__.py and https://gbdev.io/pandocs/Rendering.html
-        self.ppu_mode = PPU_MODES.OAM_SCAN 
+        self._ppu_mode = PPU_MODES.OAM_SCAN
         
         # Joypad select bits
         self.joyp_select = 0x00
@@ -81,12 +105,51 @@ class MMU():
         # LCDC (0xFF40): LCD Control - default 0x91 (screen on, BG on)
         self.io_regs[0x40] = 0x91
 
-        # For DMA Transfer
+        # For DMA Transfer, see _write_dma()
         self.dma_transfer_enabled = False
-        self.dma_transfer_index = 0
+        self.dma_transfer_source = 0
+        self.dma_end_event = None
+
+        # the one scheduler of the machine. DMA, the timer and the serial port
+        # schedule on it, GameBoy drives it (and the PPU) with run_until().
+        # loops stepping the components advance it with timer.step()
+        self.scheduler = Scheduler()
         
+        # Structured tracing, shared by every component. see gb/trace.py
+        self.tracer = Tracer()
+
+        # IO registers (0xFF00-0xFF7F) with side effects have a read and/or
+        # write handler, indexed by address - 0xFF00 and registered by the
+        # component owning them with register_io(). None is a plain register
+        # stored in io_regs.
+        self.io_read_handlers = [None] * 0x80
+        self.io_write_handlers = [None] * 0x80
+        self._register_io()
+
         # Timers
         self.timer = Timer()
+        self.timer.register_io(self)
+
+        # Serial port, captures what test ROMs print
+        self.serial = Serial()
+        self.serial.register_io(self)
+
+        # Translated code (see gb/cpu/block_cache.py)
+        # code_marks[address] is 1 when the byte is part of a cached block in
+        # WRAM/HRAM. Writing to it invalidates the block.
+        self.code_marks = bytearray(0x10000)
+        self.block_cache = None
+
+        # one byte per tile in 0x8000-0x97FF, set to 1 when the tile is
+        # written. None until a TileCache is attached, see gb/ppu/tile_cache.py
+        self.tile_dirty = None
+
+        # called before VRAM/OAM is written while set, so the PPU can render
+        # deferred lines with the old contents. see PPU.flush_lines()
+        self.display_watch = None
+
+        # (locked, watched, tiles tracked) VRAM is currently mapped for
+        self._vram_mapping = None
         
         # boot Rom setup
         try:
@@ -98,6 +161,11 @@ class MMU():
 
         except FileNotFoundError:
             self._boot_rom_enabled = False
+
+        # see _build_page_table()
+        self._build_page_table()
+        self.tracer.add_hook(TRACE_CATEGORIES.MMU_IO, self._install_io_trace, self._uninstall_io_trace)
+        self.tracer.add_hook(TRACE_CATEGORIES.MMU_INVALID, self._install_invalid_trace, self._uninstall_invalid_trace)
      
     @property
     def boot_rom_enabled(self):
@@ -106,260 +174,480 @@ class MMU():
   
     @boot_rom_enabled.setter
     def boot_rom_enabled(self, value):
+        # remaps page 0, reads never check this
         self._boot_rom_enabled = bool(value)
-            
-    def read_byte(self, address, ppu_read = False, transfer_read = False):
-        # During DMA Transfer only HRAM can be read (PPU can still read for rendering)
-        if (self.dma_transfer_enabled and address < 0xFF80 and not transfer_read and not ppu_read):
-            return 0xFF
+        self._map_boot_rom()
 
-        # read from boot rom if enabled
-        if self.boot_rom_enabled and address < 0x100:
-            return self.boot_rom[address]
-
-        # done with boot rom or boot rom accessed beyond 0x00FF
-        if address < 0x8000:
-            # ROM bank 0 and switchable bank
-            return self.mbc.read_byte(address)
-
-        # VRAM
-        if 0x8000 <= address < 0xA000:
-            if self.ppu_mode == PPU_MODES.PIXEL_TRANSFER and not ppu_read:
-                # cpu cant read vram during pixel transfer
-                #  -  https://gbdev.io/pandocs/Rendering.html
-                return 0xFF
-            return self.vram[address - 0x8000]
-
-        if 0xA000 <= address < 0xC000:
-            # External RAM managed by MBC
-            # pokemon sav files are stored here
-            return self.mbc.read_byte(address)
-
-        if 0xC000 <= address < 0xE000:
-            # working ram
-            return self.wram[address - 0xC000]
-
-        if 0xE000 <= address < 0xFE00:
-            # Echo RAM (not usable, mirrors WRAM)
-            return self.wram[address - 0xE000]
-
-        if 0xFE00 <= address < 0xFEA0:
-            # OAM
-            if self.ppu_mode in (PPU_MODES.OAM_SCAN, PPU_MODES.PIXEL_TRANSFER) and not ppu_read:
-                # cpu cant read oam during oam scan and pixel transfer
-                #  -  https://gbdev.io/pandocs/Rendering.html
-                return 0xFF
-            return self.oam[address - 0xFE00]
-
-        if 0xFEA0 <= address < 0xFF00:
-            # Not Usable
-            return 0xFF
+    @property
+    def ie_reg(self):
+        return self._ie_reg
 
-        # IO Registers
-        # 0xFF00 - 0xFF7F
-
-        # Joypad register (FF00) handling
-        if address == 0xFF00:
-            # Build joypad register value
-            # Bits 7-6: Always 1
-            # Bits 5-4: Selection bits (from joyp_select)
-            # Bits 3-0: Button states based on selection
-            joypad_value = 0xC0 | self.joyp_select
-            
-            # Determine which button set to return based on selection
-            # Selection bits are inverted (0 = selected, 1 = not selected)
-            direction_buttons, action_buttons = self.button_states
-            
-            if (self.joyp_select & 0x10) == 0:
-                # P14 selected (bit 4 = 0): Return direction buttons
-                joypad_value |= direction_buttons
-                # print(f"[MMU] Read 0xFF00: P14 selected, returning direction: {joypad_value:02X}")
-            elif (self.joyp_select & 0x20) == 0:
-                # P15 selected (bit 5 = 0): Return action buttons
-                joypad_value |= action_buttons
-                # print(f"[MMU] Read 0xFF00: P15 selected, returning action: {joypad_value:02X}")
-            else:
-                # Nothing selected: all button bits high
-                joypad_value |= 0x0F
-                # print(f"[MMU] Read 0xFF00: Nothing selected, returning: {joypad_value:02X}")
-            
-            return joypad_value
-
-        # DIV timer register
-        if address == 0xFF04:
-            return self.timer.DIV
-        
-        if address == 0xFF05:
-            print(f"Read TIMA: {self.timer.TIMA:#04x}")
-            return self.timer.TIMA
+    @ie_reg.setter
+    def ie_reg(self, value):
+        self._ie_reg = value
+        self._update_interrupts()
 
-        # Interrupt Flag register
-        if address == 0xFF0F:
-            return self.if_reg
+    @property
+    def if_reg(self):
+        return self._if_reg
 
-        if address == 0xFF50:
-            # Boot ROM disable register: 0 = enabled, 1 = disabled
-            return 0x00 if self._boot_rom_enabled else 0x01
-        
-        # rest of IO registers
-        if 0xFF00 <= address < 0xFF80:
-            # IO Registers
-            idx = address - 0xFF00
-            return self.io_regs[idx]
-        
-        if 0xFF80 <= address < 0xFFFF:
-            # High RAM
-            return self.hram[address - 0xFF80]
+    @if_reg.setter
+    def if_reg(self, value):
+        self._if_reg = value
+        self._update_interrupts()
 
-        # Interrupt Enable register (0xFFFF)
-        return self.ie_reg
+    def _update_interrupts(self):
+        self.interrupts = self._ie_reg & self._if_reg & 0x1F
+        if self.interrupt_watch is not None:
+            self.interrupt_watch()
 
+    def watch_interrupts(self, watch):
+        """call watch() whenever IE or IF change"""
+        self.interrupt_watch = watch
 
-    def write_byte(self, address, value, ppu_write = True, transfer_write = False):
-        # TODO: handle writes to boot rom area for disabling boot rom
+    @property
+    def ppu_mode(self):
+        return self._ppu_mode
+
+    @ppu_mode.setter
+    def ppu_mode(self, mode):
+        self._ppu_mode = mode
+        self._map_vram()
+
+    ###########################################################################
+    # Page table
+    ###########################################################################
+    # Every 256 byte page (address >> 8) is either backed by a buffer, read
+    # and written directly at address - base, or by a handler for pages that
+    # need more than indexing (MBC, OAM, IO, ...):
+    #     read_buffers[page], read_bases[page]    or  read_handlers[page]
+    #     write_buffers[page], write_bases[page]  or  write_handlers[page]
+    # buffer is None for handler pages.
+    # VRAM pages are remapped to handlers while the PPU locks them.
+
+    def _build_page_table(self):
+        self.read_buffers = [None] * 0x100
+        self.read_bases = [0] * 0x100
+        self.read_handlers = [None] * 0x100
+        self.write_buffers = [None] * 0x100
+        self.write_bases = [0] * 0x100
+        self.write_handlers = [None] * 0x100
+
+        # ROM
+        self._map_rom(0x0000, 0x8000)
         # TODO: handle MBC writes
+        self._map_write_handler(0x0000, 0x8000, self._write_ignored)
+
+        # boot ROM overlay
+        self._map_boot_rom()
+
+        # VRAM, see _map_vram()
+        self._map_vram()
+
+        # External RAM managed by MBC
+        # pokemon sav files are stored here
+        self._map_read_handler(0xA000, 0xC000, self._read_mbc)
+        self._map_write_handler(0xA000, 0xC000, self._write_mbc)
+
+        # working ram
+        self._map_read(0xC000, 0xE000, self.wram, 0xC000)
+        self._map_write(0xC000, 0xE000, self.wram, 0xC000)
+
+        # Echo RAM (not usable, mirrors WRAM)
+        self._map_read(0xE000, 0xFE00, self.wram, 0xE000)
+        self._map_write_handler(0xE000, 0xFE00, self._write_echo)
+
+        # OAM and Not Usable
+        self._map_read_handler(0xFE00, 0xFF00, self._read_oam)
+        self._map_write_handler(0xFE00, 0xFF00, self._write_oam)
+
+        # IO registers, HRAM and IE
+        self._map_read_handler(0xFF00, 0x10000, self._read_high)
+        self._map_write_handler(0xFF00, 0x10000, self._write_high)
+
+    def _map_read(self, start, end, buffer, base):
+        for page in range(start >> 8, end >> 8):
+            self.read_buffers[page] = buffer
+            self.read_bases[page] = base
+
+    def _map_write(self, start, end, buffer, base):
+        for page in range(start >> 8, end >> 8):
+            self.write_buffers[page] = buffer
+            self.write_bases[page] = base
+
+    def _map_read_handler(self, start, end, handler):
+        for page in range(start >> 8, end >> 8):
+            self.read_buffers[page] = None
+            self.read_handlers[page] = handler
+
+    def _map_write_handler(self, start, end, handler):
+        for page in range(start >> 8, end >> 8):
+            self.write_buffers[page] = None
+            self.write_handlers[page] = handler
+
+    def _map_rom(self, start, end):
+        """map cartridge ROM, read directly if the MBC never switches it"""
+        rom_mapping = getattr(self.mbc, "rom_mapping", None)
+        if rom_mapping is not None:
+            self._map_read(start, end, *rom_mapping())
+        else:
+            self._map_read_handler(start, end, self._read_mbc)
+
+    def _map_boot_rom(self):
+        """map the boot ROM over 0x0000-0x00FF, or the cartridge once it's disabled"""
+        if not hasattr(self, "read_buffers"):
+            # page table not built yet
+            return
+        if self._boot_rom_enabled:
+            self._map_read(0x0000, 0x0100, self.boot_rom, 0x0000)
+        else:
+            self._map_rom(0x0000, 0x0100)
+
+    def _map_vram(self):
+        """
+        map VRAM directly, or to handlers while it's locked by the PPU,
+        watched by the PPU or its tile writes are tracked
+        """
+        if not hasattr(self, "read_buffers"):
+            # page table not built yet
+            return
+        locked = self._ppu_mode == PPU_MODES.PIXEL_TRANSFER
+        mapping = (locked, self.display_watch is not None, self.tile_dirty is not None)
+        if mapping == self._vram_mapping:
+            # called on every PPU mode change, usually nothing to do
+            return
+        self._vram_mapping = mapping
+
+        if locked:
+            # cpu cant access vram during pixel transfer
+            #  -  https://gbdev.io/pandocs/Rendering.html
+            self._map_read_handler(0x8000, 0xA000, self._read_locked_vram)
+        else:
+            self._map_read(0x8000, 0xA000, self.vram, 0x8000)
+
+        if self.display_watch is not None:
+            self._map_write_handler(0x8000, 0xA000, self._write_vram_watched)
+        elif locked:
+            self._map_write_handler(0x8000, 0xA000, self._write_locked_vram)
+        else:
+            self._map_write(0x8000, 0xA000, self.vram, 0x8000)
+            if self.tile_dirty is not None:
+                # tile data is written through a handler marking tiles dirty
+                self._map_write_handler(0x8000, 0x9800, self._write_tile_data)
+
+    def track_tile_writes(self, tile_dirty):
+        """mark tiles dirty in `tile_dirty` when tile data is written"""
+        self.tile_dirty = tile_dirty
+        self._map_vram()
+
+    def watch_display(self, watch):
+        """call watch() before VRAM/OAM changes, or stop with watch=None"""
+        self.display_watch = watch
+        self._map_vram()
+    ###########################################################################
+
+    def read_byte(self, address, ppu_read = False, transfer_read = False):
+        # During DMA Transfer only HRAM can be read (PPU can still read for rendering)
+        if (self.dma_transfer_enabled and address < 0xFF80 and not transfer_read and not ppu_read):
+            return 0xFF
+
+        page = address >> 8
+        buffer = self.read_buffers[page]
+        if buffer is not None:
+            return buffer[address - self.read_bases[page]]
+        return self.read_handlers[page](address, ppu_read)
+
+    def write_byte(self, address, value, ppu_write = True, transfer_write = False):
         # TODO: fix timing issue and make it work when ppu_write is False (currently just for testing)
 
         # During DMA Transfer only HRAM can be written to (PPU can still write for rendering)
         if (self.dma_transfer_enabled and address < 0xFF80 and not transfer_write and not ppu_write):
             return
-        
-        # VRAM
-        if 0x8000 <= address < 0xA000:
-            if self.ppu_mode == PPU_MODES.PIXEL_TRANSFER and not ppu_write:
-                # cpu cant write to vram during pixel transfer
-                #  -  https://gbdev.io/pandocs/Rendering.html
-                return 
-            self.vram[address - 0x8000] = value
-            return
 
-        if 0xA000 <= address < 0xC000:
-            # External RAM managed by MBC
-            # pokemon sav files are stored here
-            self.mbc.write_byte(address, value)
+        page = address >> 8
+        buffer = self.write_buffers[page]
+        if buffer is not None:
+            buffer[address - self.write_bases[page]] = value
+            if self.code_marks[address]:
+                self.block_cache.invalidate(address)
             return
+        self.write_handlers[page](address, value, ppu_write)
 
-        if 0xC000 <= address < 0xE000:
-            # working ram
-            self.wram[address - 0xC000] = value
-            return
+    ###########################################################################
+    # Page handlers
+    ###########################################################################
 
-        if 0xE000 <= address < 0xFE00:
-            # Echo RAM (not usable)
-            print("Warning: Writing to Echo RAM (0xE000-0xFDFF) is not recommended.")
-            self.wram[address - 0xE000] = value
-            return
+    def _read_mbc(self, address, ppu_read):
+        return self.mbc.read_byte(address)
 
-        if 0xFE00 <= address < 0xFEA0:
-            # OAM
-            if self.ppu_mode in (PPU_MODES.OAM_SCAN, PPU_MODES.PIXEL_TRANSFER) and not ppu_write:
-                # cpu cant write to oam during oam scan and pixel transfer
-                #  -  https://gbdev.io/pandocs/Rendering.html
-                return 
+    def _write_mbc(self, address, value, ppu_write):
+        self.mbc.write_byte(address, value)
 
-            self.oam[address - 0xFE00] = value
-            return
+    def _write_ignored(self, address, value, ppu_write):
+        pass
 
-        if 0xFEA0 <= address < 0xFF00:
-            # Not Usable
-            print(f"Warning: Writing to Not Usable area (0xFEA0-0xFEFF) has no effect. {address:#04x} <- {value:#04x}")
-            return
-        
-        # IO Registers
-        
-        # DIV timer register: writing any value resets it to 0
-        if address == 0xFF04:
-            self.timer.DIV = 0x00
-            self.timer.div_counter = 0
-            return
-        
-        # Interrupt Flag register
-        if address == 0xFF0F:
-            if value != self.if_reg:  # Only print on change
-                # print(f"[MMU] Writing to IF register: {value:#04x} (was {self.if_reg:#04x}) - Bits set: ", end="")
-                interrupt_names = ["V-Blank", "LCD STAT", "Timer", "Serial", "Joypad"]
-                bits_set = [interrupt_names[i] for i in range(5) if value & (1 << i)]
-                # print(", ".join(bits_set) if bits_set else "None")
-            self.if_reg = value
+    def _read_locked_vram(self, address, ppu_read):
+        if not ppu_read:
+            return 0xFF
+        return self.vram[address - 0x8000]
+
+    def _write_locked_vram(self, address, value, ppu_write):
+        if ppu_write:
+            self.vram[address - 0x8000] = value
+            if self.tile_dirty is not None and address < 0x9800:
+                self.tile_dirty[(address - 0x8000) >> 4] = 1
+
+    def _write_vram_watched(self, address, value, ppu_write):
+        if self.vram[address - 0x8000] == value:
             return
-        
-        # LY changes can also trigger STAT interrupts
-        if address == 0xFF44:
-            if not ppu_write:
-                return
-            self.io_regs[0x44] = value
-            # Update LYC=LY flag and check for LCD STAT interrupt
-            self._update_lyc_flag()
+        if self._ppu_mode == PPU_MODES.PIXEL_TRANSFER and not ppu_write:
             return
+        self.display_watch()
+        self.vram[address - 0x8000] = value
+        if self.tile_dirty is not None and address < 0x9800:
+            self.tile_dirty[(address - 0x8000) >> 4] = 1
+
+    def _write_tile_data(self, address, value, ppu_write):
+        self.vram[address - 0x8000] = value
+        self.tile_dirty[(address - 0x8000) >> 4] = 1
+
+    def _write_echo(self, address, value, ppu_write):
+        # Echo RAM (not usable), see TRACE_CATEGORIES.MMU_INVALID
+        self.wram[address - 0xE000] = value
+        if self.code_marks[address - 0x2000]:
+            self.block_cache.invalidate(address - 0x2000)
+
+    def _read_oam(self, address, ppu_read):
+        if address >= 0xFEA0:
+            # Not Usable
+            return 0xFF
+        if self._ppu_mode in (PPU_MODES.OAM_SCAN, PPU_MODES.PIXEL_TRANSFER) and not ppu_read:
+            # cpu cant read oam during oam scan and pixel transfer
+            #  -  https://gbdev.io/pandocs/Rendering.html
+            return 0xFF
+        return self.oam[address - 0xFE00]
 
-        # LYC changes can trigger STAT interrupts, so handle writes to LYC (0xFF45) here
-        if address == 0xFF45:
-            self.io_regs[0x45] = value
-            # Update LYC=LY flag and check for LCD STAT interrupt
-            self._update_lyc_flag()
+    def _write_oam(self, address, value, ppu_write):
+        if address >= 0xFEA0:
+            # Not Usable, see TRACE_CATEGORIES.MMU_INVALID
             return
+        if self._ppu_mode in (PPU_MODES.OAM_SCAN, PPU_MODES.PIXEL_TRANSFER) and not ppu_write:
+            # cpu cant write to oam during oam scan and pixel transfer
+            #  -  https://gbdev.io/pandocs/Rendering.html
+            return
+        if self.display_watch is not None and self.oam[address - 0xFE00] != value:
+            self.display_watch()
+        self.oam[address - 0xFE00] = value
+
+    def _read_high(self, address, ppu_read):
+        if address >= 0xFF80:
+            if address == 0xFFFF:
+                # Interrupt Enable register
+                return self.ie_reg
+            # High RAM
+            return self.hram[address - 0xFF80]
 
-        # Enable DMA Transfer from value << 8
-        if address == 0xFF46:
-            self.dma_transfer_enabled = True
-            self.dma_transfer_source = value << 8
-            self.dma_transfer_index = 0
-        
-
-        # Rest of IO Registers
-        if 0xFF00 <= address < 0xFF80:
-            idx = address - 0xFF00
-            if address == 0xFF00:
-                # Store selection bits (bits 4-5). Others ignored for now.
-                self.joyp_select = value & 0x30
-                return
-            if address == 0xFF50:
-                # Writing non-zero disables boot ROM; zero keeps it enabled
-                self._boot_rom_enabled = (value & 0x01) == 0
+        # IO Registers
+        handler = self.io_read_handlers[address - 0xFF00]
+        if handler is None:
+            return self.io_regs[address - 0xFF00]
+        return handler(address)
+
+    def _write_high(self, address, value, ppu_write):
+        if address >= 0xFF80:
+            if address == 0xFFFF:
+                # Interrupt Enable register
+                self.ie_reg = value
                 return
-            if address == 0xFF40:
-                # LCDC register - important for display
-                print(f"LCDC written: {value:#04x}")
-            if address == 0xFF47:
-                # BGP - Background palette
-                print(f"BGP (background palette) set to: {value:#04x}")
-            if address == 0xFF48:
-                # OBP0 - Object palette 0
-                print(f"OBP0 (sprite palette 0) set to: {value:#04x}")
-            if address == 0xFF49:
-                # OBP1 - Object palette 1
-                print(f"OBP1 (sprite palette 1) set to: {value:#04x}")
-            self.io_regs[idx] = value
-            return 
-        
-        if 0xFF80 <= address < 0xFFFF:
             # High RAM
             self.hram[address - 0xFF80] = value
-            return
-        
-        # Interrupt Enable register (0xFFFF)
-        if address == 0xFFFF:
-            self.ie_reg = value
+            if self.code_marks[address]:
+                self.block_cache.invalidate(address)
             return
 
-    def _update_lyc_flag(self):
-        """Update STAT bit 2 (LYC=LY flag) and possibly trigger LCD STAT interrupt"""
-        lyc = self.read_byte(0xFF45, ppu_read=True)  # LYC register
-        ly = self.read_byte(0xFF44, ppu_read=True)   # LY register
-        stat = self.read_byte(0xFF41, ppu_read=True)
-        
-        if ly == lyc:
-            # Set LYC=LY flag (bit 2)
-            stat |= 0x04
-            
-            # If LYC=LY interrupt enabled (bit 6), trigger LCD STAT interrupt
-            if stat & 0x40:
-                self.if_reg |= 0x02  # LCD STAT interrupt is bit 1
+        # IO Registers
+        handler = self.io_write_handlers[address - 0xFF00]
+        if handler is None:
+            self.io_regs[address - 0xFF00] = value
         else:
-            # Clear LYC=LY flag
-            stat &= ~0x04
-        
-        self.write_byte(0xFF41, stat, ppu_write=True)
+            handler(address, value, ppu_write)
+    ###########################################################################
+
+    ###########################################################################
+    # Tracing (see gb/trace.py)
+    ###########################################################################
+    # enabling a category maps the traced handlers below into the page table,
+    # disabling it maps the normal ones back
+
+    def _install_io_trace(self):
+        self._map_io_trace(True)
+
+    def _uninstall_io_trace(self):
+        self._map_io_trace(False)
+
+    def _install_invalid_trace(self):
+        self._map_invalid_trace(True)
+
+    def _uninstall_invalid_trace(self):
+        self._map_invalid_trace(False)
+
+    def _map_io_trace(self, traced):
+        if traced:
+            self._map_read_handler(0xFF00, 0x10000, self._read_high_traced)
+            self._map_write_handler(0xFF00, 0x10000, self._write_high_traced)
+        else:
+            self._map_read_handler(0xFF00, 0x10000, self._read_high)
+            self._map_write_handler(0xFF00, 0x10000, self._write_high)
+
+    def _map_invalid_trace(self, traced):
+        self._map_write_handler(0xE000, 0xFE00, self._write_echo_traced if traced else self._write_echo)
+        self._map_write_handler(0xFE00, 0xFF00, self._write_oam_traced if traced else self._write_oam)
+        if not getattr(self.mbc, "has_ram", True):
+            self._map_read_handler(0xA000, 0xC000, self._read_cart_ram_traced if traced else self._read_mbc)
+            self._map_write_handler(0xA000, 0xC000, self._write_cart_ram_traced if traced else self._write_mbc)
+
+    def _read_high_traced(self, address, ppu_read):
+        value = self._read_high(address, ppu_read)
+        if address < 0xFF80 and not ppu_read:
+            self.tracer.record(TRACE_CATEGORIES.MMU_IO, IO_READ, address, value)
+        return value
+
+    def _write_high_traced(self, address, value, ppu_write):
+        if address < 0xFF80:
+            self.tracer.record(TRACE_CATEGORIES.MMU_IO, IO_WRITE, address, value)
+        self._write_high(address, value, ppu_write)
+
+    def _write_echo_traced(self, address, value, ppu_write):
+        self.tracer.record(TRACE_CATEGORIES.MMU_INVALID, INVALID_ECHO_WRITE, address, value)
+        self._write_echo(address, value, ppu_write)
+
+    def _write_oam_traced(self, address, value, ppu_write):
+        if address >= 0xFEA0:
+            self.tracer.record(TRACE_CATEGORIES.MMU_INVALID, INVALID_UNUSABLE_WRITE, address, value)
+        self._write_oam(address, value, ppu_write)
+
+    def _read_cart_ram_traced(self, address, ppu_read):
+        value = self._read_mbc(address, ppu_read)
+        self.tracer.record(TRACE_CATEGORIES.MMU_INVALID, INVALID_CART_RAM_READ, address, value)
+        return value
+
+    def _write_cart_ram_traced(self, address, value, ppu_write):
+        self.tracer.record(TRACE_CATEGORIES.MMU_INVALID, INVALID_CART_RAM_WRITE, address, value)
+        self._write_mbc(address, value, ppu_write)
+    ###########################################################################
+
+    ###########################################################################
+    # IO registers
+    ###########################################################################
+    # read handlers are called as read(address) -> value
+    # write handlers as write(address, value, ppu_write) and store the value
+    # themselves if needed
+
+    def register_io(self, address, read=None, write=None):
+        """handle reads and/or writes of the IO register at `address`"""
+        idx = address - 0xFF00
+        if read is not None:
+            self.io_read_handlers[idx] = read
+        if write is not None:
+            self.io_write_handlers[idx] = write
+
+    def _register_io(self):
+        """IO registers whose state lives in the MMU"""
+        self.register_io(0xFF00, self._read_joypad, self._write_joypad)
+        self.register_io(0xFF0F, self._read_if, self._write_if)
+        self.register_io(0xFF46, write=self._write_dma)
+        self.register_io(0xFF50, self._read_boot_rom_disable, self._write_boot_rom_disable)
+
+    def _read_joypad(self, address):
+        # Build joypad register value
+        # Bits 7-6: Always 1
+        # Bits 5-4: Selection bits (from joyp_select)
+        # Bits 3-0: Button states based on selection
+        joypad_value = 0xC0 | self.joyp_select
+
+        # Determine which button set to return based on selection
+        # Selection bits are inverted (0 = selected, 1 = not selected)
+        direction_buttons, action_buttons = self.button_states
+
+        if (self.joyp_select & 0x10) == 0:
+            # P14 selected (bit 4 = 0): Return direction buttons
+            joypad_value |= direction_buttons
+        elif (self.joyp_select & 0x20) == 0:
+            # P15 selected (bit 5 = 0): Return action buttons
+            joypad_value |= action_buttons
+        else:
+            # Nothing selected: all button bits high
+            joypad_value |= 0x0F
+
+        return joypad_value
+
+    def _write_joypad(self, address, value, ppu_write):
+        # Store selection bits (bits 4-5). Others ignored for now.
+        self.joyp_select = value & 0x30
+
+    def _read_if(self, address):
+        # Interrupt Flag register
+        return self.if_reg
+
+    def _write_if(self, address, value, ppu_write):
+        self.if_reg = value
+
+    def _write_dma(self, address, value, ppu_write):
+        # DMA Transfer from value << 8 to OAM. the 160 bytes are copied at
+        # once, the CPU is still locked out of everything but HRAM until the
+        # transfer would have ended, 160 M-cycles later
+        #  -  https://gbdev.io/pandocs/OAM_DMA_Transfer.html
+        source = value << 8
+        self.dma_transfer_source = source
+        self.io_regs[0x46] = value
+
+        page = value
+        buffer = self.read_buffers[page]
+        if buffer is not None:
+            offset = source - self.read_bases[page]
+            data = bytes(buffer[offset:offset + 0xA0])
+        else:
+            handler = self.read_handlers[page]
+            data = bytes(handler(source + i, True) for i in range(0xA0))
+        if self.display_watch is not None and self.oam != data:
+            self.display_watch()
+        self.oam[:] = data
+
+        self.dma_transfer_enabled = True
+        if self.dma_end_event is not None:
+            # restarted before the last transfer ended
+            self.scheduler.cancel(self.dma_end_event)
+        self.dma_end_event = self.scheduler.schedule(DMA_CYCLES, self._on_dma_end, "dma")
+
+    def _on_dma_end(self, time):
+        self.dma_transfer_enabled = False
+        self.dma_end_event = None
+
+    def _read_boot_rom_disable(self, address):
+        # Boot ROM disable register: 0 = enabled, 1 = disabled
+        return 0x00 if self._boot_rom_enabled else 0x01
+
+    def _write_boot_rom_disable(self, address, value, ppu_write):
+        # Writing non-zero disables boot ROM; zero keeps it enabled
+        self.boot_rom_enabled = (value & 0x01) == 0
+    ###########################################################################
+
+    def _read_byte_checked(self, address, ppu_read = False, transfer_read = False):
+        """read_byte with range checks, used in EXECUTION_MODES.STRICT"""
+        if address < 0 or address > 0xFFFF:
+            raise ValueError(f"read_byte address out of range: {address}")
+        value = MMU.read_byte(self, address, ppu_read, transfer_read)
+        if value < 0 or value > 0xFF:
+            raise ValueError(f"read_byte value out of range: {value} at address {address:#06x}")
+        return value
+
+    def _write_byte_checked(self, address, value, ppu_write = True, transfer_write = False):
+        """write_byte with range checks, used in EXECUTION_MODES.STRICT"""
+        if address < 0 or address > 0xFFFF:
+            raise ValueError(f"write_byte address out of range: {address}")
+        if value < 0 or value > 0xFF:
+            raise ValueError(f"write_byte value out of range: {value} at address {address:#06x}")
+        MMU.write_byte(self, address, value, ppu_write, transfer_write)
 
 
 # for testing functionality
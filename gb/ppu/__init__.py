@@ -1,28 +1,105 @@
-from gb.util import PPU_MODES
+import numpy as np
+from gb.util.ppu_modes import PPU_MODES, cycles_for_mode
+from gb.ppu.scanline import ScanlineRenderer, SCREEN_WIDTH, SCREEN_HEIGHT
+from gb.util.trace_categories import TRACE_CATEGORIES
+
+# cycles per scanline and per frame
+LINE_CYCLES = 456
+FRAME_CYCLES = LINE_CYCLES * 154
+
+# STAT (0xFF41) interrupt enable bits for each mode
+STAT_MODE_INTERRUPTS = {
+    PPU_MODES.H_BLANK: 0x08,
+    PPU_MODES.V_BLANK: 0x10,
+    PPU_MODES.OAM_SCAN: 0x20,
+    PPU_MODES.PIXEL_TRANSFER: 0x00,
+}
+
+# registers the rendered pixels depend on: LCDC, SCY, SCX, BGP, OBP0, OBP1, WY, WX
+DISPLAY_REGISTERS = (0xFF40, 0xFF42, 0xFF43, 0xFF47, 0xFF48, 0xFF49, 0xFF4A, 0xFF4B)
 
 class PPU():
-    def __init__(self, mmu):
+    def __init__(self, mmu, renderer=None, tile_cache=True, whole_frame=True,
+                 frameskip=0):
         # access to memory (vram, oam, etc.), shared with cpu
         self.mmu = mmu
 
-        # initial mode is HBlank
-        self.mode = PPU_MODES.H_BLANK
+        # where finished frames go, renderer.render_frame(framebuffer, changed)
+        # is called when V-Blank starts. changed is False when the frame is
+        # the same as the last one, see present_frame()
+        self.renderer = renderer
+
+        # shades (0 = white ... 3 = black) of the current frame, one row per
+        # scanline, rendered at the end of each line's pixel transfer
+        self.framebuffer = np.zeros((SCREEN_HEIGHT, SCREEN_WIDTH), dtype=np.uint8)
+        self.scanline_renderer = ScanlineRenderer(mmu, tile_cache=tile_cache)
+
+        # whole_frame=True defers rendering to V-Blank, when all lines are
+        # rendered at once. lines pending_start to pending_end - 1 are done
+        # but not rendered yet, see flush_lines()
+        self.pending_start = None
+        self.pending_end = None
+        if whole_frame:
+            self.render_scanline = self._defer_scanline
+
+        # bumped whenever VRAM, OAM or one of DISPLAY_REGISTERS changes.
+        # frames rendered from the same generation are the same
+        self.generation = 0
+        # generation at the start of the current frame
+        self.frame_generation = 0
+        # generation the framebuffer was rendered from, None if the display
+        # changed while it was rendered
+        self.framebuffer_generation = None
+        # VRAM/OAM writes are only watched while it matters, see _watch()
+        self.watching = False
+        self._watch(True)
+        for address in DISPLAY_REGISTERS:
+            mmu.register_io(address, write=self._write_display_register)
+
+        # frameskip=N draws one frame out of every N + 1. skipped frames run
+        # the same modes, LY/STAT updates and interrupts, they just have no
+        # pixels and aren't given to the renderer
+        self.frameskip = frameskip
+        self._draw_scanline = self.render_scanline
+        self.drawing = True
+
+        # initial mode is OAM scan of line 0
+        self.mode = PPU_MODES.OAM_SCAN
 
         # cycle limit for current mode
-        self.cycle_limit =PPU_MODES.H_BLANK.value
+        self.cycle_limit = cycles_for_mode(PPU_MODES.OAM_SCAN)
 
         # cycles spent in current mode
-        self.cycles_spent = 0  
-        
+        self.cycles_spent = 0
+
         # ly - current scanline (0-153) also stored in LY register (0xFF44)
         # will be handled by @ly.setter bellow
         self.ly = 0
 
-        # lx - x-coordinate of the pixel being rendered 
+        # lx - x-coordinate of the pixel being rendered
         self.lx = 0
 
+        # number of frames completed (incremented when V-Blank starts)
+        self.frame_count = 0
+
+        # called when V-Blank starts, after the frame is presented and no
+        # lines are pending. see GameBoy.enable_rewind()
+        self.vblank_hook = None
+
+        # set by attach() when driven by a Scheduler instead of step()
+        self.scheduler = None
+        # the scheduled end of the current mode
+        self.mode_event = None
+
+        # LCD registers with side effects
+        mmu.register_io(0xFF44, write=self._write_ly)
+        mmu.register_io(0xFF45, write=self._write_lyc)
+
+        # mode changes are traced by a traced set_state(), see gb/trace.py
+        mmu.tracer.add_hook(TRACE_CATEGORIES.PPU_MODE, self._install_trace, self._uninstall_trace)
+
     ###########################################################################
-    # PPU mode 
+    # PPU mode
     ###########################################################################
     # While the PPU is accessing some video-related memory, that memory is
     # inaccessible to the CPU (writes are ignored, and reads return garbage values).
@@ -35,74 +112,260 @@ class PPU():
     @mode.setter
     def mode(self, value):
         self.mmu.ppu_mode = value
+        # STAT bits 0-1 hold the current mode
+        self.mmu.io_regs[0x41] = (self.mmu.io_regs[0x41] & 0xFC) | value.value
     ###########################################################################
-        
+
 
     ###########################################################################
     # LY register (0xFF44)
     ###########################################################################
     @property
     def ly(self):
-        return self.mmu.read_byte(0xff44)
+        return self.mmu.read_byte(0xff44, ppu_read=True)
 
     @ly.setter
     def ly(self, value):
-        self.mmu.write_byte(0xff44, value) 
+        self.mmu.write_byte(0xff44, value, ppu_write=True)
     ###########################################################################
-    
+
+    ###########################################################################
+    # LCD registers (see MMU.register_io)
+    ###########################################################################
+    # LY changes can also trigger STAT interrupts
+    def _write_ly(self, address, value, ppu_write):
+        if not ppu_write:
+            return
+        self.mmu.io_regs[0x44] = value
+        # Update LYC=LY flag and check for LCD STAT interrupt
+        self._update_lyc_flag()
+
+    # LYC changes can trigger STAT interrupts too
+    def _write_lyc(self, address, value, ppu_write):
+        self.mmu.io_regs[0x45] = value
+        # Update LYC=LY flag and check for LCD STAT interrupt
+        self._update_lyc_flag()
+
+    def _write_display_register(self, address, value, ppu_write):
+        if self.mmu.io_regs[address & 0x7F] != value:
+            self._on_display_change()
+        self.mmu.io_regs[address & 0x7F] = value
+
+    def _on_display_change(self):
+        """VRAM, OAM or a display register is about to change"""
+        self.generation += 1
+        if self.pending_start is not None:
+            self.flush_lines()
+        # this frame counts as changed now, and there are no pending lines
+        # left to flush. until either matters again, VRAM is written directly
+        self._watch(False)
+
+    def _watch(self, watch):
+        """
+        watch VRAM/OAM writes (MMU.watch_display) or not. watched writes go
+        through a handler, so it is only on from the start of a frame until
+        its first change, and while lines are pending
+        """
+        if watch != self.watching:
+            self.watching = watch
+            self.mmu.watch_display(self._on_display_change if watch else None)
+
+    def _update_lyc_flag(self):
+        """Update STAT bit 2 (LYC=LY flag) and possibly trigger LCD STAT interrupt"""
+        io_regs = self.mmu.io_regs
+        stat = io_regs[0x41]
+
+        if io_regs[0x44] == io_regs[0x45]:
+            # Set LYC=LY flag (bit 2)
+            stat |= 0x04
+
+            # If LYC=LY interrupt enabled (bit 6), trigger LCD STAT interrupt
+            if stat & 0x40:
+                self.mmu.if_reg |= 0x02  # LCD STAT interrupt is bit 1
+        else:
+            # Clear LYC=LY flag
+            stat &= ~0x04
+
+        io_regs[0x41] = stat
+    ###########################################################################
+
     def set_state(self, state):
         """
         used when changing ppu mode
-        1. update cycles spent by subtracting cycle limit and
-              carry over extra cycles
-        2. change mode
-        3. set new cycle limit
+        1. change mode
+        2. set new cycle limit
+        3. request a LCD STAT interrupt if enabled for the new mode
         """
-        # carry over extra cycles
-        # TODO: might be unsafe, check later
-        self.cycles_spent -= self.cycle_limit
         self.mode = state
-        self.cycle_limit = state.value
-    
-    
+        self.cycle_limit = cycles_for_mode(state)
+        if self.mmu.io_regs[0x41] & STAT_MODE_INTERRUPTS[state]:
+            self.mmu.if_reg |= 0x02
+
+    def _set_state_traced(self, state):
+        PPU.set_state(self, state)
+        self.mmu.tracer.record(TRACE_CATEGORIES.PPU_MODE, state.value, self.mmu.io_regs[0x44], 0)
+
+    def _install_trace(self):
+        self.set_state = self._set_state_traced
+
+    def _uninstall_trace(self):
+        del self.set_state
+
+    def next_state(self):
+        """the current mode is over, move to the next one"""
+        mode = self.mode
+        if mode == PPU_MODES.OAM_SCAN:
+            self.set_state(PPU_MODES.PIXEL_TRANSFER)
+        elif mode == PPU_MODES.PIXEL_TRANSFER:
+            self.render_scanline()
+            self.set_state(PPU_MODES.H_BLANK)
+        elif mode == PPU_MODES.H_BLANK:
+            self.hBlank_step()
+        else:
+            self.vBlank_step()
+
     def hBlank_step(self):
-        if self.cycles_spent >= self.cycle_limit:
-            # move to next scanline
-            self.ly = self.ly + 1
-
-            # move to next mode 
-            # >= 144 for safety, ==144 should work
-            if self.ly >= 144:
-                self.set_state(PPU_MODES.V_BLANK)
-            else: 
-                self.set_state(PPU_MODES.OAM_SCAN)
-                
+        # move to next scanline
+        ly = self.ly + 1
+        self.ly = ly
+
+        # move to next mode
+        # >= 144 for safety, ==144 should work
+        if ly >= 144:
+            self.set_state(PPU_MODES.V_BLANK)
+            # request V-Blank interrupt
+            self.mmu.if_reg |= 0x01
+            self.frame_count += 1
+            if self.drawing:
+                self.present_frame()
+            if self.vblank_hook is not None:
+                self.vblank_hook()
+        else:
+            self.set_state(PPU_MODES.OAM_SCAN)
+
     def vBlank_step(self):
-        if self.cycles_spent >= self.cycle_limit:
-            # 10 vBlank lines are done restart from scanline 0
-            self.ly += 1
+        # each of the 10 vBlank lines takes a full V_BLANK cycle limit
+        ly = self.ly + 1
 
         # all vBlank lines done move to OAM_SCAN for line 0
-        if self.ly > 153:
+        if ly > 153:
             self.ly = 0
             self.set_state(PPU_MODES.OAM_SCAN)
+            self.frame_generation = self.generation
+            self._watch(True)
+            if self.frameskip:
+                self._start_frame()
+        else:
+            self.ly = ly
+            self.cycle_limit = cycles_for_mode(PPU_MODES.V_BLANK)
 
     def step(self, cycles):
+        """advance by `cycles`, used when not driven by a Scheduler"""
         # accumulate cycles
         self.cycles_spent = self.cycles_spent + cycles
 
-        if self.mode == PPU_MODES.OAM_SCAN:
-            pass
-        elif self.mode == PPU_MODES.PIXEL_TRANSFER:
-            pass
-        elif self.mode == PPU_MODES.H_BLANK:
-            self.hBlank_step()
-        elif self.mode == PPU_MODES.V_BLANK:
-            self.vBlank_step()
+        # carry over extra cycles into the next mode
+        while self.cycles_spent >= self.cycle_limit:
+            self.cycles_spent -= self.cycle_limit
+            self.next_state()
+
+    ###########################################################################
+    # Scheduler driven mode changes (see gb/scheduler.py)
+    ###########################################################################
+    def attach(self, scheduler):
+        """let `scheduler` run mode transitions instead of calling step()"""
+        self.scheduler = scheduler
+        self.mode_event = scheduler.schedule(self.cycle_limit - self.cycles_spent, self._on_mode_end, "ppu")
 
+    def _on_mode_end(self, time):
+        self.next_state()
+        self.mode_event = self.scheduler.schedule_at(time + self.cycle_limit, self._on_mode_end, "ppu")
+
+    def next_frame_end(self):
+        """cycle the next frame is completed at (the start of V-Blank)"""
+        mode_end = self.mode_event[0]
+        mode = self.mode
+        if mode == PPU_MODES.V_BLANK:
+            return mode_end + (153 - self.ly + 144) * LINE_CYCLES
+        if mode == PPU_MODES.OAM_SCAN:
+            mode_end += cycles_for_mode(PPU_MODES.PIXEL_TRANSFER)
+            mode = PPU_MODES.PIXEL_TRANSFER
+        if mode == PPU_MODES.PIXEL_TRANSFER:
+            mode_end += cycles_for_mode(PPU_MODES.H_BLANK)
+        return mode_end + (143 - self.ly) * LINE_CYCLES
 
     def render_scanline(self):
-        pass 
-        
-        
+        """
+        render the current line into the framebuffer.
+        sprites are selected here too: OAM can't change between OAM scan and
+        the end of pixel transfer, the CPU is locked out of it
+        """
+        ly = self.mmu.io_regs[0x44]
+        self.scanline_renderer.render(ly, self.framebuffer[ly])
+
+    ###########################################################################
+    # frameskip
+    ###########################################################################
+    def _start_frame(self):
+        """decide whether the frame starting now is drawn"""
+        self.drawing = self.frame_count % (self.frameskip + 1) == 0
+        if self.drawing:
+            self.render_scanline = self._draw_scanline
+        else:
+            self.render_scanline = self._skip_scanline
+
+    def _skip_scanline(self):
+        pass
+
+    ###########################################################################
+    # whole frame rendering
+    ###########################################################################
+    # Most games only change the display registers, VRAM and OAM during
+    # V-Blank, so a frame can be rendered in one go instead of line by line.
+    # Lines are only marked done, and rendered together when V-Blank starts.
+    # Changing anything they depend on (see DISPLAY_REGISTERS and
+    # MMU.watch_display) first renders the lines done so far, so mid-frame
+    # effects still land on the right lines.
+
+    def _defer_scanline(self):
+        ly = self.mmu.io_regs[0x44]
+        if self.pending_start is None:
+            self.pending_start = ly
+            self._watch(True)
+        self.pending_end = ly + 1
+
+    def flush_lines(self):
+        """render the pending lines"""
+        start, end = self.pending_start, self.pending_end
+        if start is None:
+            return
+        self.pending_start = self.pending_end = None
+        if end - start == 1:
+            self.scanline_renderer.render(start, self.framebuffer[start])
+        else:
+            self.scanline_renderer.render_lines(start, end, self.framebuffer[start:end])
+
+    ###########################################################################
+    # identical frames
+    ###########################################################################
+    # Static screens (menus, pause) don't change VRAM, OAM or the display
+    # registers between frames. When the framebuffer was rendered from the
+    # same generation, the frame is not rendered again and the renderer is
+    # told it can skip uploading and presenting it.
 
+    def present_frame(self):
+        """finish the frame and give it to the renderer"""
+        if self.generation == self.frame_generation:
+            generation = self.generation
+        else:
+            # changed mid-frame, lines were rendered from different states
+            generation = None
+        changed = generation is None or generation != self.framebuffer_generation
+        if changed:
+            self.flush_lines()
+        else:
+            # the framebuffer already holds this frame
+            self.pending_start = self.pending_end = None
+        self.framebuffer_generation = generation
+        if self.renderer is not None:
+            self.renderer.render_frame(self.framebuffer, changed)
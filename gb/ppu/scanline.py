@@ -0,0 +1,316 @@
+################################################################################
+# Scanline renderer
+#
+# Renders one 160 pixel line of background, window and sprites at a time
+# with NumPy, or a range of lines at once with render_lines() when the
+# registers, VRAM and OAM didn't change in between (see PPU.flush_lines()). A tile row is 2 bytes (bit planes): bit 7-x of the first byte
+# is bit 0 of pixel x's color index and bit 7-x of the second byte is bit 1.
+# Tiles come decoded from a TileCache (gb/ppu/tile_cache.py), or without the
+# cache whole rows of tiles are unpacked at once with np.unpackbits.
+#
+# Output pixels are shades after the palettes: 0 = white ... 3 = black
+#
+# see https://gbdev.io/pandocs/Graphics.html
+################################################################################
+
+import numpy as np
+from gb.ppu.tile_cache import TileCache
+
+SCREEN_WIDTH = 160
+SCREEN_HEIGHT = 144
+
+# LCDC (0xFF40) bits
+LCDC_ENABLE = 0x80
+LCDC_WINDOW_MAP = 0x40
+LCDC_WINDOW_ENABLE = 0x20
+LCDC_TILE_DATA = 0x10
+LCDC_BG_MAP = 0x08
+LCDC_OBJ_SIZE = 0x04
+LCDC_OBJ_ENABLE = 0x02
+LCDC_BG_ENABLE = 0x01
+
+# sprite attribute bits (byte 3 of an OAM entry)
+OBJ_BEHIND_BG = 0x80
+OBJ_FLIP_Y = 0x40
+OBJ_FLIP_X = 0x20
+OBJ_PALETTE = 0x10
+
+# at most 10 sprites per line
+MAX_SPRITES_PER_LINE = 10
+
+# x offsets of the 8 pixels of a tile row
+TILE_X = np.arange(8)
+
+# x offsets of the pixels of a line
+SCREEN_X = np.arange(SCREEN_WIDTH)
+
+# PALETTE_LUTS[palette] maps color index to shade for a BGP/OBP0/OBP1 value
+PALETTE_LUTS = np.array(
+    [[(palette >> (2 * i)) & 3 for i in range(4)] for palette in range(256)],
+    dtype=np.uint8)
+
+
+class ScanlineRenderer():
+    def __init__(self, mmu, tile_cache=True):
+        self.mmu = mmu
+
+        # tile_cache=False decodes tile rows from VRAM every time they are drawn
+        if tile_cache:
+            self.tile_cache = TileCache(mmu)
+            self.tile_rows = self._tile_rows_cached
+        else:
+            self.tile_cache = None
+            self.tile_rows = self._tile_rows_decoded
+
+        # views sharing memory with the MMU, no copies
+        self.vram = np.frombuffer(mmu.vram, dtype=np.uint8)
+        self.oam = np.frombuffer(mmu.oam, dtype=np.uint8)
+        # (y, x, tile, attributes) of the 40 sprites
+        self.sprites = self.oam.reshape(40, 4)
+
+        # line of the window to draw next, only advances on lines the
+        # window is visible on
+        self.window_line = 0
+
+        # color indices (before the palette) of the background/window of the
+        # current line, sprites behind the background need them
+        self.bg_colors = np.zeros(SCREEN_WIDTH, dtype=np.uint8)
+
+    ###########################################################################
+    # tiles
+    ###########################################################################
+
+    def tile_indices(self, tile_ids, unsigned):
+        """tile numbers (0-383) for the 0x8000 (unsigned) or 0x8800 (signed) addressing"""
+        tile_ids = tile_ids.astype(np.int32)
+        if unsigned:
+            return tile_ids
+        return 256 + ((tile_ids ^ 0x80) - 0x80)
+
+    def _tile_rows_decoded(self, tiles, rows):
+        """color indices of row `rows` of each tile in `tiles`, shape tiles.shape + (8,)"""
+        addresses = tiles * 16 + rows * 2
+        lo = np.unpackbits(self.vram[addresses][..., None], axis=-1)
+        hi = np.unpackbits(self.vram[addresses + 1][..., None], axis=-1)
+        return lo | (hi << 1)
+
+    def _tile_rows_cached(self, tiles, rows):
+        """color indices of row `rows` of each tile in `tiles`, shape tiles.shape + (8,)"""
+        return self.tile_cache.tiles[tiles, rows]
+
+    def map_row_colors(self, map_base, y, unsigned):
+        """color indices of the 256 pixel line `y` of a 32x32 tile map"""
+        tile_ids = self.vram[map_base + (y >> 3) * 32:map_base + (y >> 3) * 32 + 32]
+        return self.tile_rows(self.tile_indices(tile_ids, unsigned), y & 7).ravel()
+
+    def map_rows_colors(self, map_base, ys, unsigned):
+        """color indices of the 256 pixel lines `ys` of a 32x32 tile map, shape (n, 256)"""
+        tile_ids = self.vram[map_base + (ys[:, None] >> 3) * 32 + np.arange(32)]
+        colors = self.tile_rows(self.tile_indices(tile_ids, unsigned), (ys & 7)[:, None])
+        return colors.reshape(len(ys), 256)
+
+    ###########################################################################
+    # scanline
+    ###########################################################################
+
+    def render(self, ly, out):
+        """render line `ly` into `out`, a row of the framebuffer"""
+        io_regs = self.mmu.io_regs
+        lcdc = io_regs[0x40]
+
+        if ly == 0:
+            self.window_line = 0
+
+        if not lcdc & LCDC_ENABLE:
+            out[:] = 0
+            return
+
+        if self.tile_cache is not None:
+            self.tile_cache.update()
+
+        bg_colors = self.bg_colors
+        if lcdc & LCDC_BG_ENABLE:
+            self.render_background(lcdc, ly, bg_colors)
+            self.render_window(lcdc, ly, bg_colors)
+        else:
+            # background and window are blank (color 0)
+            bg_colors[:] = 0
+        out[:] = PALETTE_LUTS[io_regs[0x47]][bg_colors]
+
+        if lcdc & LCDC_OBJ_ENABLE:
+            self.render_sprites(lcdc, ly, out)
+
+    def render_background(self, lcdc, ly, bg_colors):
+        io_regs = self.mmu.io_regs
+        scy, scx = io_regs[0x42], io_regs[0x43]
+        map_base = 0x1C00 if lcdc & LCDC_BG_MAP else 0x1800
+        colors = self.map_row_colors(map_base, (ly + scy) & 0xFF, lcdc & LCDC_TILE_DATA)
+        # the background wraps around horizontally
+        bg_colors[:] = colors[(SCREEN_X + scx) & 0xFF]
+
+    def render_window(self, lcdc, ly, bg_colors):
+        io_regs = self.mmu.io_regs
+        wy, wx = io_regs[0x4A], io_regs[0x4B] - 7
+        if not lcdc & LCDC_WINDOW_ENABLE or ly < wy or wx >= SCREEN_WIDTH:
+            return
+        map_base = 0x1C00 if lcdc & LCDC_WINDOW_MAP else 0x1800
+        colors = self.map_row_colors(map_base, self.window_line, lcdc & LCDC_TILE_DATA)
+        if wx >= 0:
+            bg_colors[wx:] = colors[:SCREEN_WIDTH - wx]
+        else:
+            bg_colors[:] = colors[-wx:SCREEN_WIDTH - wx]
+        self.window_line += 1
+
+    def visible_sprites(self, ly, height):
+        """OAM indices of the sprites on line `ly`, at most 10 in OAM order"""
+        ys = self.sprites[:, 0].astype(np.int32) - 16
+        on_line = np.nonzero((ys <= ly) & (ly < ys + height))[0]
+        return on_line[:MAX_SPRITES_PER_LINE]
+
+    def render_sprites(self, lcdc, ly, out):
+        io_regs = self.mmu.io_regs
+        height = 16 if lcdc & LCDC_OBJ_SIZE else 8
+
+        indices = self.visible_sprites(ly, height)
+        if not len(indices):
+            return
+        sprites = self.sprites[indices].astype(np.int32)
+        ys, xs, tiles, attrs = sprites.T
+
+        # tile rows of all sprites at once.
+        # sprites always use 0x8000 addressing, rows 8-15 are the next tile
+        rows = ly - (ys - 16)
+        rows = np.where(attrs & OBJ_FLIP_Y, height - 1 - rows, rows)
+        if height == 16:
+            tiles = (tiles & 0xFE) + (rows >> 3)
+            rows = rows & 7
+        colors = self.tile_rows(tiles, rows)
+        flip_x = (attrs & OBJ_FLIP_X) != 0
+        colors[flip_x] = colors[flip_x, ::-1]
+        obp = np.where(attrs & OBJ_PALETTE, io_regs[0x49], io_regs[0x48])
+        shades = PALETTE_LUTS[obp[:, None], colors]
+
+        # indexed by sprite x (screen x + 8), so every x fits
+        obj_colors = np.zeros(256 + 8, dtype=np.uint8)
+        obj_shades = np.zeros(256 + 8, dtype=np.uint8)
+        obj_behind = np.zeros(256 + 8, dtype=bool)
+
+        # smaller x has priority, then lower OAM index. draw the lowest
+        # priority first so higher priority sprites overwrite it
+        for i in np.lexsort((indices, xs))[::-1]:
+            opaque = colors[i] != 0
+            pixels = (xs[i] + TILE_X)[opaque]
+            obj_colors[pixels] = colors[i][opaque]
+            obj_shades[pixels] = shades[i][opaque]
+            obj_behind[pixels] = bool(attrs[i] & OBJ_BEHIND_BG)
+
+        # sprites behind the background only show over color 0
+        obj_colors = obj_colors[8:SCREEN_WIDTH + 8]
+        visible = (obj_colors != 0) & ~(obj_behind[8:SCREEN_WIDTH + 8] & (self.bg_colors != 0))
+        out[visible] = obj_shades[8:SCREEN_WIDTH + 8][visible]
+
+    ###########################################################################
+    # range of lines
+    ###########################################################################
+    # Same output as calling render() for each line, with every step done for
+    # all lines at once. Only valid while nothing the lines depend on changed.
+
+    def render_lines(self, start, end, out):
+        """render lines `start` to `end` - 1 into `out`, those rows of the framebuffer"""
+        io_regs = self.mmu.io_regs
+        lcdc = io_regs[0x40]
+
+        if start == 0:
+            self.window_line = 0
+
+        if not lcdc & LCDC_ENABLE:
+            out[:] = 0
+            return
+
+        if self.tile_cache is not None:
+            self.tile_cache.update()
+
+        lines = np.arange(start, end)
+        bg_colors = np.zeros((end - start, SCREEN_WIDTH), dtype=np.uint8)
+        if lcdc & LCDC_BG_ENABLE:
+            self.render_background_lines(lcdc, lines, bg_colors)
+            self.render_window_lines(lcdc, lines, bg_colors)
+        out[:] = PALETTE_LUTS[io_regs[0x47]][bg_colors]
+
+        if lcdc & LCDC_OBJ_ENABLE:
+            self.render_sprites_lines(lcdc, lines, out, bg_colors)
+
+    def render_background_lines(self, lcdc, lines, bg_colors):
+        io_regs = self.mmu.io_regs
+        scy, scx = io_regs[0x42], io_regs[0x43]
+        map_base = 0x1C00 if lcdc & LCDC_BG_MAP else 0x1800
+        colors = self.map_rows_colors(map_base, (lines + scy) & 0xFF, lcdc & LCDC_TILE_DATA)
+        bg_colors[:] = colors[:, (SCREEN_X + scx) & 0xFF]
+
+    def render_window_lines(self, lcdc, lines, bg_colors):
+        io_regs = self.mmu.io_regs
+        wy, wx = io_regs[0x4A], io_regs[0x4B] - 7
+        if not lcdc & LCDC_WINDOW_ENABLE or wx >= SCREEN_WIDTH:
+            return
+        # the window is on every line from WY on, its lines are consecutive
+        first = max(wy - lines[0], 0)
+        count = len(lines) - first
+        if count <= 0:
+            return
+        map_base = 0x1C00 if lcdc & LCDC_WINDOW_MAP else 0x1800
+        window_lines = self.window_line + np.arange(count)
+        colors = self.map_rows_colors(map_base, window_lines, lcdc & LCDC_TILE_DATA)
+        if wx >= 0:
+            bg_colors[first:, wx:] = colors[:, :SCREEN_WIDTH - wx]
+        else:
+            bg_colors[first:] = colors[:, -wx:SCREEN_WIDTH - wx]
+        self.window_line += count
+
+    def render_sprites_lines(self, lcdc, lines, out, bg_colors):
+        io_regs = self.mmu.io_regs
+        height = 16 if lcdc & LCDC_OBJ_SIZE else 8
+
+        sprites = self.sprites.astype(np.int32)
+        ys, xs, tiles, attrs = sprites.T
+
+        # on[line, sprite]: the first 10 sprites in OAM order on each line
+        rows = lines[:, None] - (ys - 16)
+        on = (rows >= 0) & (rows < height)
+        on &= np.cumsum(on, axis=1) <= MAX_SPRITES_PER_LINE
+        drawn = np.nonzero(on.any(axis=0))[0]
+        if not len(drawn):
+            return
+
+        # indexed by sprite x (screen x + 8), so every x fits
+        shape = (len(lines), 256 + 8)
+        obj_colors = np.zeros(shape, dtype=np.uint8)
+        obj_shades = np.zeros(shape, dtype=np.uint8)
+        obj_behind = np.zeros(shape, dtype=bool)
+
+        # lowest priority first, like render_sprites(). the order is the same
+        # on every line, sprites not on a line are never drawn on it
+        for i in drawn[np.lexsort((drawn, xs[drawn]))[::-1]]:
+            sprite_lines = np.nonzero(on[:, i])[0]
+            sprite_rows = rows[sprite_lines, i]
+            if attrs[i] & OBJ_FLIP_Y:
+                sprite_rows = height - 1 - sprite_rows
+            sprite_tiles = np.full(len(sprite_rows), tiles[i])
+            if height == 16:
+                sprite_tiles = (sprite_tiles & 0xFE) + (sprite_rows >> 3)
+                sprite_rows = sprite_rows & 7
+            colors = self.tile_rows(sprite_tiles, sprite_rows)
+            if attrs[i] & OBJ_FLIP_X:
+                colors = colors[:, ::-1]
+            obp = io_regs[0x49] if attrs[i] & OBJ_PALETTE else io_regs[0x48]
+
+            line_index, pixel = np.nonzero(colors)
+            line_index, opaque = sprite_lines[line_index], colors[line_index, pixel]
+            pixel = xs[i] + pixel
+            obj_colors[line_index, pixel] = opaque
+            obj_shades[line_index, pixel] = PALETTE_LUTS[obp][opaque]
+            obj_behind[line_index, pixel] = bool(attrs[i] & OBJ_BEHIND_BG)
+
+        # sprites behind the background only show over color 0
+        obj_colors = obj_colors[:, 8:SCREEN_WIDTH + 8]
+        visible = (obj_colors != 0) & ~(obj_behind[:, 8:SCREEN_WIDTH + 8] & (bg_colors != 0))
+        out[visible] = obj_shades[:, 8:SCREEN_WIDTH + 8][visible]
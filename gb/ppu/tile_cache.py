@@ -0,0 +1,43 @@
+################################################################################
+# Decoded tile cache
+#
+# VRAM 0x8000-0x97FF holds 384 tiles of 16 bytes. Decoding a tile's bit
+# planes again for every line it covers is wasted work, so the cache keeps
+# all 384 tiles decoded as 8x8 color indices (0-3).
+#
+# The MMU marks a tile dirty when a byte of it is written through write_byte
+# (see MMU.track_tile_writes), and update() re-decodes only dirty tiles.
+# Code writing to mmu.vram directly must call invalidate_all().
+################################################################################
+
+import numpy as np
+
+TILE_COUNT = 384
+
+
+class TileCache():
+    def __init__(self, mmu):
+        self.vram = np.frombuffer(mmu.vram, dtype=np.uint8)
+
+        # tiles[tile, row, x] = color index
+        self.tiles = np.zeros((TILE_COUNT, 8, 8), dtype=np.uint8)
+
+        # written by the MMU (one byte per tile), read here through a view
+        self.dirty_flags = bytearray(b"\x01" * TILE_COUNT)
+        self.dirty = np.frombuffer(self.dirty_flags, dtype=np.uint8)
+
+        mmu.track_tile_writes(self.dirty_flags)
+
+    def update(self):
+        """decode the dirty tiles"""
+        dirty = np.flatnonzero(self.dirty)
+        if not len(dirty):
+            return
+        data = self.vram[:TILE_COUNT * 16].reshape(TILE_COUNT, 8, 2)[dirty]
+        lo = np.unpackbits(data[:, :, 0:1], axis=2)
+        hi = np.unpackbits(data[:, :, 1:2], axis=2)
+        self.tiles[dirty] = lo | (hi << 1)
+        self.dirty[dirty] = 0
+
+    def invalidate_all(self):
+        self.dirty[:] = 1
@@ -0,0 +1,142 @@
+################################################################################
+# Rewind
+#
+# Every `interval` frames a save state (gb/savestate.py) is recorded into a
+# bounded ring buffer. Most of a state (WRAM, VRAM) barely changes from one
+# frame to the next, so only every keyframe_interval-th state is stored
+# whole; the ones in between are stored as the XOR against their keyframe,
+# which is mostly zeros. Both are zlib compressed.
+#
+# States are kept in groups (keyframe + its deltas). Once the compressed
+# size goes over max_bytes the oldest group is dropped, a delta is useless
+# without its keyframe.
+#
+# Only the keyframe of the group being recorded into is kept uncompressed.
+# Going back decompresses one keyframe and at most one delta and loads the
+# result, well under a millisecond however far back.
+#
+# see GameBoy.enable_rewind() and GameBoy.rewind()
+################################################################################
+
+import zlib
+from bisect import bisect_right
+from collections import deque
+import numpy as np
+
+# zlib level, states are recorded while the game runs so speed matters more
+COMPRESSION_LEVEL = 1
+
+class RewindGroup():
+    """a keyframe and the deltas recorded after it"""
+    def __init__(self, frame, keyframe):
+        # frame numbers (ppu.frame_count) of the keyframe and the deltas
+        self.frames = [frame]
+        # compressed keyframe, then compressed deltas
+        self.entries = [zlib.compress(keyframe, COMPRESSION_LEVEL)]
+        self.length = len(keyframe)
+        self.size = len(self.entries[0])
+        # the keyframe deltas are XORed against, None once sealed
+        self._keyframe = np.frombuffer(keyframe, dtype=np.uint8)
+
+    def keyframe(self):
+        if self._keyframe is None:
+            self._keyframe = np.frombuffer(zlib.decompress(self.entries[0]), dtype=np.uint8)
+        return self._keyframe
+
+    def seal(self):
+        """no more deltas are recorded, drop the uncompressed keyframe"""
+        self._keyframe = None
+
+    def add_delta(self, frame, state):
+        delta = np.bitwise_xor(np.frombuffer(state, dtype=np.uint8), self.keyframe())
+        entry = zlib.compress(delta.tobytes(), COMPRESSION_LEVEL)
+        self.frames.append(frame)
+        self.entries.append(entry)
+        self.size += len(entry)
+
+    def state(self, index):
+        """the state recorded at self.frames[index]"""
+        keyframe = self._keyframe
+        if keyframe is None:
+            # sealed, don't keep it around
+            keyframe = np.frombuffer(zlib.decompress(self.entries[0]), dtype=np.uint8)
+        if index == 0:
+            return keyframe.tobytes()
+        delta = np.frombuffer(zlib.decompress(self.entries[index]), dtype=np.uint8)
+        return np.bitwise_xor(delta, keyframe).tobytes()
+
+    def truncate(self, count):
+        """keep the first `count` states"""
+        for entry in self.entries[count:]:
+            self.size -= len(entry)
+        del self.frames[count:], self.entries[count:]
+
+
+class Rewind():
+    def __init__(self, gameboy, interval=1, keyframe_interval=60, max_bytes=16 * 1024 * 1024):
+        self.gameboy = gameboy
+
+        # record a state every `interval` frames, a keyframe every
+        # `keyframe_interval` states
+        self.interval = interval
+        self.keyframe_interval = keyframe_interval
+
+        # upper limit for the compressed states
+        self.max_bytes = max_bytes
+
+        # RewindGroups, oldest first
+        self.groups = deque()
+        self.size = 0
+
+    def __len__(self):
+        """number of recorded states"""
+        return sum(len(group.frames) for group in self.groups)
+
+    @property
+    def oldest_frame(self):
+        """frame number of the oldest recorded state, None if there is none"""
+        return self.groups[0].frames[0] if self.groups else None
+
+    def record(self):
+        """record the current state of the machine"""
+        state = self.gameboy.save_state()
+        frame = self.gameboy.ppu.frame_count
+        groups = self.groups
+        if (not groups or len(groups[-1].frames) >= self.keyframe_interval
+                or groups[-1].length != len(state)):
+            if groups:
+                groups[-1].seal()
+            groups.append(RewindGroup(frame, state))
+            self.size += groups[-1].size
+        else:
+            before = groups[-1].size
+            groups[-1].add_delta(frame, state)
+            self.size += groups[-1].size - before
+
+        # drop the oldest groups, never the one being recorded into
+        while self.size > self.max_bytes and len(groups) > 1:
+            self.size -= groups.popleft().size
+
+    def rewind_to(self, frame):
+        """
+        load the newest state recorded at or before `frame` (or the oldest
+        one), drop the states after it and return its frame number
+        """
+        groups = self.groups
+        if not groups:
+            return None
+        while len(groups) > 1 and groups[-1].frames[0] > frame:
+            self.size -= groups.pop().size
+        group = groups[-1]
+        index = max(bisect_right(group.frames, frame) - 1, 0)
+
+        before = group.size
+        group.truncate(index + 1)
+        self.size += group.size - before
+
+        self.gameboy.load_state(group.state(index))
+        return group.frames[index]
+
+    def clear(self):
+        self.groups.clear()
+        self.size = 0
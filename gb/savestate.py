@@ -0,0 +1,180 @@
+################################################################################
+# Save states
+#
+# The whole machine as a fixed layout binary, little endian:
+#
+#     HEADER     magic b"GBSS", format version
+#     STATE      every scalar (CPU registers and flags, IE/IF, joypad, DMA,
+#                timer, serial transfer, PPU mode and counters, cycle
+#                counter), one struct
+#     BUFFERS    vram, wram, oam, io_regs, hram, raw
+#     MBC        length + mbc.save_state(), for MBCs with banks or RAM
+#
+# Buffers are copied through memoryviews, nothing is pickled, so saving or
+# restoring takes well under a millisecond (python -m benchmarks.bench_savestate).
+#
+# Events are stored as the cycle they are due at. Loading drops every
+# scheduled event and schedules the machine's own again, plus input
+# polling. Caches derived from memory (decoded tiles, translated blocks) are
+# thrown away on load. What was captured from the serial port
+# (serial.output) is not part of the machine and is kept.
+################################################################################
+
+import struct
+from gb.util.ppu_modes import PPU_MODES
+
+MAGIC = b"GBSS"
+# bump when the layout changes, older states are refused
+VERSION = 2
+
+HEADER = struct.Struct("<4sH")
+
+# due time of an event that isn't scheduled
+NO_EVENT = -1
+
+STATE = struct.Struct(
+    "<"
+    "8B"    # A B C D E F H L
+    "2H"    # SP PC
+    "3B"    # ime ime_requested halted
+    "2B"    # IE IF
+    "4B"    # boot ROM enabled, joypad select, button states
+    "BHq"   # DMA running, source, end
+    "q3Bq"  # timer: div_start, TMA, TAC, TIMA value, TIMA time
+    "q"     # serial transfer end
+    "B2IQqB"  # PPU: mode, cycle limit, cycles spent, frame count, mode end, window line
+    "Q"     # cycle counter
+)
+
+MBC_LENGTH = struct.Struct("<I")
+
+
+def _buffers(mmu):
+    return (mmu.vram, mmu.wram, mmu.oam, mmu.io_regs, mmu.hram)
+
+
+def _due(event):
+    return NO_EVENT if event is None else event[0]
+
+
+def save_state(gameboy):
+    """the state of `gameboy` as bytes"""
+    cpu, mmu, ppu, timer = gameboy.cpu, gameboy.mmu, gameboy.ppu, gameboy.timer
+    serial = gameboy.serial
+    r = cpu.registers
+
+    # the lines done so far belong in the framebuffer, not in the state
+    ppu.flush_lines()
+
+    state = STATE.pack(
+        r.A, r.B, r.C, r.D, r.E, r.F, r.H, r.L,
+        r.SP, r.PC,
+        cpu.ime, cpu.ime_requested, cpu.halted,
+        mmu.ie_reg, mmu.if_reg,
+        mmu.boot_rom_enabled, mmu.joyp_select, *mmu.button_states,
+        mmu.dma_transfer_enabled, mmu.dma_transfer_source, _due(mmu.dma_end_event),
+        timer.div_start, timer.TMA, timer.TAC, timer.tima_value, timer.tima_time,
+        _due(serial.transfer_event),
+        ppu.mode.value, ppu.cycle_limit, ppu.cycles_spent, ppu.frame_count,
+        _due(ppu.mode_event), ppu.scanline_renderer.window_line,
+        gameboy.scheduler.cycles,
+    )
+
+    save_mbc = getattr(mmu.mbc, "save_state", None)
+    mbc_state = save_mbc() if save_mbc is not None else b""
+
+    return b"".join([
+        HEADER.pack(MAGIC, VERSION), state,
+        *(memoryview(buffer) for buffer in _buffers(mmu)),
+        MBC_LENGTH.pack(len(mbc_state)), mbc_state,
+    ])
+
+
+def load_state(gameboy, data):
+    """restore `gameboy` from bytes returned by save_state()"""
+    cpu, mmu, ppu, timer = gameboy.cpu, gameboy.mmu, gameboy.ppu, gameboy.timer
+    serial = gameboy.serial
+    scheduler = gameboy.scheduler
+    data = memoryview(data)
+
+    magic, version = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError("not a save state")
+    if version != VERSION:
+        raise ValueError(f"save state version {version} is not supported (expected {VERSION})")
+    offset = HEADER.size
+
+    (a, b, c, d, e, f, h, l, sp, pc,
+     ime, ime_requested, halted,
+     ie_reg, if_reg,
+     boot_rom_enabled, joyp_select, directions, actions,
+     dma_enabled, dma_source, dma_end,
+     div_start, tma, tac, tima_value, tima_time,
+     serial_end,
+     ppu_mode, cycle_limit, cycles_spent, frame_count, mode_end, window_line,
+     cycles) = STATE.unpack_from(data, offset)
+    offset += STATE.size
+
+    for buffer in _buffers(mmu):
+        buffer[:] = data[offset:offset + len(buffer)]
+        offset += len(buffer)
+
+    (mbc_length,) = MBC_LENGTH.unpack_from(data, offset)
+    offset += MBC_LENGTH.size
+    if mbc_length:
+        mmu.mbc.load_state(data[offset:offset + mbc_length])
+
+    # CPU
+    r = cpu.registers
+    r.A, r.B, r.C, r.D, r.E, r.F, r.H, r.L = a, b, c, d, e, f, h, l
+    r.SP, r.PC = sp, pc
+    cpu.ime = bool(ime)
+    cpu.ime_requested = ime_requested
+    cpu.halted = bool(halted)
+
+    # MMU, the setters remap pages and update the pending interrupts
+    mmu.ie_reg = ie_reg
+    mmu.if_reg = if_reg
+    mmu.boot_rom_enabled = bool(boot_rom_enabled)
+    mmu.joyp_select = joyp_select
+    mmu.button_states = (directions, actions)
+    mmu.dma_transfer_enabled = bool(dma_enabled)
+    mmu.dma_transfer_source = dma_source
+
+    # timer
+    timer.overflow_event = None
+    timer.div_start = div_start
+    timer.TMA, timer.TAC = tma, tac
+    timer.tima_value, timer.tima_time = tima_value, tima_time
+
+    # PPU, STAT is in io_regs already
+    ppu.mode = PPU_MODES(ppu_mode)
+    ppu.cycle_limit = cycle_limit
+    ppu.cycles_spent = cycles_spent
+    ppu.frame_count = frame_count
+    ppu.scanline_renderer.window_line = window_line
+    ppu.pending_start = ppu.pending_end = None
+    if ppu.frameskip:
+        ppu._start_frame()
+
+    # caches of memory contents
+    ppu.generation += 1
+    ppu.framebuffer_generation = None
+    if ppu.scanline_renderer.tile_cache is not None:
+        ppu.scanline_renderer.tile_cache.invalidate_all()
+    if cpu.block_cache is not None:
+        cpu.block_cache.clear()
+
+    # events
+    scheduler.reset(cycles)
+    mmu.dma_end_event = None
+    if dma_end != NO_EVENT:
+        mmu.dma_end_event = scheduler.schedule_at(dma_end, mmu._on_dma_end, "dma")
+    timer._schedule_overflow()
+    serial.transfer_event = None
+    if serial_end != NO_EVENT:
+        serial.transfer_event = scheduler.schedule_at(serial_end, serial._on_transfer_end, "serial")
+    ppu.mode_event = None
+    if mode_end != NO_EVENT:
+        ppu.mode_event = scheduler.schedule_at(mode_end, ppu._on_mode_end, "ppu")
+    gameboy._schedule_host_events()
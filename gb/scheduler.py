@@ -0,0 +1,82 @@
+################################################################################
+# Event scheduler
+#
+# Keeps a global cycle counter and a min-heap of upcoming events (PPU mode
+# transitions, timer ticks, input polling, ...). Instead of stepping every
+# component after every instruction, the CPU runs instructions in a tight
+# loop until the next event is due, then the due events run. see
+# GameBoy.run_until() in gb/gameboy.py
+#
+# The main loop runs until `stop`, the earlier of the next event and the
+# end of the run (`target`). Scheduling an event lowers it, so an event
+# scheduled while the CPU runs (a TAC write, DMA, a serial transfer) is not
+# late.
+#
+# An event callback gets the cycle it was due at (the CPU may have run a few
+# cycles past it) and reschedules itself relative to that time, so periodic
+# events don't drift.
+################################################################################
+
+import heapq
+
+# next_event when nothing is scheduled
+NEVER = float("inf")
+
+class Scheduler():
+    def __init__(self):
+        # global cycle counter, advanced by the main loop
+        self.cycles = 0
+
+        # heap of [time, order, callback, name]
+        # order keeps events due at the same cycle in scheduling order.
+        # a cancelled event has its callback set to None
+        self.events = []
+        self._order = 0
+
+        # time of the earliest event
+        self.next_event = NEVER
+
+        # cycle the current GameBoy.run_until() runs to
+        self.target = NEVER
+
+        # cycle the main loop runs to, read after every instruction
+        self.stop = NEVER
+
+    def schedule_at(self, time, callback, name=""):
+        """run callback(time) once the cycle counter reaches `time`"""
+        self._order += 1
+        event = [time, self._order, callback, name]
+        heapq.heappush(self.events, event)
+        if time < self.next_event:
+            self.next_event = time
+        if time < self.stop:
+            self.stop = time
+        return event
+
+    def schedule(self, delay, callback, name=""):
+        """run callback(time) `delay` cycles from now"""
+        return self.schedule_at(self.cycles + delay, callback, name)
+
+    def cancel(self, event):
+        """cancel an event returned by schedule()/schedule_at()"""
+        event[2] = None
+
+    def run_due(self):
+        """run every event that is due"""
+        events = self.events
+        while events and events[0][0] <= self.cycles:
+            time, _, callback, _ = heapq.heappop(events)
+            if callback is not None:
+                callback(time)
+        self.next_event = events[0][0] if events else NEVER
+        self.stop = min(self.next_event, self.target)
+
+    def reset(self, cycles=0):
+        """drop every event and set the cycle counter, see gb/savestate.py"""
+        self.events = []
+        self.cycles = cycles
+        self.next_event = self.stop = self.target = NEVER
+
+    def pending(self):
+        """(time, name) of the scheduled events in order, for debugging"""
+        return [(event[0], event[3]) for event in sorted(self.events) if event[2] is not None]
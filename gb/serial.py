@@ -0,0 +1,94 @@
+################################################################################
+# Serial port (SB, SC)
+#
+# There is no link cable partner. A transfer started with the internal clock
+# sends SB out bit by bit at 8192 Hz and shifts in 1s, so 8 * 512 cycles
+# later SB reads 0xFF, SC bit 7 is cleared and the serial interrupt is
+# requested. That is one scheduled event per byte.
+#
+# Every byte sent is appended to `output`. Test ROMs (blargg's cpu_instrs)
+# print their results this way, a harness can stop as soon as `output`
+# holds "Passed" or "Failed" (see result()) instead of running for a fixed
+# number of cycles.
+#
+# see https://gbdev.io/pandocs/Serial_Data_Transfer_(Link_Cable).html
+################################################################################
+
+# cycles to send one byte, 8 bits at 8192 Hz
+TRANSFER_CYCLES = 8 * 512
+
+# SC bit 7 starts a transfer / is set while one runs, bit 0 selects the
+# internal clock
+SC_TRANSFER = 0x80
+SC_INTERNAL_CLOCK = 0x01
+
+# serial interrupt bit of IE/IF
+SERIAL_INTERRUPT = 0x08
+
+# what test ROMs print when they are done
+PASSED = b"Passed"
+FAILED = b"Failed"
+
+class Serial():
+    def __init__(self):
+        # bytes sent since power on (or clear())
+        self.output = bytearray()
+
+        # the scheduled end of the running transfer
+        self.transfer_event = None
+
+        # set by register_io(), SB/SC are stored in mmu.io_regs
+        self.mmu = None
+
+        # mmu.scheduler, set by register_io()
+        self.scheduler = None
+
+    def text(self):
+        """output as a string"""
+        return self.output.decode("latin-1")
+
+    def result(self):
+        """"passed" or "failed" once a test ROM has printed its result, else None"""
+        if PASSED in self.output:
+            return "passed"
+        if FAILED in self.output:
+            return "failed"
+        return None
+
+    def clear(self):
+        self.output.clear()
+
+    ###########################################################################
+    # registers
+    ###########################################################################
+    def register_io(self, mmu):
+        """handle the serial registers in `mmu`"""
+        self.mmu = mmu
+        self.scheduler = mmu.scheduler
+        mmu.register_io(0xFF02, self._read_sc, self._write_sc)
+
+    def _read_sc(self, address):
+        # unused bits read as 1
+        return 0x7E | self.mmu.io_regs[0x02]
+
+    def _write_sc(self, address, value, ppu_write):
+        io_regs = self.mmu.io_regs
+        io_regs[0x02] = value & (SC_TRANSFER | SC_INTERNAL_CLOCK)
+        if self.transfer_event is not None:
+            # a new write restarts (or stops) the transfer
+            self.scheduler.cancel(self.transfer_event)
+            self.transfer_event = None
+        # with the external clock nothing is ever clocked in, the
+        # transfer never ends
+        if value & SC_TRANSFER and value & SC_INTERNAL_CLOCK:
+            self.output.append(io_regs[0x01])
+            self.transfer_event = self.scheduler.schedule(
+                TRANSFER_CYCLES, self._on_transfer_end, "serial")
+
+    def _on_transfer_end(self, time):
+        self.transfer_event = None
+        io_regs = self.mmu.io_regs
+        # nothing on the other end, 1s are shifted in
+        io_regs[0x01] = 0xFF
+        io_regs[0x02] &= ~SC_TRANSFER
+        self.mmu.if_reg |= SERIAL_INTERRUPT
@@ -1,18 +1,165 @@
+################################################################################
+# Timer (DIV, TIMA, TMA, TAC)
+#
+# Nothing is counted per instruction. DIV is the upper byte of a 16 bit
+# counter running at the CPU clock, so it is worked out from the global cycle
+# counter when 0xFF04 is read. TIMA counts falling edges of one bit of that
+# counter (chosen by TAC), which happen every `period` cycles, so it is
+# worked out the same way from the cycle it was last written at. The only
+# event is TIMA overflowing: it is scheduled once, for the cycle it happens
+# at, and reloads TIMA from TMA and requests the timer interrupt.
+#
+# see https://gbdev.io/pandocs/Timer_and_Divider_Registers.html
+################################################################################
+
 #TODO: Handle timer stops after HALT and STOP instructions
+#TODO: TIMA increments caused by writing DIV/TAC, and the 4 cycle delay
+#      before TMA is reloaded after an overflow
+
+# cycles between TIMA increments for TAC bits 0-1
+TIMA_PERIODS = (1024, 16, 64, 256)
+
+# TAC bit 2 enables TIMA
+TAC_ENABLE = 0x04
+
+# timer interrupt bit of IE/IF
+TIMER_INTERRUPT = 0x04
 
 class Timer():
     def __init__(self):
-        self.DIV = 0x00  # Divider Register (0xFF04)
-        self.TIMA = 0x00 # Timer Counter (0xFF05)
+        # cycle the 16 bit divider counter was 0 at, DIV is its upper byte
+        self.div_start = 0
+
         self.TMA = 0x00  # Timer Modulo (0xFF06)
         self.TAC = 0x00  # Timer Control (0xFF07)
 
-        self.div_counter = 0
-        self.tima_counter = 0
-    
+        # TIMA (0xFF05) was tima_value at cycle tima_time, it has counted
+        # every falling edge since if the timer is enabled
+        self.tima_value = 0x00
+        self.tima_time = 0
+
+        # the scheduled overflow, None while the timer is stopped
+        self.overflow_event = None
+
+        # set by register_io(), overflows request an interrupt through it
+        self.mmu = None
+
+        # mmu.scheduler, set by register_io()
+        self.scheduler = None
+
+    ###########################################################################
+    # registers
+    ###########################################################################
+    @property
+    def divider(self):
+        """the 16 bit counter DIV is the upper byte of"""
+        return (self.scheduler.cycles - self.div_start) & 0xFFFF
+
+    @divider.setter
+    def divider(self, value):
+        self.div_start = self.scheduler.cycles - value
+
+    @property
+    def DIV(self):
+        return self.divider >> 8
+
+    @DIV.setter
+    def DIV(self, value):
+        self.divider = value << 8
+
+    @property
+    def TIMA(self):
+        if not self.TAC & TAC_ENABLE:
+            return self.tima_value
+        value = self.tima_value + self._edges(self.tima_time, self.scheduler.cycles)
+        if value > 0xFF:
+            # overflowed, but the overflow event hasn't run yet: it was
+            # reloaded from TMA and counted on from there
+            value = self.TMA + (value - 0x100) % (0x100 - self.TMA)
+        return value
+
+    @TIMA.setter
+    def TIMA(self, value):
+        self.tima_value = value
+        self.tima_time = self.scheduler.cycles
+        self._schedule_overflow()
+
+    def _edges(self, start, end):
+        """TIMA increments between cycles `start` and `end`"""
+        period = TIMA_PERIODS[self.TAC & 3]
+        return (end - self.div_start) // period - (start - self.div_start) // period
+
+    def register_io(self, mmu):
+        """handle the timer registers in `mmu`"""
+        self.mmu = mmu
+        self.scheduler = mmu.scheduler
+        mmu.register_io(0xFF04, self._read_div, self._write_div)
+        mmu.register_io(0xFF05, self._read_tima, self._write_tima)
+        mmu.register_io(0xFF06, self._read_tma, self._write_tma)
+        mmu.register_io(0xFF07, self._read_tac, self._write_tac)
+
+    def _read_div(self, address):
+        return self.DIV
+
+    def _write_div(self, address, value, ppu_write):
+        # writing any value resets the divider counter to 0. TIMA counts
+        # edges of that counter, so it restarts from its current value
+        tima = self.TIMA
+        self.divider = 0
+        self.TIMA = tima
+
+    def _read_tima(self, address):
+        return self.TIMA
+
+    def _write_tima(self, address, value, ppu_write):
+        self.TIMA = value
+
+    def _read_tma(self, address):
+        return self.TMA
+
+    def _write_tma(self, address, value, ppu_write):
+        # only read when TIMA overflows
+        self.TMA = value
+
+    def _read_tac(self, address):
+        # unused bits read as 1
+        return 0xF8 | self.TAC
+
+    def _write_tac(self, address, value, ppu_write):
+        tima = self.TIMA
+        self.TAC = value & 0x07
+        self.TIMA = tima
+
+    ###########################################################################
+    # overflow
+    ###########################################################################
+    def _schedule_overflow(self):
+        """(re)schedule the cycle TIMA overflows at, from tima_value/tima_time"""
+        if self.overflow_event is not None:
+            self.scheduler.cancel(self.overflow_event)
+            self.overflow_event = None
+        if not self.TAC & TAC_ENABLE:
+            return
+        # the (256 - TIMA)th falling edge after tima_time
+        period = TIMA_PERIODS[self.TAC & 3]
+        edge = (self.tima_time - self.div_start) // period + 0x100 - self.tima_value
+        self.overflow_event = self.scheduler.schedule_at(
+            self.div_start + edge * period, self._on_overflow, "timer")
+
+    def _on_overflow(self, time):
+        self.overflow_event = None
+        self.tima_value = self.TMA
+        self.tima_time = time
+        if self.mmu is not None:
+            self.mmu.if_reg |= TIMER_INTERRUPT
+        self._schedule_overflow()
+
     def step(self, cycles):
-        # Increment DIV every 256 cycles
-        self.div_counter += cycles
-        if self.div_counter >= 256:
-            self.div_counter -= 256
-            self.DIV = (self.DIV + 1) & 0xFF
+        """
+        advance the scheduler by `cycles` and run the due events (DMA and
+        serial too), for loops stepping the components by hand instead of
+        GameBoy.run_until()
+        """
+        self.scheduler.cycles += cycles
+        if self.scheduler.next_event <= self.scheduler.cycles:
+            self.scheduler.run_due()
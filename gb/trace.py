@@ -0,0 +1,141 @@
+################################################################################
+# Structured tracing
+#
+# Components record binary trace records into a preallocated ring buffer
+# instead of printing. Records are grouped in categories (see
+# gb/util/trace_categories.py) that are enabled one by one.
+#
+# A disabled category costs nothing: components register an install and an
+# uninstall hook per category with add_hook(). Installing swaps in traced
+# versions of their handlers (page table entries, bound methods), so the
+# normal code paths never test whether tracing is on.
+#
+# Each record is RECORD: cycle, category, kind, a, b. What kind, a and b
+# mean depends on the category, see format_record().
+################################################################################
+
+import struct
+import sys
+from weakref import WeakMethod
+from gb.util.trace_categories import TRACE_CATEGORIES, CATEGORY_NAMES
+
+# cycle (u64), category (u8), kind (u8), a (u16), b (u16)
+RECORD = struct.Struct("<QBBHH")
+
+DEFAULT_CAPACITY = 1 << 16
+
+# kinds of TRACE_CATEGORIES.MMU_IO records, a = address, b = value
+IO_READ = 0
+IO_WRITE = 1
+
+# kinds of TRACE_CATEGORIES.MMU_INVALID records, a = address, b = value
+INVALID_ECHO_WRITE = 0
+INVALID_UNUSABLE_WRITE = 1
+INVALID_CART_RAM_READ = 2
+INVALID_CART_RAM_WRITE = 3
+INVALID_KIND_NAMES = ["echo RAM write", "Not Usable write", "cart RAM read", "cart RAM write"]
+
+# TRACE_CATEGORIES.CPU_OPCODE: a = PC, b = opcode
+# TRACE_CATEGORIES.PPU_MODE: kind = PPU_MODES value, a = LY
+# TRACE_CATEGORIES.INTERRUPT: kind = interrupt bit, a = vector, b = PC before
+INTERRUPT_NAMES = ["V-Blank", "LCD STAT", "Timer", "Serial", "Joypad"]
+PPU_MODE_NAMES = ["H_BLANK", "V_BLANK", "OAM_SCAN", "PIXEL_TRANSFER"]
+
+CATEGORIES_BY_VALUE = {category.value: category for category in TRACE_CATEGORIES}
+
+
+def format_record(cycle, category, kind, a, b):
+    """one record as a line of text"""
+    name = CATEGORY_NAMES[category]
+    if category == TRACE_CATEGORIES.MMU_IO:
+        text = f"{'write' if kind == IO_WRITE else 'read'} {a:04X} = {b:02X}"
+    elif category == TRACE_CATEGORIES.MMU_INVALID:
+        text = f"{INVALID_KIND_NAMES[kind]} {a:04X} = {b:02X}"
+    elif category == TRACE_CATEGORIES.CPU_OPCODE:
+        text = f"PC={a:04X} opcode={b:02X}"
+    elif category == TRACE_CATEGORIES.PPU_MODE:
+        text = f"{PPU_MODE_NAMES[kind]} LY={a}"
+    else:
+        text = f"{INTERRUPT_NAMES[kind]} vector={a:04X} PC={b:04X}"
+    return f"{cycle:12} {name:12} {text}"
+
+
+class Tracer():
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        # ring buffer of `capacity` records, the oldest get overwritten.
+        # allocated once when a category is first enabled
+        self.capacity = capacity
+        self.buffer = bytearray()
+
+        # records written since the last clear(), including overwritten ones
+        self.count = 0
+
+        # returns the cycle stored in each record, see GameBoy
+        self.clock = lambda: 0
+
+        # category -> [(install, uninstall)] as weak methods, the tracer
+        # doesn't keep the components alive
+        self.hooks = {category: [] for category in TRACE_CATEGORIES}
+        self.enabled = set()
+
+    def add_hook(self, category, install, uninstall):
+        """
+        install() is called when `category` is enabled, uninstall() when disabled.
+        both must be bound methods.
+        """
+        self.hooks[category].append((WeakMethod(install), WeakMethod(uninstall)))
+        if category in self.enabled:
+            install()
+
+    def _run_hooks(self, category, index):
+        for hook in self.hooks[category]:
+            method = hook[index]()
+            if method is not None:
+                method()
+
+    def enable(self, *categories):
+        if not self.buffer:
+            self.buffer = bytearray(self.capacity * RECORD.size)
+        for category in categories:
+            if category not in self.enabled:
+                self.enabled.add(category)
+                self._run_hooks(category, 0)
+
+    def disable(self, *categories):
+        for category in categories:
+            if category in self.enabled:
+                self.enabled.discard(category)
+                self._run_hooks(category, 1)
+
+    def record(self, category, kind, a, b):
+        """add a record, only called by installed (traced) handlers"""
+        RECORD.pack_into(self.buffer, (self.count % self.capacity) * RECORD.size,
+                         self.clock(), category.value, kind, a & 0xFFFF, b & 0xFFFF)
+        self.count += 1
+
+    def clear(self):
+        self.count = 0
+
+    def records(self):
+        """the records still in the buffer, oldest first, as tuples"""
+        first = max(0, self.count - self.capacity)
+        size = RECORD.size
+        records = []
+        for i in range(first, self.count):
+            cycle, category, kind, a, b = RECORD.unpack_from(self.buffer, (i % self.capacity) * size)
+            records.append((cycle, CATEGORIES_BY_VALUE[category], kind, a, b))
+        return records
+
+    def dump_binary(self):
+        """the records still in the buffer, oldest first, as packed RECORDs"""
+        size = RECORD.size
+        if self.count <= self.capacity:
+            return bytes(self.buffer[:self.count * size])
+        split = (self.count % self.capacity) * size
+        return bytes(self.buffer[split:] + self.buffer[:split])
+
+    def dump(self, file=None):
+        """write the records as text, oldest first"""
+        file = file or sys.stdout
+        for record in self.records():
+            file.write(format_record(*record) + "\n")
@@ -0,0 +1,14 @@
+from enum import Enum
+
+class EXECUTION_MODES(Enum):
+    """
+    how much checking the CPU, Registers and MMU do.
+    chosen once when the MMU is constructed; the CPU uses the same mode.
+    """
+    # range checks on every register and memory access.
+    # for development, tests and chasing bugs
+    STRICT = 0
+
+    # check-free implementations are bound at construction time,
+    # so the hot paths never test which mode is active
+    FAST = 1
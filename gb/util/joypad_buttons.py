@@ -0,0 +1,16 @@
+from enum import Enum
+
+class JOYPAD_BUTTONS(Enum):
+    """
+    the 8 buttons, as (group, bit) in MMU.button_states.
+    group 0 are the direction buttons, group 1 the action buttons
+    see: https://gbdev.io/pandocs/Joypad_Input.html
+    """
+    RIGHT = (0, 0)
+    LEFT = (0, 1)
+    UP = (0, 2)
+    DOWN = (0, 3)
+    A = (1, 0)
+    B = (1, 1)
+    SELECT = (1, 2)
+    START = (1, 3)
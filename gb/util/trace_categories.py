@@ -0,0 +1,30 @@
+from enum import Enum
+
+class TRACE_CATEGORIES(Enum):
+    """
+    categories of trace records, enabled one by one.
+    see gb/trace.py
+    """
+    # reads and writes of IO registers (0xFF00-0xFF7F)
+    MMU_IO = 0
+
+    # writes to echo RAM and the Not Usable area, accesses to missing cartridge RAM
+    MMU_INVALID = 1
+
+    # every opcode executed by the interpreter
+    CPU_OPCODE = 2
+
+    # PPU mode changes
+    PPU_MODE = 3
+
+    # serviced interrupts
+    INTERRUPT = 4
+
+# names used when dumping and on the command line
+CATEGORY_NAMES = {
+    TRACE_CATEGORIES.MMU_IO: "mmu.io",
+    TRACE_CATEGORIES.MMU_INVALID: "mmu.invalid",
+    TRACE_CATEGORIES.CPU_OPCODE: "cpu.opcode",
+    TRACE_CATEGORIES.PPU_MODE: "ppu.mode",
+    TRACE_CATEGORIES.INTERRUPT: "interrupt",
+}
@@ -0,0 +1,114 @@
+################################################################################
+# SDL2 renderer (PySDL2)
+#
+# Gets the whole framebuffer once per frame (PPU calls render_frame() when
+# V-Blank starts). The shades are turned into ARGB pixels with one NumPy
+# palette lookup, then copied into a streaming texture with a single memmove
+# while it is locked. No SDL call happens per pixel or per line.
+#
+# Frames the PPU reports as unchanged (see PPU.present_frame) are neither
+# uploaded nor presented again.
+#
+# see https://wiki.libsdl.org/SDL2/SDL_LockTexture
+################################################################################
+
+import ctypes
+import numpy as np
+import sdl2
+
+from gb.ppu import SCREEN_WIDTH, SCREEN_HEIGHT
+from gb.inputs import QUIT
+from gb.util.joypad_buttons import JOYPAD_BUTTONS
+
+# ARGB8888 color of shades 0 (white) to 3 (black), DMG green
+DMG_PALETTE = (0xFFE0F8D0, 0xFF88C070, 0xFF346856, 0xFF081820)
+
+# keyboard -> joypad
+KEY_BINDINGS = {
+    sdl2.SDLK_RIGHT: JOYPAD_BUTTONS.RIGHT,
+    sdl2.SDLK_LEFT: JOYPAD_BUTTONS.LEFT,
+    sdl2.SDLK_UP: JOYPAD_BUTTONS.UP,
+    sdl2.SDLK_DOWN: JOYPAD_BUTTONS.DOWN,
+    sdl2.SDLK_z: JOYPAD_BUTTONS.A,
+    sdl2.SDLK_x: JOYPAD_BUTTONS.B,
+    sdl2.SDLK_BACKSPACE: JOYPAD_BUTTONS.SELECT,
+    sdl2.SDLK_RETURN: JOYPAD_BUTTONS.START,
+}
+
+class SDLRenderer():
+    def __init__(self, scale=3, palette=DMG_PALETTE, title=b"Game Boy"):
+        if sdl2.SDL_Init(sdl2.SDL_INIT_VIDEO) != 0:
+            raise RuntimeError(f"SDL_Init failed: {sdl2.SDL_GetError().decode()}")
+
+        self.window = sdl2.SDL_CreateWindow(
+            title, sdl2.SDL_WINDOWPOS_CENTERED, sdl2.SDL_WINDOWPOS_CENTERED,
+            SCREEN_WIDTH * scale, SCREEN_HEIGHT * scale, sdl2.SDL_WINDOW_SHOWN)
+        self.renderer = sdl2.SDL_CreateRenderer(self.window, -1, sdl2.SDL_RENDERER_ACCELERATED)
+        # the texture is scaled to the window when copied
+        self.texture = sdl2.SDL_CreateTexture(
+            self.renderer, sdl2.SDL_PIXELFORMAT_ARGB8888,
+            sdl2.SDL_TEXTUREACCESS_STREAMING, SCREEN_WIDTH, SCREEN_HEIGHT)
+
+        # palette[shade] = ARGB pixel
+        self.palette = np.array(palette, dtype=np.uint32)
+
+        # ARGB pixels of the last frame, uploaded from here
+        self.pixels = np.zeros((SCREEN_HEIGHT, SCREEN_WIDTH), dtype=np.uint32)
+
+        # set when the window needs to be drawn again without a new frame
+        self.redraw = False
+
+        # reused by every SDL_LockTexture call
+        self._locked_pixels = ctypes.c_void_p()
+        self._pitch = ctypes.c_int()
+        self._event = sdl2.SDL_Event()
+
+    def render_frame(self, framebuffer, changed=True):
+        if changed:
+            # shades -> ARGB, one vectorized lookup
+            np.take(self.palette, framebuffer, out=self.pixels)
+            self.upload()
+        elif not self.redraw:
+            # the window already shows this frame
+            return
+        self.redraw = False
+        sdl2.SDL_RenderCopy(self.renderer, self.texture, None, None)
+        sdl2.SDL_RenderPresent(self.renderer)
+
+    def upload(self):
+        """copy self.pixels into the texture"""
+        locked, pitch = self._locked_pixels, self._pitch
+        if sdl2.SDL_LockTexture(self.texture, None, ctypes.byref(locked), ctypes.byref(pitch)) != 0:
+            raise RuntimeError(f"SDL_LockTexture failed: {sdl2.SDL_GetError().decode()}")
+        row_bytes = SCREEN_WIDTH * 4
+        if pitch.value == row_bytes:
+            ctypes.memmove(locked, self.pixels.ctypes.data, self.pixels.nbytes)
+        else:
+            # rows are padded, copy into a strided view of the texture
+            texture = np.ctypeslib.as_array(
+                ctypes.cast(locked, ctypes.POINTER(ctypes.c_uint8)),
+                shape=(SCREEN_HEIGHT, pitch.value))
+            texture[:, :row_bytes] = self.pixels.view(np.uint8).reshape(SCREEN_HEIGHT, row_bytes)
+        sdl2.SDL_UnlockTexture(self.texture)
+
+    def get_input(self):
+        """joypad events since the last poll, see gb/inputs.py"""
+        events = []
+        event = self._event
+        while sdl2.SDL_PollEvent(ctypes.byref(event)):
+            if event.type == sdl2.SDL_QUIT:
+                events.append(QUIT)
+            elif event.type in (sdl2.SDL_KEYDOWN, sdl2.SDL_KEYUP):
+                button = KEY_BINDINGS.get(event.key.keysym.sym)
+                if button is not None and not event.key.repeat:
+                    events.append((button, event.type == sdl2.SDL_KEYDOWN))
+            elif event.type == sdl2.SDL_WINDOWEVENT:
+                if event.window.event == sdl2.SDL_WINDOWEVENT_EXPOSED:
+                    self.redraw = True
+        return events
+
+    def close(self):
+        sdl2.SDL_DestroyTexture(self.texture)
+        sdl2.SDL_DestroyRenderer(self.renderer)
+        sdl2.SDL_DestroyWindow(self.window)
+        sdl2.SDL_Quit()
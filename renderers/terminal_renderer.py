@@ -9,11 +9,16 @@ class TerminalRenderer():
         # self.stdscr = curses.initscr()
         # self.stdscr.nodelay(True)  # non-blocking input
 
-    def render_scanline(self, ppu):
-        # TODO: implement
-        print(f"Rendering scanline: {ppu.ly}")
+    def render_frame(self, framebuffer, changed=True):
+        # TODO: draw with curses
+        if changed:
+            self.framebuffer[:] = framebuffer
         
     def get_input(self):
         # input_char =  self.stdscr.getch()
         # return chr(input_char) if input_char != -1 else None
-        return
\ No newline at end of file
+        return []
+
+    def close(self):
+        # curses.endwin()
+        pass
@@ -1,51 +1,50 @@
+import argparse
+import importlib
 from gb.mbc.mbc0 import MBC0
-from gb.mbc.mbc1 import MBC1
-from gb.mmu import MMU
-from gb.cpu.cpu import CPU
-from gb.ppu import PPU
-from gb.inputs import InputHandler
-# from renderers.terminal_renderer import TerminalRenderer
-# from renderers.pygame_renderer import PygameRenderer
-# from renderers.vram_pygame_renderer import VramPygameRenderer
-from renderers.sdl_renderer import SDLRenderer
+from gb.gameboy import GameBoy
+from gb.util.execution_modes import EXECUTION_MODES
+
+# renderer name -> (module, class), imported only when chosen so optional
+# dependencies (PySDL2) are only needed for the renderer in use
+RENDERERS = {
+    "sdl": ("renderers.sdl_renderer", "SDLRenderer"),
+    "terminal": ("renderers.terminal_renderer", "TerminalRenderer"),
+}
+
+def make_renderer(name, scale):
+    module, cls = RENDERERS[name]
+    renderer_cls = getattr(importlib.import_module(module), cls)
+    if name == "terminal":
+        return renderer_cls()
+    return renderer_cls(scale=scale)
 
 def run():
-    # Initialize components
+    parser = argparse.ArgumentParser(description="Game Boy emulator")
+    # Tetris by default
+    # Test ROMs: ./tests/cpu_test_roms/cpu_instrs.gb,
+    #            ./tests/cpu_test_roms/individual/06-ld r,r.gb
+    parser.add_argument("rom", nargs="?", default="./roms/tetris.gb")
+    parser.add_argument("--renderer", choices=RENDERERS, default="sdl")
+    parser.add_argument("--scale", type=int, default=3)
+    args = parser.parse_args()
 
-    # Tetris
+    # Initialize components
     # Using MBC0 for no bank switching
-    # No ROM loaded for this example
-    mbc = MBC0("./roms/tetris.gb")
-    
-    # Pokemon Red
-    # mbc = MBC1("./roms/pokemon_red.gb")
-
-    # Test ROMs
-    # mbc = MBC0("./tests/cpu_test_roms/cpu_instrs.gb")
-    # mbc = MBC0("./tests/cpu_test_roms/individual/06-ld r,r.gb")
-
-    mmu = MMU(mbc=mbc)
-
-    # renderer = TerminalRenderer()
-    # renderer = PygameRenderer(scale=3)
-    renderer = SDLRenderer(scale=3)
-    # renderer = VramPygameRenderer(scale=3)
-    cpu = CPU(mmu=mmu)
-    ppu = PPU(mmu=mmu, renderer=renderer)
-    input_handler = InputHandler(cpu)
-
-    # Main emulation loop (simplified)
-    while True:
-        # Execute one CPU instruction
-        cycles = cpu.step()
-        cpu.mmu.timer.step(cycles)  # Update timers with the number of cycles taken by CPU
-
-        # Step PPU with the number of cycles taken by CPU
-        ppu.step(cycles)
-
-
-        # Read and handle input
-        input_handler.handle_input(renderer.get_input())
+    # TODO: MBC1 (gb/mbc/mbc1.py) for Pokemon Red
+    mbc = MBC0(args.rom)
+    renderer = make_renderer(args.renderer, args.scale)
+
+    # use EXECUTION_MODES.STRICT when chasing bugs
+    # input is polled from the renderer once per frame, see gb/inputs.py
+    gameboy = GameBoy(mbc, renderer=renderer, mode=EXECUTION_MODES.FAST)
+
+    # Main emulation loop
+    # the CPU runs until the next scheduled event (PPU mode change, timer,
+    # input polling), see gb/scheduler.py
+    try:
+        gameboy.run()
+    finally:
+        renderer.close()
 
 if __name__ == "__main__":
     run()
@@ -0,0 +1,57 @@
+"""
+Tests for the headless batch runner in gb/batch.py
+"""
+
+from gb import batch
+from gb.cpu.instructions.cycle_arr_1 import cycle_arr_1
+
+ROMS = "./tests/cpu_test_roms/individual"
+ROM = ROMS + "/06-ld r,r.gb"
+
+
+def test_find_roms():
+    roms = batch.find_roms([ROMS, ROM])
+    assert len(roms) == 12
+    assert roms[0].endswith("01-special.gb") and roms[-1] == ROM
+
+
+def test_run_rom_budget():
+    result = batch.run_rom(ROM, frames=5)
+    assert result["result"] == batch.RESULT_BUDGET
+    assert result["frames"] == 5
+    assert result["error"] is None
+
+    cycles = batch.run_rom(ROM, cycles=100000)
+    assert cycles["result"] == batch.RESULT_BUDGET
+    # run_until stops after the instruction that reaches the budget,
+    # translated blocks included
+    assert 100000 <= cycles["cycles"] < 100000 + max(cycle_arr_1)
+
+
+def test_run_rom_until_loop():
+    result = batch.run_rom(ROM, frames=1000, until="loop")
+    assert result["result"] == "loop"
+    assert result["frames"] < 1000
+
+
+def test_run_rom_error():
+    result = batch.run_rom("./tests/cpu_test_roms/missing.gb", frames=1)
+    assert result["result"] == batch.RESULT_ERROR
+    assert result["error"].startswith("FileNotFoundError")
+
+
+def test_run_batch_matches_run_rom():
+    roms = [ROM, ROM]
+    results = batch.run_batch(roms, frames=3, workers=2)
+    single = batch.run_rom(ROM, frames=3)
+    assert [r["rom"] for r in results] == roms
+    for r in results:
+        assert r["cycles"] == single["cycles"]
+        assert r["framebuffer_hash"] == single["framebuffer_hash"]
+
+
+def test_run_rom_until_serial():
+    result = batch.run_rom(ROM, frames=600, until="serial")
+    assert result["result"] in ("passed", "failed")
+    assert result["serial"].startswith("06-ld r,r\n")
+    assert result["frames"] < 600
@@ -0,0 +1,125 @@
+"""
+Tests for the basic-block translation cache in gb/cpu/block_cache.py
+"""
+
+import pytest
+from gb.mbc.mbc0 import MBC0
+from gb.mmu import MMU
+from gb.cpu.cpu import CPU
+from gb.gameboy import GameBoy
+from gb.cpu.instructions.cycle_arr_1 import cycle_arr_1
+
+
+@pytest.fixture
+def cpu():
+    cpu = CPU(MMU(MBC0(None)), translate=True)
+    cpu.no_boot_rom_setup()
+    return cpu
+
+
+def load(cpu, address, code):
+    for i, byte in enumerate(code):
+        cpu.mmu.write_byte(address + i, byte)
+    cpu.registers.PC = address
+
+
+def test_block_runs_until_jump(cpu):
+    # LD A,0x12; LD B,A; INC B; JP 0xC100
+    load(cpu, 0xC000, [0x3E, 0x12, 0x47, 0x04, 0xC3, 0x00, 0xC1])
+    cycles = cpu.step()
+    assert cycles == 8 + 4 + 4 + 16
+    assert cpu.registers.A == 0x12
+    assert cpu.registers.B == 0x13
+    assert cpu.registers.PC == 0xC100
+
+
+def test_conditional_jump_not_taken(cpu):
+    # XOR A; JR NZ,+5
+    load(cpu, 0xC000, [0xAF, 0x20, 0x05])
+    cpu.step()
+    assert cpu.registers.z_flag
+    assert cpu.registers.PC == 0xC003
+
+
+def test_call_pushes_next_pc(cpu):
+    # CALL 0xC100
+    load(cpu, 0xC000, [0xCD, 0x00, 0xC1])
+    cpu.step()
+    assert cpu.registers.PC == 0xC100
+    assert cpu.registers.SP == 0xFFFC
+    assert cpu.mmu.read_byte(0xFFFC) == 0x03
+    assert cpu.mmu.read_byte(0xFFFD) == 0xC0
+
+
+def test_write_to_ram_code_invalidates_block(cpu):
+    # LD A,0x12; JP 0xC000
+    load(cpu, 0xC000, [0x3E, 0x12, 0xC3, 0x00, 0xC0])
+    cpu.step()
+    assert cpu.registers.A == 0x12
+    assert cpu.mmu.code_marks[0xC001]
+
+    # patch the immediate, the cached block must not be used anymore
+    cpu.mmu.write_byte(0xC001, 0x34)
+    assert not cpu.mmu.code_marks[0xC001]
+    cpu.step()
+    assert cpu.registers.A == 0x34
+
+
+def test_block_patching_its_own_code(cpu):
+    # LD A,0x99; LD (0xC006),A; LD B,0x11; JP 0xC100
+    # the write patches the immediate of LD B, which must load 0x99
+    load(cpu, 0xC000, [0x3E, 0x99, 0xEA, 0x06, 0xC0, 0x06, 0x11, 0xC3, 0x00, 0xC1])
+    cycles = cpu.step()
+    assert cycles == 8 + 16
+    assert cpu.registers.PC == 0xC005
+    while cpu.registers.PC != 0xC100:
+        cpu.step()
+    assert cpu.registers.B == 0x99
+
+
+def test_hram_code_is_translated(cpu):
+    # LD A,0x28; DEC A; JR NZ,-3 (the usual DMA wait loop)
+    load(cpu, 0xFF80, [0x3E, 0x28, 0x3D, 0x20, 0xFD])
+    while cpu.registers.A != 0 or cpu.registers.PC != 0xFF85:
+        cpu.step()
+    assert cpu.registers.A == 0
+
+
+def machine_state(gameboy):
+    r = gameboy.cpu.registers
+    return (gameboy.cycles, r.PC, r.SP, r.A, r.F, r.B, r.C, r.D, r.E, r.H, r.L,
+            bytes(gameboy.mmu.wram), bytes(gameboy.mmu.hram), gameboy.serial.text())
+
+
+@pytest.mark.parametrize("rom", ["02-interrupts", "06-ld r,r"])
+def test_translated_runs_like_interpreter(rom):
+    path = f"./tests/cpu_test_roms/individual/{rom}.gb"
+    states = []
+    for translate in (True, False):
+        gameboy = GameBoy(MBC0(path), translate=translate)
+        gameboy.run_frames(30)
+        states.append(machine_state(gameboy))
+    assert states[0] == states[1]
+
+
+def test_block_stops_at_run_until_target():
+    gameboy = GameBoy(MBC0(None))
+    # 40 NOPs in a row, one block
+    load(gameboy.cpu, 0xC000, [0x00] * 40 + [0x18, 0xFE])
+    gameboy.cpu.ime = False
+    gameboy.run_until(100)
+    # no more than one instruction past it, like the interpreter
+    assert 100 <= gameboy.cycles < 100 + max(cycle_arr_1)
+    assert gameboy.cpu.registers.PC == 0xC000 + gameboy.cycles // 4
+
+
+def test_io_read_in_block_sees_current_cycle():
+    gameboy = GameBoy(MBC0(None))
+    gameboy.cpu.ime = False
+    gameboy.mmu.ie_reg = 0
+    # TAC=05 (every 16 cycles), 16 NOPs, LD A,(FF05); LD (C100),A; JR -2
+    code = [0x3E, 0x05, 0xE0, 0x07] + [0x00] * 16 + [0xF0, 0x05, 0xEA, 0x00, 0xC1, 0x18, 0xFE]
+    load(gameboy.cpu, 0xC000, code)
+    gameboy.run_until(200)
+    # 16 NOPs + 12 cycles of the write later
+    assert gameboy.mmu.read_byte(0xC100) in (4, 5)
@@ -3,7 +3,11 @@ Tests for various methods and attributes in cpu.py
 """
 
 import pytest
-from gb.cpu.registers import Registers, InvalidFlagValue
+from gb.cpu.registers import Registers, LazyRegisters, FastRegisters, InvalidFlagValue
+from gb.mbc.mbc0 import MBC0
+from gb.mmu import MMU
+from gb.cpu.cpu import CPU
+from gb.util.execution_modes import EXECUTION_MODES
 
 
 @pytest.fixture
@@ -139,4 +143,83 @@ def test_flag_get(registers):
     assert registers.z_flag == 1
     assert registers.n_flag == 0
     assert registers.h_flag == 1
-    assert registers.c_flag == 0
\ No newline at end of file
+    assert registers.c_flag == 0
+
+
+@pytest.mark.parametrize("carry", [0, 1])
+def test_lazy_alu_flags(carry):
+    """LazyRegisters computes the same F as Registers when it is read"""
+    eager, lazy = Registers(), LazyRegisters()
+    for a in range(0, 256, 7):
+        for b in range(0, 256, 5):
+            for set_flags, res in (("set_add_flags", a + b + carry), ("set_sub_flags", a - b - carry)):
+                getattr(eager, set_flags)(a, b, res)
+                getattr(lazy, set_flags)(a, b, res)
+                assert lazy.F == eager.F
+                assert lazy.z_flag == eager.z_flag
+                assert lazy.c_flag == eager.c_flag
+
+
+def test_lazy_inc_dec_keep_carry():
+    lazy = LazyRegisters()
+    # carry from a pending ADD survives INC and DEC
+    lazy.set_add_flags(0xFF, 0x01, 0x100)
+    lazy.set_inc_flags(0x10)
+    assert lazy.F == 0x30
+    lazy.set_dec_flags(0x00)
+    assert lazy.F == 0xD0
+    lazy.F = 0x00
+    lazy.set_dec_flags(0x0F)
+    assert lazy.F == 0x60
+
+
+@pytest.mark.parametrize("registers_cls", [Registers, LazyRegisters])
+def test_flag_properties(registers_cls):
+    # lazy and eager flags behave the same
+    registers = registers_cls()
+    registers.AF = 0x12FF
+    # the lower nibble of F does not exist
+    assert registers.F == 0xF0
+    registers.z_flag = 0
+    registers.c_flag = 0
+    assert registers.F == 0x60
+    assert (registers.n_flag, registers.h_flag) == (1, 1)
+    registers.AF = 0x12A0
+    assert (registers.A, registers.F) == (0x12, 0xA0)
+
+
+def test_lazy_f_has_no_lower_nibble():
+    lazy = LazyRegisters()
+    lazy.F = 0xFF
+    assert lazy.F == 0xF0
+
+
+@pytest.mark.parametrize("reg_xy", ["BC", "DE", "HL"])
+def test_fast_register_pairs(reg_xy):
+    registers = FastRegisters()
+    setattr(registers, reg_xy, 0x1234)
+    assert getattr(registers, reg_xy[0]) == 0x12
+    assert getattr(registers, reg_xy[1]) == 0x34
+    assert getattr(registers, reg_xy) == 0x1234
+
+
+def test_strict_mode_checks():
+    cpu = CPU(MMU(MBC0(None), mode=EXECUTION_MODES.STRICT))
+    with pytest.raises(ValueError):
+        cpu.write_d8(0xC000, 0x100)
+    with pytest.raises(ValueError):
+        cpu.mmu.write_byte(0x10000, 0)
+    with pytest.raises(ValueError):
+        cpu.registers.HL = 0x10000
+
+
+def test_fast_mode_binds_unchecked_methods():
+    cpu = CPU(MMU(MBC0(None), mode=EXECUTION_MODES.FAST))
+    assert isinstance(cpu.registers, FastRegisters)
+    assert "read_byte" not in vars(cpu.mmu)
+    cpu.registers.PC = 0xC000
+    cpu.write_d8(0xC000, 0x34)
+    cpu.write_d8(0xC001, 0x12)
+    assert cpu.read_d16() == 0x1234
+    assert cpu.registers.PC == 0xC002
+
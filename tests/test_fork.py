@@ -0,0 +1,45 @@
+"""
+Tests for GameBoy.fork() in gb/fork.py
+"""
+
+import pytest
+from gb.mbc.mbc0 import MBC0
+from gb.gameboy import GameBoy
+from gb.util.joypad_buttons import JOYPAD_BUTTONS
+
+ROM = "./tests/cpu_test_roms/individual/06-ld r,r.gb"
+
+
+def press_and_run(gameboy, button):
+    gameboy.input_handler.handle_input([(button, True)], gameboy.cycles)
+    gameboy.mmu.write_byte(0xC000, button.value[1])
+    gameboy.run_frames(2)
+    return gameboy.cycles, gameboy.mmu.button_states, gameboy.mmu.read_byte(0xC000)
+
+
+def test_fork_branches():
+    gameboy = GameBoy(MBC0(ROM))
+    gameboy.run_frames(2)
+    cycles = gameboy.cycles
+    buttons = [JOYPAD_BUTTONS.A, JOYPAD_BUTTONS.B, JOYPAD_BUTTONS.UP]
+
+    results = gameboy.fork(press_and_run, buttons)
+    assert [value for _, _, value in results] == [0, 1, 2]
+    assert results[0][1] == (0x0F, 0x0E)
+    assert results[2][1] == (0x0B, 0x0F)
+    # every branch ran from the same state
+    assert len({branch_cycles for branch_cycles, _, _ in results}) == 1
+
+    # the parent didn't move
+    assert gameboy.cycles == cycles
+    assert gameboy.mmu.button_states == (0x0F, 0x0F)
+
+
+def fail(gameboy, arg):
+    raise KeyError(arg)
+
+
+def test_fork_raises_branch_errors():
+    gameboy = GameBoy(MBC0(None))
+    with pytest.raises(KeyError):
+        gameboy.fork(fail, ["x"])
@@ -0,0 +1,75 @@
+"""
+Tests for the joypad input queue in gb/inputs.py
+"""
+
+from gb.mbc.mbc0 import MBC0
+from gb.gameboy import GameBoy
+from gb.inputs import QUIT
+from gb.ppu import FRAME_CYCLES
+from gb.util.joypad_buttons import JOYPAD_BUTTONS
+
+
+class FakeRenderer():
+    def __init__(self, inputs):
+        # list of event lists, one per poll
+        self.inputs = inputs
+        self.polls = 0
+
+    def render_frame(self, framebuffer, changed=True):
+        pass
+
+    def get_input(self):
+        self.polls += 1
+        return self.inputs.pop(0) if self.inputs else []
+
+
+def make_gameboy(renderer=None):
+    gameboy = GameBoy(MBC0(None), renderer=renderer)
+    # JR -2
+    gameboy.mmu.write_byte(0xC000, 0x18)
+    gameboy.mmu.write_byte(0xC001, 0xFE)
+    gameboy.cpu.registers.PC = 0xC000
+    return gameboy
+
+
+def test_press_and_release_update_button_states():
+    gameboy = make_gameboy()
+    handler, mmu = gameboy.input_handler, gameboy.mmu
+    handler.handle_input([(JOYPAD_BUTTONS.START, True), (JOYPAD_BUTTONS.LEFT, True)])
+    assert mmu.button_states == (0x0D, 0x07)
+    assert mmu.if_reg & 0x10
+    assert handler.is_pressed(JOYPAD_BUTTONS.START)
+
+    mmu.if_reg = 0
+    handler.handle_input([(JOYPAD_BUTTONS.START, False)])
+    assert mmu.button_states == (0x0D, 0x0F)
+    # releasing doesn't request the interrupt
+    assert not mmu.if_reg & 0x10
+
+    # P15 selects the action buttons
+    mmu.write_byte(0xFF00, 0x10)
+    assert mmu.read_byte(0xFF00) & 0x0F == 0x0F
+    mmu.write_byte(0xFF00, 0x20)
+    assert mmu.read_byte(0xFF00) & 0x0F == 0x0D
+
+
+def test_renderer_polled_once_per_frame():
+    renderer = FakeRenderer([[], [(JOYPAD_BUTTONS.A, True)], [QUIT]])
+    gameboy = make_gameboy(renderer)
+    gameboy.run_until(3 * FRAME_CYCLES)
+    assert renderer.polls == 3
+    assert gameboy.input_handler.is_pressed(JOYPAD_BUTTONS.A)
+    assert gameboy.input_handler.quit_requested
+    gameboy.run()
+
+
+def test_queued_events_apply_at_their_cycle():
+    gameboy = make_gameboy()
+    handler = gameboy.input_handler
+    handler.queue_event(1000, JOYPAD_BUTTONS.B, True)
+    handler.queue_event(500, JOYPAD_BUTTONS.UP, True)
+    gameboy.run_until(600)
+    assert handler.is_pressed(JOYPAD_BUTTONS.UP)
+    assert not handler.is_pressed(JOYPAD_BUTTONS.B)
+    gameboy.run_until(1100)
+    assert handler.is_pressed(JOYPAD_BUTTONS.B)
@@ -0,0 +1,58 @@
+"""
+Tests for interrupt dispatch in gb/interupts.py
+"""
+
+import pytest
+from gb.mbc.mbc0 import MBC0
+from gb.mmu import MMU
+from gb.cpu.cpu import CPU
+from gb.interupts import INTERRUPT_TABLE
+
+
+@pytest.fixture
+def cpu():
+    cpu = CPU(MMU(MBC0(None)))
+    cpu.no_boot_rom_setup()
+    return cpu
+
+
+def test_table_priority():
+    assert INTERRUPT_TABLE[0b00001] == (0x40, 0xFE)
+    assert INTERRUPT_TABLE[0b10100] == (0x50, 0xFB)
+    assert INTERRUPT_TABLE[0b10000] == (0x60, 0xEF)
+
+
+def test_pending_follows_ie_if_ime(cpu):
+    mmu = cpu.mmu
+    mmu.write_byte(0xFF0F, 0x05)
+    assert cpu.pending == 0
+    cpu.ime = True
+    assert cpu.pending == 0
+    mmu.write_byte(0xFFFF, 0x04)
+    assert cpu.pending == 0x04
+    cpu.ime = False
+    assert cpu.pending == 0
+
+
+def test_interrupt_serviced(cpu):
+    mmu = cpu.mmu
+    mmu.ie_reg = 0x1F
+    mmu.if_reg = 0x14
+    cpu.ime = True
+    assert cpu.step() == 20
+    assert cpu.registers.PC == 0x50
+    assert mmu.read_byte(0xFFFD) == 0x01 and mmu.read_byte(0xFFFC) == 0x00
+    assert mmu.if_reg == 0x10
+    assert not cpu.ime and cpu.pending == 0
+
+
+def test_halt_wakes_without_ime(cpu):
+    mmu = cpu.mmu
+    mmu.ie_reg = 0x01
+    cpu.halted = True
+    assert cpu.step() == 4
+    mmu.if_reg = 0x01
+    cpu.step()
+    assert not cpu.halted
+    # not serviced
+    assert mmu.if_reg == 0x01 and cpu.registers.PC != 0x40
@@ -0,0 +1,148 @@
+"""
+Tests for the page table in mmu.py
+"""
+
+import pytest
+from gb.mbc.mbc0 import MBC0
+from gb.mmu import MMU
+from gb.cpu.cpu import CPU
+from gb.util.ppu_modes import PPU_MODES
+
+
+@pytest.fixture
+def mmu():
+    mmu = MMU(MBC0(None))
+    mmu.boot_rom_enabled = False
+    return mmu
+
+
+@pytest.mark.parametrize("address", [0xC000, 0xDFFF, 0x8000, 0x9FFF, 0xFF80, 0xFFFE])
+def test_ram_read_write(mmu, address):
+    mmu.write_byte(address, 0x5A)
+    assert mmu.read_byte(address) == 0x5A
+
+
+def test_echo_ram_mirrors_wram(mmu):
+    mmu.write_byte(0xC123, 0x42)
+    assert mmu.read_byte(0xE123) == 0x42
+
+
+def test_rom_reads_from_mbc(mmu):
+    mmu.mbc._rom_data[0x4321] = 0x99
+    assert mmu.read_byte(0x4321) == 0x99
+
+
+def test_vram_locked_during_pixel_transfer(mmu):
+    mmu.write_byte(0x8000, 0x11)
+    mmu.ppu_mode = PPU_MODES.PIXEL_TRANSFER
+    assert mmu.read_byte(0x8000) == 0xFF
+    assert mmu.read_byte(0x8000, ppu_read=True) == 0x11
+    mmu.write_byte(0x8000, 0x22, ppu_write=False)
+    mmu.ppu_mode = PPU_MODES.H_BLANK
+    assert mmu.read_byte(0x8000) == 0x11
+
+
+def test_oam_locked_during_oam_scan(mmu):
+    mmu.ppu_mode = PPU_MODES.H_BLANK
+    mmu.write_byte(0xFE00, 0x33)
+    mmu.ppu_mode = PPU_MODES.OAM_SCAN
+    assert mmu.read_byte(0xFE00) == 0xFF
+    assert mmu.read_byte(0xFE00, ppu_read=True) == 0x33
+    assert mmu.read_byte(0xFEA0) == 0xFF
+
+
+def test_dma_only_allows_hram(mmu):
+    mmu.write_byte(0xC000, 0x12)
+    mmu.write_byte(0xFF80, 0x34)
+    mmu.dma_transfer_enabled = True
+    assert mmu.read_byte(0xC000) == 0xFF
+    assert mmu.read_byte(0xC000, transfer_read=True) == 0x12
+    assert mmu.read_byte(0xFF80) == 0x34
+
+
+def test_boot_rom_overlay(mmu):
+    mmu.boot_rom = bytes([0xAB] * 0x100)
+    mmu.mbc._rom_data[0x10] = 0xCD
+    mmu.boot_rom_enabled = True
+    assert mmu.read_byte(0x10) == 0xAB
+    mmu.write_byte(0xFF50, 0x01)
+    assert mmu.read_byte(0x10) == 0xCD
+
+
+def test_io_handlers_registered_by_components(mmu):
+    mmu.timer.DIV = 0x40
+    assert mmu.read_byte(0xFF04) == 0x40
+    mmu.write_byte(0xFF04, 0x12)
+    assert mmu.timer.DIV == 0
+
+    mmu.joyp_select = 0x20
+    mmu.button_states = (0x0E, 0x0F)
+    assert mmu.read_byte(0xFF00) == 0xEE
+
+
+def test_register_io(mmu):
+    writes = []
+    mmu.register_io(0xFF01, read=lambda address: 0x77,
+                    write=lambda address, value, ppu_write: writes.append(value))
+    mmu.write_byte(0xFF01, 0x41)
+    assert writes == [0x41]
+    assert mmu.read_byte(0xFF01) == 0x77
+    # plain registers are stored in io_regs
+    mmu.write_byte(0xFF42, 0x10)
+    assert mmu.io_regs[0x42] == 0x10
+
+
+def test_no_boot_rom_setup_unmaps_boot_rom():
+    mmu = MMU(MBC0(None))
+    mmu.boot_rom = bytes([0xAB] * 0x100)
+    mmu.boot_rom_enabled = True
+    mmu.mbc._rom_data[0x38] = 0xFF
+    assert mmu.read_byte(0x38) == 0xAB
+    CPU(mmu).no_boot_rom_setup()
+    assert mmu.read_byte(0x38) == 0xFF
+    assert mmu.read_byte(0xFF50) == 0x01
+
+
+@pytest.mark.parametrize("source", [0x0000, 0x8000, 0xC000])
+def test_dma_copies_oam_and_locks_bus(mmu, source):
+    data = bytes(range(0x20, 0x20 + 0xA0))
+    mmu.mbc._rom_data[0:0xA0] = data
+    mmu.vram[0:0xA0] = data
+    mmu.wram[0:0xA0] = data
+    mmu.ppu_mode = PPU_MODES.PIXEL_TRANSFER
+    mmu.write_byte(0xFF46, source >> 8)
+    assert bytes(mmu.oam) == data
+    assert mmu.read_byte(0xC000) == 0xFF
+
+    scheduler = mmu.scheduler
+    scheduler.cycles = 639
+    scheduler.run_due()
+    assert mmu.dma_transfer_enabled
+    scheduler.cycles = 640
+    scheduler.run_due()
+    assert not mmu.dma_transfer_enabled
+    assert mmu.read_byte(0xFF46) == source >> 8
+
+
+@pytest.mark.parametrize("translate", [False, True])
+def test_dma_ends_in_step_loop(translate):
+    # the loop that steps the components by hand instead of GameBoy.run_until()
+    mmu = MMU(MBC0(None))
+    cpu = CPU(mmu, translate=translate)
+    cpu.no_boot_rom_setup()
+    # in HRAM: LD A,0xC0; LDH (0x46),A; LD A,40; DEC A; JR NZ,-3; JR -2
+    code = [0x3E, 0xC0, 0xE0, 0x46, 0x3E, 0x28, 0x3D, 0x20, 0xFD, 0x18, 0xFE]
+    for i, byte in enumerate(code):
+        mmu.write_byte(0xFF80 + i, byte)
+    mmu.write_byte(0xC000, 0x12)
+    cpu.registers.PC = 0xFF80
+
+    while cpu.registers.PC != 0xFF86:
+        mmu.timer.step(cpu.step())
+    assert mmu.dma_transfer_enabled
+    # the wait loop takes 640 cycles
+    while cpu.registers.PC != 0xFF89:
+        mmu.timer.step(cpu.step())
+    assert not mmu.dma_transfer_enabled
+    # the bus is unlocked again
+    assert mmu.read_byte(0xC000) == 0x12
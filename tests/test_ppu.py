@@ -0,0 +1,239 @@
+"""
+Tests for the scanline renderer in gb/ppu/scanline.py
+"""
+
+import random
+import pytest
+from gb.mbc.mbc0 import MBC0
+from gb.mmu import MMU
+from gb.ppu import PPU
+
+# a tile whose rows are colors 0, 1, 2, 3, 3, 2, 1, 0 from left to right
+TILE = bytes([0b01011010, 0b00111100] * 8)
+ROW = [0, 1, 2, 3, 3, 2, 1, 0]
+
+
+@pytest.fixture(params=[True, False], ids=["tile_cache", "no_tile_cache"])
+def ppu(request):
+    mmu = MMU(MBC0(None))
+    ppu = PPU(mmu, tile_cache=request.param)
+    # LCD on, BG on, 0x8000 tile data, identity palette
+    mmu.io_regs[0x40] = 0x91
+    mmu.io_regs[0x47] = 0xE4
+    mmu.io_regs[0x48] = 0xE4
+    mmu.vram[0x10:0x20] = TILE
+    return ppu
+
+
+def render(ppu, ly):
+    ppu.scanline_renderer.render(ly, ppu.framebuffer[ly])
+    return list(ppu.framebuffer[ly])
+
+
+def test_background_tile(ppu):
+    # tile 1 at the top left of the 0x9800 map
+    ppu.mmu.vram[0x1800] = 1
+    assert render(ppu, 0)[:16] == ROW + [0] * 8
+
+
+def test_scroll_and_palette(ppu):
+    ppu.mmu.vram[0x1800:0x1820] = bytes([1] * 32)
+    ppu.mmu.io_regs[0x43] = 3  # SCX
+    ppu.mmu.io_regs[0x47] = 0x1B  # inverted palette
+    assert render(ppu, 0)[:5] == [3 - c for c in (ROW * 2)[3:8]]
+
+
+def test_signed_tile_data(ppu):
+    ppu.mmu.io_regs[0x40] = 0x81
+    # tile 0xFF is at 0x8FF0 with 0x8800 addressing
+    ppu.mmu.vram[0x0FF0:0x1000] = TILE
+    ppu.mmu.vram[0x1800] = 0xFF
+    assert render(ppu, 0)[:8] == ROW
+
+
+def test_window(ppu):
+    ppu.mmu.io_regs[0x40] = 0x91 | 0x20 | 0x40  # window on, 0x9C00 map
+    ppu.mmu.vram[0x1C00] = 1
+    ppu.mmu.io_regs[0x4A] = 0  # WY
+    ppu.mmu.io_regs[0x4B] = 7 + 100  # WX
+    line = render(ppu, 0)
+    assert line[100:108] == ROW
+    assert line[:100] == [0] * 100
+
+
+def test_sprites(ppu):
+    mmu = ppu.mmu
+    mmu.io_regs[0x40] = 0x93
+    # sprite at screen (x=8, y=0), x flipped; a second one behind the BG
+    mmu.oam[0:4] = bytes([16, 16, 1, 0x20])
+    mmu.oam[4:8] = bytes([16, 32, 1, 0x80])
+    mmu.vram[0x1802] = 1  # BG tile under the second sprite
+    line = render(ppu, 0)
+    assert line[8:16] == ROW[::-1]
+    # BG colors 1-3 hide the sprite, color 0 shows it
+    assert line[16:24] == ROW
+
+
+def test_frame_delivered_to_renderer():
+    frames = []
+    class Renderer():
+        def render_frame(self, framebuffer, changed=True):
+            frames.append(framebuffer.copy())
+    mmu = MMU(MBC0(None))
+    ppu = PPU(mmu, renderer=Renderer())
+    mmu.io_regs[0x47] = 0xE4
+    mmu.vram[0x10:0x20] = TILE
+    mmu.vram[0x1800:0x1C00] = bytes([1] * 0x400)
+    ppu.step(144 * 456)
+    assert len(frames) == 1
+    assert frames[0].shape == (144, 160)
+    assert list(frames[0][143][:8]) == ROW
+
+
+def test_sprite_priority(ppu):
+    mmu = ppu.mmu
+    mmu.io_regs[0x40] = 0x93
+    mmu.vram[0x20:0x30] = bytes([0xFF, 0x00] * 8)  # tile 2: all color 1
+    mmu.io_regs[0x48] = 0b11100100
+    mmu.io_regs[0x49] = 0b00011011
+    # sprite 0 at x=4 with OBP1, sprite 1 at x=0: smaller x wins
+    mmu.oam[0:4] = bytes([16, 12, 2, 0x10])
+    mmu.oam[4:8] = bytes([16, 8, 1, 0x00])
+    line = render(ppu, 0)
+    assert line[0:7] == ROW[:7]
+    # where sprite 1 is transparent, sprite 0 shows with OBP1 (color 1 -> 2)
+    assert line[7:12] == [2, 2, 2, 2, 2]
+
+
+def test_tile_cache_tracks_vram_writes():
+    mmu = MMU(MBC0(None))
+    ppu = PPU(mmu)
+    mmu.io_regs[0x47] = 0xE4
+    mmu.vram[0x1800] = 1
+    assert render(ppu, 0)[:8] == [0] * 8
+
+    # written through the MMU, only tile 1 is decoded again
+    for i, byte in enumerate(TILE):
+        mmu.write_byte(0x8010 + i, byte)
+    cache = ppu.scanline_renderer.tile_cache
+    assert list(cache.dirty.nonzero()[0]) == [1]
+    assert render(ppu, 0)[:8] == ROW
+    assert not cache.dirty.any()
+
+
+def random_ppu(seed, whole_frame, lcdc=0xF3):
+    rng = random.Random(seed)
+    mmu = MMU(MBC0(None))
+    ppu = PPU(mmu, whole_frame=whole_frame)
+    mmu.vram[:] = rng.randbytes(len(mmu.vram))
+    mmu.oam[:] = rng.randbytes(len(mmu.oam))
+    mmu.io_regs[0x40] = lcdc
+    mmu.io_regs[0x4A] = 40
+    mmu.io_regs[0x4B] = 50
+    return ppu
+
+
+@pytest.mark.parametrize("lcdc", [0xF3, 0xE7, 0x81])
+def test_whole_frame_matches_scanlines(lcdc):
+    frames = []
+    for whole_frame in (False, True):
+        ppu = random_ppu(1, whole_frame, lcdc)
+        ppu.step(144 * 456)
+        frames.append(ppu.framebuffer.copy())
+    assert (frames[0] == frames[1]).all()
+
+
+def test_whole_frame_mid_frame_changes():
+    frames = []
+    for whole_frame in (False, True):
+        ppu = random_ppu(2, whole_frame)
+        mmu = ppu.mmu
+        ppu.step(30 * 456)
+        mmu.write_byte(0xFF43, 17)  # SCX
+        ppu.step(456)
+        mmu.write_byte(0x9800, 5)
+        mmu.write_byte(0xFE10, 60)
+        ppu.step(456)
+        mmu.write_byte(0xFF47, 0x1B)  # BGP
+        ppu.step(112 * 456)
+        frames.append(ppu.framebuffer.copy())
+    assert (frames[0] == frames[1]).all()
+    # nothing left pending after V-Blank
+    assert ppu.pending_start is None
+
+
+def test_frameskip_keeps_timing():
+    frames = []
+    class Renderer():
+        def render_frame(self, framebuffer, changed=True):
+            frames.append(framebuffer.copy())
+    mmu = MMU(MBC0(None))
+    ppu = PPU(mmu, renderer=Renderer(), frameskip=2)
+    mmu.io_regs[0x47] = 0xE4
+    mmu.vram[0x10:0x20] = TILE
+    mmu.vram[0x1800:0x1C00] = bytes([1] * 0x400)
+
+    vblanks = 0
+    for _ in range(6 * 154):
+        ppu.step(456)
+        if mmu.if_reg & 0x01:
+            vblanks += 1
+            mmu.if_reg &= ~0x01
+    # V-Blank every frame, pixels every third frame
+    assert vblanks == 6 and ppu.frame_count == 6
+    assert len(frames) == 2
+    assert list(frames[1][143][:8]) == ROW
+
+
+def test_identical_frames_not_rendered_again():
+    changes = []
+    class Renderer():
+        def render_frame(self, framebuffer, changed=True):
+            changes.append(changed)
+    mmu = MMU(MBC0(None))
+    ppu = PPU(mmu, renderer=Renderer())
+    mmu.io_regs[0x47] = 0xE4
+    mmu.vram[0x10:0x20] = TILE
+    frame = 154 * 456
+
+    ppu.step(2 * frame)
+    assert changes == [True, False]
+    # same value again is not a change
+    mmu.write_byte(0xFF47, mmu.io_regs[0x47])
+    ppu.step(frame)
+    mmu.write_byte(0x9800, 1)
+    ppu.step(frame)
+    assert changes == [True, False, False, True]
+    assert list(ppu.framebuffer[0][:8]) == ROW
+
+    # changed during the frame: drawn, and the next frame is drawn again
+    ppu.step(10 * 456)
+    mmu.write_byte(0xFF43, 4)
+    ppu.step(frame)
+    ppu.step(frame)
+    ppu.step(frame)
+    assert changes[4:] == [True, True, False]
+
+
+def test_display_watch_only_until_first_change():
+    changes = []
+    class Renderer():
+        def render_frame(self, framebuffer, changed=True):
+            changes.append(changed)
+    mmu = MMU(MBC0(None))
+    ppu = PPU(mmu, renderer=Renderer())
+    frame = 154 * 456
+    ppu.step(2 * frame - 5 * 456)
+    assert changes == [True, False]
+    assert mmu.write_buffers[0x98] is None
+
+    # V-Blank: the first write changes the generation, the rest of VRAM is
+    # written directly again
+    mmu.write_byte(0x9800, 1)
+    assert mmu.write_buffers[0x98] is mmu.vram
+    mmu.write_byte(0x9801, 1)
+    ppu.step(frame)
+    ppu.step(frame)
+    assert changes == [True, False, True, False]
+    # watched again from the start of every frame
+    assert mmu.write_buffers[0x98] is None
@@ -0,0 +1,62 @@
+"""
+Tests for the rewind buffer in gb/rewind.py
+"""
+
+from gb.mbc.mbc0 import MBC0
+from gb.gameboy import GameBoy
+from gb.rewind import Rewind
+
+ROM = "./tests/cpu_test_roms/individual/06-ld r,r.gb"
+
+
+def test_rewind_restores_recorded_state():
+    gameboy = GameBoy(MBC0(ROM))
+    buffer = Rewind(gameboy, keyframe_interval=4)
+    states = {}
+    for _ in range(10):
+        gameboy.run_frames(1)
+        buffer.record()
+        states[gameboy.ppu.frame_count] = gameboy.save_state()
+    assert len(buffer) == 10 and len(buffer.groups) == 3
+
+    # a delta, then a keyframe
+    assert buffer.rewind_to(6) == 6
+    assert gameboy.save_state() == states[6]
+    assert len(buffer) == 6
+    assert buffer.rewind_to(5) == 5
+    assert gameboy.save_state() == states[5]
+
+    # keeps recording from there
+    gameboy.run_frames(1)
+    buffer.record()
+    assert len(buffer) == 6 and buffer.groups[-1].frames == [5, 6]
+
+
+def test_gameboy_rewind_and_memory_cap():
+    gameboy = GameBoy(MBC0(ROM))
+    gameboy.enable_rewind(interval=1, keyframe_interval=5, max_bytes=20000)
+    gameboy.run_frames(40)
+    buffer = gameboy.rewind_buffer
+    assert 5 < len(buffer) < 40
+    assert buffer.size == sum(group.size for group in buffer.groups)
+    assert buffer.size <= 20000 or len(buffer.groups) == 1
+    assert buffer.oldest_frame > 0
+
+    # can't go back further than the oldest state
+    oldest = buffer.oldest_frame
+    assert gameboy.rewind(1000) == 40 - oldest
+    assert gameboy.ppu.frame_count == oldest and len(buffer) == 1
+
+
+def test_records_at_vblank():
+    gameboy = GameBoy(MBC0(ROM))
+    gameboy.enable_rewind(interval=2)
+    ppu, record = gameboy.ppu, gameboy.rewind_buffer.record
+    recorded = []
+    def checked_record():
+        # the frame is rendered, save_state() has no lines to flush
+        recorded.append((ppu.frame_count, ppu.ly, ppu.pending_start))
+        record()
+    gameboy.rewind_buffer.record = checked_record
+    gameboy.run_frames(6)
+    assert recorded == [(2, 144, None), (4, 144, None), (6, 144, None)]
@@ -0,0 +1,50 @@
+"""
+Tests for save states in gb/savestate.py
+"""
+
+import pytest
+from gb.mbc.mbc0 import MBC0
+from gb.gameboy import GameBoy
+from gb.savestate import HEADER, MAGIC
+
+ROM = "./tests/cpu_test_roms/individual/06-ld r,r.gb"
+
+
+def machine_state(gameboy):
+    r = gameboy.cpu.registers
+    mmu = gameboy.mmu
+    return ((r.A, r.B, r.C, r.D, r.E, r.F, r.H, r.L, r.SP, r.PC),
+            gameboy.cycles, bytes(mmu.wram), bytes(mmu.vram), bytes(mmu.io_regs),
+            bytes(mmu.hram), mmu.if_reg, gameboy.timer.DIV, gameboy.ppu.frame_count,
+            bytes(gameboy.ppu.framebuffer))
+
+
+@pytest.mark.parametrize("translate", [True, False])
+def test_load_state_resumes_identically(translate):
+    gameboy = GameBoy(MBC0(ROM), translate=translate)
+    gameboy.mmu.write_byte(0xFF07, 0x05)
+    gameboy.run_until(70_000 * 3 + 1234)
+    state = gameboy.save_state()
+    gameboy.run_frames(3)
+    expected = machine_state(gameboy)
+
+    other = GameBoy(MBC0(ROM), translate=translate)
+    other.run_until(5000)
+    other.load_state(state)
+    other.run_frames(3)
+    assert machine_state(other) == expected
+
+    # and back again on the same machine
+    gameboy.load_state(state)
+    gameboy.run_frames(3)
+    assert machine_state(gameboy) == expected
+
+
+def test_rejects_other_versions():
+    gameboy = GameBoy(MBC0(None))
+    state = bytearray(gameboy.save_state())
+    HEADER.pack_into(state, 0, MAGIC, 999)
+    with pytest.raises(ValueError):
+        gameboy.load_state(state)
+    with pytest.raises(ValueError):
+        gameboy.load_state(b"nope" + bytes(state[4:]))
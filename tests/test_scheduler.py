@@ -0,0 +1,141 @@
+"""
+Tests for the event scheduler in gb/scheduler.py and the scheduled
+main loop in gb/gameboy.py
+"""
+
+from gb.scheduler import Scheduler, NEVER
+from gb.mbc.mbc0 import MBC0
+from gb.gameboy import GameBoy
+from gb.ppu import FRAME_CYCLES
+from gb.util.ppu_modes import PPU_MODES
+
+
+def test_events_run_in_time_order():
+    scheduler = Scheduler()
+    ran = []
+    scheduler.schedule(30, lambda time: ran.append(("b", time)))
+    scheduler.schedule(10, lambda time: ran.append(("a", time)))
+    scheduler.schedule(30, lambda time: ran.append(("c", time)))
+    assert scheduler.next_event == 10
+
+    scheduler.cycles = 12
+    scheduler.run_due()
+    assert ran == [("a", 10)]
+    assert scheduler.next_event == 30
+
+    scheduler.cycles = 40
+    scheduler.run_due()
+    assert ran == [("a", 10), ("b", 30), ("c", 30)]
+    assert scheduler.next_event == NEVER
+
+
+def test_cancel():
+    scheduler = Scheduler()
+    ran = []
+    event = scheduler.schedule(10, lambda time: ran.append(time))
+    scheduler.cancel(event)
+    scheduler.cycles = 20
+    scheduler.run_due()
+    assert ran == []
+
+
+def test_periodic_event_does_not_drift():
+    scheduler = Scheduler()
+    ran = []
+
+    def tick(time):
+        ran.append(time)
+        scheduler.schedule_at(time + 100, tick)
+
+    scheduler.schedule(100, tick)
+    # the main loop usually overshoots events by a few cycles
+    for cycles in (104, 207, 301, 410):
+        scheduler.cycles = cycles
+        scheduler.run_due()
+    assert ran == [100, 200, 300, 400]
+
+
+def test_gameboy_runs_frames():
+    gameboy = GameBoy(MBC0(None))
+    gameboy.cpu.ime = False
+    gameboy.run_frames(2)
+    assert gameboy.ppu.frame_count == 2
+    # stopped right at the start of V-Blank
+    assert gameboy.ppu.mode == PPU_MODES.V_BLANK
+    assert gameboy.ppu.ly == 144
+    assert gameboy.mmu.if_reg & 0x01
+    assert FRAME_CYCLES + 144 * 456 <= gameboy.cycles < 2 * FRAME_CYCLES
+
+
+def test_halt_fast_forwards_to_next_event():
+    gameboy = GameBoy(MBC0(None), translate=False)
+    cpu, mmu = gameboy.cpu, gameboy.mmu
+    # HALT; JR -3 (halt again after every interrupt)
+    for i, byte in enumerate([0x76, 0x18, 0xFD]):
+        mmu.write_byte(0xC000 + i, byte)
+    cpu.registers.PC = 0xC000
+    cpu.ime = False
+    mmu.ie_reg = 0x01
+
+    steps = 0
+    step = cpu.step
+    def counting_step():
+        nonlocal steps
+        steps += 1
+        return step()
+    cpu.step = counting_step
+
+    gameboy.run_frames(1)
+    assert gameboy.ppu.frame_count == 1
+    # a few steps per scheduled event instead of one per 4 cycles
+    assert steps < 3 * (FRAME_CYCLES // 256)
+    # V-Blank wakes the CPU even though IME=0 doesn't service it
+    assert mmu.if_reg & 0x01
+    step()
+    assert not cpu.halted
+
+
+def test_event_scheduled_while_running_is_on_time():
+    gameboy = GameBoy(MBC0(None), translate=False)
+    cpu, mmu, scheduler = gameboy.cpu, gameboy.mmu, gameboy.scheduler
+    ran = []
+    # writing 0xFF7F schedules an event 8 cycles later
+    mmu.register_io(0xFF7F, write=lambda address, value, ppu_write:
+                    scheduler.schedule(8, lambda time: ran.append((time, scheduler.cycles))))
+    # LDH (0x7F),A then NOPs
+    for i, byte in enumerate([0xE0, 0x7F]):
+        mmu.write_byte(0xC000 + i, byte)
+    cpu.registers.PC = 0xC000
+    cpu.ime = False
+    mmu.ie_reg = 0
+
+    gameboy.run_until(1000)
+    (time, ran_at), = ran
+    # run at the end of the 12 cycle LDH it was due in, not at the next
+    # PPU event
+    assert time == 8 and ran_at == 12
+
+
+def test_halt_wakes_up_for_event_scheduled_before_it():
+    gameboy = GameBoy(MBC0(None), translate=False)
+    cpu, mmu = gameboy.cpu, gameboy.mmu
+    # overflows 2 TIMA increments (32 cycles) after the TAC write
+    mmu.write_byte(0xFF05, 0xFE)
+    mmu.ie_reg = 0x04
+    cpu.ime = False
+    # LD A,05; LDH (07),A; EI; HALT
+    for i, byte in enumerate([0x3E, 0x05, 0xE0, 0x07, 0xFB, 0x76]):
+        mmu.write_byte(0xC000 + i, byte)
+    cpu.registers.PC = 0xC000
+
+    entered = []
+    handler = cpu.interrupt_handler
+    def recording_handler(cpu):
+        entered.append((gameboy.cycles, cpu.pending))
+        return handler(cpu)
+    cpu.interrupt_handler = recording_handler
+
+    gameboy.run_until(400)
+    # the timer interrupt wakes it, not the next PPU event (cycle 80+)
+    assert entered and entered[0][1] == 0x04
+    assert entered[0][0] < 80
@@ -0,0 +1,91 @@
+"""
+Tests for the serial port in gb/serial.py
+"""
+
+import pytest
+from gb.mbc.mbc0 import MBC0
+from gb.mmu import MMU
+from gb.gameboy import GameBoy
+from gb.serial import TRANSFER_CYCLES, SERIAL_INTERRUPT
+
+ROM = "./tests/cpu_test_roms/individual/06-ld r,r.gb"
+
+
+@pytest.fixture
+def mmu():
+    return MMU(MBC0(None))
+
+
+def step(mmu, cycles):
+    scheduler = mmu.serial.scheduler
+    scheduler.cycles += cycles
+    scheduler.run_due()
+
+
+def send(mmu, value):
+    mmu.write_byte(0xFF01, value)
+    mmu.write_byte(0xFF02, 0x81)
+
+
+def test_transfer(mmu):
+    send(mmu, ord("A"))
+    assert mmu.serial.output == b"A"
+    assert mmu.read_byte(0xFF02) == 0xFF
+
+    step(mmu, TRANSFER_CYCLES - 1)
+    assert mmu.read_byte(0xFF01) == ord("A")
+    assert not mmu.if_reg & SERIAL_INTERRUPT
+
+    step(mmu, 1)
+    assert mmu.read_byte(0xFF01) == 0xFF
+    assert mmu.read_byte(0xFF02) == 0x7F
+    assert mmu.if_reg & SERIAL_INTERRUPT
+
+
+def test_external_clock_never_ends(mmu):
+    mmu.write_byte(0xFF01, 0x42)
+    mmu.write_byte(0xFF02, 0x80)
+    step(mmu, TRANSFER_CYCLES * 4)
+    assert mmu.serial.output == b""
+    assert mmu.read_byte(0xFF02) == 0xFE
+    assert not mmu.if_reg & SERIAL_INTERRUPT
+
+
+def test_result(mmu):
+    for c in b"06-ld r,r\n\nPass":
+        send(mmu, c)
+    assert mmu.serial.result() is None
+    for c in b"ed\n":
+        send(mmu, c)
+    assert mmu.serial.result() == "passed"
+    assert mmu.serial.text() == "06-ld r,r\n\nPassed\n"
+
+    mmu.serial.clear()
+    for c in b"Failed":
+        send(mmu, c)
+    assert mmu.serial.result() == "failed"
+
+
+def test_rom_stops_on_result():
+    gameboy = GameBoy(MBC0(ROM))
+    while gameboy.serial.result() is None and gameboy.ppu.frame_count < 600:
+        gameboy.run_frames(1)
+    assert gameboy.serial.result() is not None
+    assert gameboy.serial.text().startswith("06-ld r,r\n")
+    # done well before a fixed budget would have stopped it
+    assert gameboy.ppu.frame_count < 600
+
+
+def test_transfer_survives_save_state():
+    gameboy = GameBoy(MBC0(None))
+    gameboy.mmu.write_byte(0xFF01, 0x30)
+    gameboy.mmu.write_byte(0xFF02, 0x81)
+    state = gameboy.save_state()
+    gameboy.run_until(TRANSFER_CYCLES)
+    assert gameboy.mmu.read_byte(0xFF02) == 0x7F
+
+    gameboy.load_state(state)
+    assert gameboy.mmu.read_byte(0xFF02) == 0xFF
+    gameboy.run_until(TRANSFER_CYCLES)
+    assert gameboy.mmu.read_byte(0xFF02) == 0x7F
+    assert gameboy.mmu.read_byte(0xFF01) == 0xFF
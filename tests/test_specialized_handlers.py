@@ -0,0 +1,113 @@
+"""
+Tests that the generated handlers in gb/cpu/instructions/specialized.py
+behave exactly like the generic handlers in array_1.py / array_2.py,
+with and without lazy flags
+"""
+
+import random
+import pytest
+from gb.mbc.mbc0 import MBC0
+from gb.mmu import MMU
+from gb.cpu.cpu import CPU
+from gb.cpu.instructions.array_1 import construct_code_array
+from gb.cpu.instructions.array_2 import construct_cb_code_array
+from gb.cpu.instructions.specialized import (
+    construct_specialized_code_array,
+    construct_specialized_cb_code_array,
+    opcode_source,
+)
+
+CODE_ARR = construct_code_array()
+CB_CODE_ARR = construct_cb_code_array()
+SPECIALIZED_CODE_ARR = construct_specialized_code_array()
+SPECIALIZED_CB_CODE_ARR = construct_specialized_cb_code_array()
+LAZY_CODE_ARR = construct_specialized_code_array(lazy_flags=True)
+
+
+def make_cpu(seed, lazy_flags=False):
+    """cpu with random registers, and PC, SP, HL... pointing into random WRAM"""
+    rng = random.Random(seed)
+    cpu = CPU(MMU(MBC0(None)), specialized=False, lazy_flags=lazy_flags)
+    cpu.mmu.wram[:] = rng.randbytes(len(cpu.mmu.wram))
+    regs = cpu.registers
+    for name in "ABCDE":
+        setattr(regs, name, rng.randrange(256))
+    regs.F = rng.randrange(16) << 4
+    regs.H = rng.randrange(0xC0, 0xDF)
+    regs.L = rng.randrange(256)
+    regs.SP = rng.randrange(0xC100, 0xDF00)
+    regs.PC = rng.randrange(0xC000, 0xDF00)
+    cpu.ime = rng.random() < 0.5
+    return cpu
+
+
+def snapshot(cpu):
+    regs = cpu.registers
+    return (
+        [getattr(regs, name) for name in ("A", "B", "C", "D", "E", "F", "H", "L", "SP", "PC")],
+        bytes(cpu.mmu.wram),
+        cpu.ime, cpu.ime_requested, cpu.halted,
+    )
+
+
+@pytest.mark.parametrize("opcode", range(256))
+def test_specialized_matches_generic(opcode):
+    if CODE_ARR[opcode] is None:
+        assert SPECIALIZED_CODE_ARR[opcode] is None
+        return
+    for seed in range(20):
+        generic, specialized = make_cpu(seed), make_cpu(seed)
+        CODE_ARR[opcode](generic)
+        SPECIALIZED_CODE_ARR[opcode](specialized)
+        assert snapshot(generic) == snapshot(specialized), opcode_source(opcode)
+
+
+@pytest.mark.parametrize("opcode", range(256))
+def test_specialized_cb_matches_generic(opcode):
+    if CB_CODE_ARR[opcode] is None:
+        assert SPECIALIZED_CB_CODE_ARR[opcode] is None
+        return
+    for seed in range(20):
+        generic, specialized = make_cpu(seed), make_cpu(seed)
+        CB_CODE_ARR[opcode](generic)
+        SPECIALIZED_CB_CODE_ARR[opcode](specialized)
+        assert snapshot(generic) == snapshot(specialized), opcode_source(opcode, cb=True)
+
+
+@pytest.mark.parametrize("opcode", range(256))
+def test_lazy_flags_match_generic(opcode):
+    if CODE_ARR[opcode] is None:
+        return
+    for seed in range(20):
+        generic = make_cpu(seed)
+        generic_lazy, specialized_lazy = make_cpu(seed, True), make_cpu(seed, True)
+        CODE_ARR[opcode](generic)
+        CODE_ARR[opcode](generic_lazy)
+        LAZY_CODE_ARR[opcode](specialized_lazy)
+        assert snapshot(generic) == snapshot(generic_lazy)
+        assert snapshot(generic) == snapshot(specialized_lazy), opcode_source(opcode, lazy_flags=True)
+
+
+# (cb, opcode, A, F before) -> (A, F after)
+KNOWN_RESULTS = [
+    (False, 0x0F, 0x01, 0x00, 0x80, 0x10),  # RRCA, bit 0 to bit 7 and carry
+    (False, 0x27, 0x7D, 0x00, 0x83, 0x00),  # DAA after 0x45 + 0x38
+    (False, 0x27, 0x9A, 0x00, 0x00, 0x90),  # DAA after 0x99 + 0x01
+    (False, 0x27, 0x0F, 0x60, 0x09, 0x40),  # DAA after 0x10 - 0x01
+    (True, 0x07, 0x80, 0x00, 0x01, 0x10),   # RLC A
+    (True, 0x0F, 0x00, 0x10, 0x00, 0x80),   # RRC A
+    (True, 0x2F, 0x81, 0x00, 0xC0, 0x10),   # SRA A keeps bit 7
+]
+
+
+@pytest.mark.parametrize("cb, opcode, a, f, result_a, result_f", KNOWN_RESULTS)
+@pytest.mark.parametrize("specialized", [False, True])
+def test_known_results(specialized, cb, opcode, a, f, result_a, result_f):
+    if cb:
+        handler = (SPECIALIZED_CB_CODE_ARR if specialized else CB_CODE_ARR)[opcode]
+    else:
+        handler = (SPECIALIZED_CODE_ARR if specialized else CODE_ARR)[opcode]
+    cpu = make_cpu(0)
+    cpu.registers.A, cpu.registers.F = a, f
+    handler(cpu)
+    assert (cpu.registers.A, cpu.registers.F) == (result_a, result_f)
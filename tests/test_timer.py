@@ -0,0 +1,92 @@
+"""
+Tests for the lazy timer in gb/timers.py
+"""
+
+import pytest
+from gb.mbc.mbc0 import MBC0
+from gb.mmu import MMU
+from gb.gameboy import GameBoy
+
+
+@pytest.fixture
+def mmu():
+    return MMU(MBC0(None))
+
+
+def test_div_from_cycles(mmu):
+    mmu.timer.step(255)
+    assert mmu.read_byte(0xFF04) == 0
+    mmu.timer.step(1)
+    assert mmu.read_byte(0xFF04) == 1
+    mmu.timer.step(256 * 300)
+    assert mmu.read_byte(0xFF04) == (301 & 0xFF)
+    mmu.write_byte(0xFF04, 0x55)
+    assert mmu.read_byte(0xFF04) == 0
+
+
+@pytest.mark.parametrize("tac, period", [(0x04, 1024), (0x05, 16), (0x06, 64), (0x07, 256)])
+def test_tima_frequency(mmu, tac, period):
+    mmu.write_byte(0xFF07, tac)
+    mmu.timer.step(period * 10 - 1)
+    assert mmu.read_byte(0xFF05) == 9
+    mmu.timer.step(1)
+    assert mmu.read_byte(0xFF05) == 10
+    assert mmu.read_byte(0xFF07) == 0xF8 | tac
+
+
+def test_tima_stopped(mmu):
+    mmu.write_byte(0xFF05, 0x20)
+    mmu.timer.step(5000)
+    assert mmu.read_byte(0xFF05) == 0x20
+    mmu.write_byte(0xFF07, 0x05)
+    mmu.timer.step(32)
+    mmu.write_byte(0xFF07, 0x01)
+    mmu.timer.step(5000)
+    assert mmu.read_byte(0xFF05) == 0x22
+
+
+def test_overflow_reloads_tma_and_interrupts(mmu):
+    mmu.if_reg = 0
+    mmu.write_byte(0xFF06, 0xF0)
+    mmu.write_byte(0xFF05, 0xFE)
+    mmu.write_byte(0xFF07, 0x05)
+    mmu.timer.step(31)
+    assert mmu.read_byte(0xFF05) == 0xFF
+    assert not mmu.if_reg & 0x04
+    mmu.timer.step(1)
+    assert mmu.read_byte(0xFF05) == 0xF0
+    assert mmu.if_reg & 0x04
+    # counts on from TMA, overflows again 16 increments later
+    mmu.if_reg = 0
+    mmu.timer.step(16 * 16)
+    assert mmu.read_byte(0xFF05) == 0xF0
+    assert mmu.if_reg & 0x04
+
+
+def test_read_before_overflow_event_ran(mmu):
+    mmu.write_byte(0xFF06, 0x80)
+    mmu.write_byte(0xFF05, 0xFE)
+    mmu.write_byte(0xFF07, 0x05)
+    # 3 increments, the overflow event is due but hasn't run
+    mmu.timer.scheduler.cycles += 48
+    assert mmu.read_byte(0xFF05) == 0x81
+
+
+def test_tima_read_by_program():
+    gameboy = GameBoy(MBC0(None), translate=False)
+    cpu, mmu = gameboy.cpu, gameboy.mmu
+    cpu.ime = False
+    mmu.ie_reg = 0
+    # TMA=80 TIMA=FE TAC=05 (every 16 cycles), 20 NOPs, LD A,(FF05);
+    # LD (C100),A; JR -2
+    program = [0x3E, 0x80, 0xE0, 0x06, 0x3E, 0xFE, 0xE0, 0x05, 0x3E, 0x05, 0xE0, 0x07]
+    program += [0x00] * 20 + [0xF0, 0x05, 0xEA, 0x00, 0xC1, 0x18, 0xFE]
+    for i, byte in enumerate(program):
+        mmu.write_byte(0xC000 + i, byte)
+    cpu.registers.PC = 0xC000
+
+    gameboy.run_until(1000)
+    # about 92 cycles after the TAC write: overflowed after 2 increments,
+    # reloaded and counted on from TMA
+    assert 0x80 < mmu.read_byte(0xC100) <= 0x84
+    assert mmu.if_reg & 0x04
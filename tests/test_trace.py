@@ -0,0 +1,84 @@
+"""
+Tests for the structured tracing in gb/trace.py
+"""
+
+import io
+from gb.mbc.mbc0 import MBC0
+from gb.gameboy import GameBoy
+from gb.trace import Tracer, RECORD, IO_WRITE, INVALID_ECHO_WRITE, INVALID_CART_RAM_READ
+from gb.util.trace_categories import TRACE_CATEGORIES
+from gb.util.ppu_modes import PPU_MODES
+
+
+def make_gameboy():
+    gameboy = GameBoy(MBC0(None))
+    gameboy.cpu.registers.PC = 0xC000
+    return gameboy
+
+
+def test_ring_buffer_keeps_newest_records():
+    tracer = Tracer(capacity=4)
+    tracer.enable()
+    for i in range(6):
+        tracer.record(TRACE_CATEGORIES.CPU_OPCODE, 0, i, 0x00)
+    assert [record[3] for record in tracer.records()] == [2, 3, 4, 5]
+    assert len(tracer.dump_binary()) == 4 * RECORD.size
+    assert RECORD.unpack_from(tracer.dump_binary())[3] == 2
+
+
+def test_disabled_categories_install_nothing():
+    gameboy = make_gameboy()
+    mmu = gameboy.mmu
+    read_handlers = list(mmu.read_handlers)
+    write_handlers = list(mmu.write_handlers)
+
+    gameboy.tracer.enable(*TRACE_CATEGORIES)
+    gameboy.tracer.disable(*TRACE_CATEGORIES)
+    assert mmu.read_handlers == read_handlers
+    assert mmu.write_handlers == write_handlers
+    assert "set_state" not in vars(gameboy.ppu)
+    assert gameboy.cpu.block_cache is not None
+
+    mmu.write_byte(0xFF40, 0x91)
+    mmu.write_byte(0xE000, 0x12)
+    assert gameboy.tracer.count == 0
+
+
+def test_mmu_records():
+    gameboy = make_gameboy()
+    mmu, tracer = gameboy.mmu, gameboy.tracer
+    tracer.enable(TRACE_CATEGORIES.MMU_IO, TRACE_CATEGORIES.MMU_INVALID)
+    mmu.write_byte(0xFF47, 0xE4)
+    mmu.write_byte(0xE010, 0x34)
+    mmu.read_byte(0xA000)
+    mmu.write_byte(0xFF80, 0x01)
+    assert [record[1:] for record in tracer.records()] == [
+        (TRACE_CATEGORIES.MMU_IO, IO_WRITE, 0xFF47, 0xE4),
+        (TRACE_CATEGORIES.MMU_INVALID, INVALID_ECHO_WRITE, 0xE010, 0x34),
+        (TRACE_CATEGORIES.MMU_INVALID, INVALID_CART_RAM_READ, 0xA000, 0xFF),
+    ]
+    assert mmu.wram[0x10] == 0x34
+
+
+def test_cpu_ppu_and_interrupt_records():
+    gameboy = make_gameboy()
+    cpu, mmu, tracer = gameboy.cpu, gameboy.mmu, gameboy.tracer
+    # EI; NOP; JR -2
+    for i, byte in enumerate([0xFB, 0x00, 0x18, 0xFE]):
+        mmu.write_byte(0xC000 + i, byte)
+    mmu.ie_reg = 0x01
+    tracer.enable(TRACE_CATEGORIES.CPU_OPCODE, TRACE_CATEGORIES.PPU_MODE, TRACE_CATEGORIES.INTERRUPT)
+    gameboy.run_frames(1)
+    gameboy.run_until(gameboy.cycles + 20)
+
+    records = tracer.records()
+    opcodes = [r for r in records if r[1] == TRACE_CATEGORIES.CPU_OPCODE]
+    assert [r[3:] for r in opcodes[:3]] == [(0xC000, 0xFB), (0xC001, 0x00), (0xC002, 0x18)]
+    modes = [r for r in records if r[1] == TRACE_CATEGORIES.PPU_MODE]
+    assert (PPU_MODES.V_BLANK.value, 144, 0) in [r[2:] for r in modes]
+    interrupts = [r for r in records if r[1] == TRACE_CATEGORIES.INTERRUPT]
+    assert interrupts[0][2:4] == (0, 0x40)
+
+    out = io.StringIO()
+    tracer.dump(out)
+    assert "interrupt    V-Blank vector=0040" in out.getvalue()